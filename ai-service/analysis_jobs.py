@@ -0,0 +1,232 @@
+"""
+异步分析任务：提交后立即返回任务ID，由固定数量的工作线程按优先级执行
+- 优先级由预检发现的最高故障等级决定（P0 最先执行），同优先级按提交顺序
+- 待执行任务数有上限，超过上限时拒绝提交，避免积压拖垮推理节点
+- 任务状态保存在 Redis（ai:job:{id}）中供轮询；状态变化时唤醒 SSE 订阅，完成后由独立线程池回调 webhook
+- 每个进程持有一个带 TTL 的实例租约并定期续期；排队中/执行中任务所属实例的租约过期（进程退出、容器重启）后，
+  由任一实例认领并标记为失败（内存队列随进程退出而丢失），未结束的任务ID记录在集合中，认领时无需扫描全部任务
+- Redis 读写都在条件变量的锁外进行，锁只保护内存队列与状态版本号
+"""
+import heapq
+import itertools
+import json
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+PRIORITY_BY_LEVEL = {"P0": 0, "P1": 1, "P2": 2, "P3": 3}
+DEFAULT_PRIORITY = 4
+
+FINISHED_STATUSES = ("succeeded", "failed")
+UNFINISHED_STATUSES = ("queued", "running")
+
+
+def priority_for(faults):
+    """按故障列表中的最高等级计算优先级，数值越小越先执行"""
+    return min((PRIORITY_BY_LEVEL.get(f.get("level"), DEFAULT_PRIORITY) for f in faults or []),
+               default=DEFAULT_PRIORITY)
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class AnalysisJobQueue:
+    def __init__(self, handler, redis_client, workers=2, max_pending=1000, ttl=86400,
+                 webhook_timeout=10, webhook_retries=3, webhook_workers=4, prefix="ai:job:", lease_ttl=60):
+        """
+        :param handler: 执行分析的函数，参数为请求数据，返回响应体（code 为 200 表示成功）
+        :param webhook_workers: 回调 webhook 的线程数，回调重试不占用分析工作线程
+        :param lease_ttl: 实例租约有效期（秒），每 1/3 有效期续期一次并检查其他实例遗留的任务
+        """
+        self.handler = handler
+        self.redis = redis_client
+        self.workers = workers
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self.webhook_timeout = webhook_timeout
+        self.webhook_retries = webhook_retries
+        self.prefix = prefix
+        self.lease_ttl = lease_ttl
+        # 每个进程使用新的实例标识，重启后旧实例的租约自然过期
+        self.instance = uuid.uuid4().hex
+        self.active_key = prefix.rstrip(":") + "-meta:active"
+        self.lease_prefix = prefix.rstrip(":") + "-meta:lease:"
+        self._webhook_executor = ThreadPoolExecutor(max_workers=webhook_workers,
+                                                    thread_name_prefix="analysis-webhook")
+        self._heap = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._running = 0
+        self._submitting = 0
+        # 任务状态每次变化加 1，wait 据此判断锁外读取 Redis 期间是否错过了唤醒
+        self._version = 0
+        self._threads = []
+
+    def start(self):
+        heartbeat = threading.Thread(target=self._heartbeat, name="analysis-job-lease", daemon=True)
+        heartbeat.start()
+        self._threads.append(heartbeat)
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"analysis-job-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, payload, priority=DEFAULT_PRIORITY, callback_url=None):
+        job = {
+            "id": uuid.uuid4().hex,
+            "status": "queued",
+            "priority": priority,
+            "device_id": payload.get("device_id"),
+            "instance": self.instance,
+            "callback_url": callback_url,
+            "submitted_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "result": None,
+            "error": None
+        }
+        # 先占位再在锁外保存，保存完成后才入队，工作线程的状态更新不会被排队状态覆盖
+        with self._cond:
+            if len(self._heap) + self._submitting >= self.max_pending:
+                raise QueueFullError(f"分析任务队列已满（{self.max_pending}）")
+            self._submitting += 1
+        try:
+            self._save(job)
+        except Exception:
+            with self._cond:
+                self._submitting -= 1
+            raise
+        with self._cond:
+            self._submitting -= 1
+            heapq.heappush(self._heap, (priority, next(self._seq), job, payload))
+            self._version += 1
+            self._cond.notify_all()
+        return job
+
+    def get(self, job_id):
+        data = self.redis.get(self.prefix + job_id)
+        return json.loads(data) if data else None
+
+    def wait(self, job_id, last_status=None, timeout=15):
+        """等待任务状态不同于 last_status 或超时，返回当前任务状态"""
+        deadline = time.time() + timeout
+        while True:
+            with self._cond:
+                version = self._version
+            job = self.get(job_id)
+            if job is None or job["status"] != last_status or job["status"] in FINISHED_STATUSES:
+                return job
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return job
+            with self._cond:
+                if self._version == version:
+                    self._cond.wait(remaining)
+
+    def stats(self):
+        with self._cond:
+            pending = {}
+            for priority, _, _, _ in self._heap:
+                pending[priority] = pending.get(priority, 0) + 1
+            return {"workers": self.workers, "running": self._running, "pending": len(self._heap),
+                    "pending_by_priority": pending, "max_pending": self.max_pending}
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while not self._heap:
+                    self._cond.wait()
+                _, _, job, payload = heapq.heappop(self._heap)
+                self._running += 1
+            job["status"] = "running"
+            job["started_at"] = time.time()
+            self._update(job)
+
+            try:
+                result = self.handler(payload)
+                job["result"] = result
+                job["status"] = "succeeded" if result.get("code") == 200 else "failed"
+                if job["status"] == "failed":
+                    job["error"] = result.get("msg")
+            except Exception as e:
+                job["status"] = "failed"
+                job["error"] = str(e)
+            job["finished_at"] = time.time()
+
+            with self._cond:
+                self._running -= 1
+            self._update(job)
+
+            if job.get("callback_url"):
+                self._webhook_executor.submit(self._notify_webhook, job)
+
+    def _heartbeat(self):
+        """续期本实例租约，并认领租约已过期的实例遗留的任务"""
+        while True:
+            try:
+                self.redis.set(self.lease_prefix + self.instance, 1, ex=self.lease_ttl)
+                recovered = self._recover()
+                if recovered:
+                    print(f"已将{recovered}个因服务重启中断的分析任务标记为失败")
+            except Exception as e:
+                print(f"回收中断的分析任务失败：{e}")
+            time.sleep(self.lease_ttl / 3)
+
+    def _recover(self):
+        """把租约已过期的实例遗留的排队中/执行中任务标记为失败并回调，返回处理的任务数"""
+        recovered = 0
+        alive = {self.instance: True}
+        for member in self.redis.smembers(self.active_key):
+            job_id = member.decode() if isinstance(member, bytes) else member
+            job = self.get(job_id)
+            if job is None or job.get("status") not in UNFINISHED_STATUSES:
+                self.redis.srem(self.active_key, job_id)
+                continue
+            instance = job.get("instance")
+            if instance not in alive:
+                alive[instance] = bool(self.redis.exists(self.lease_prefix + str(instance)))
+            # 从集合中移除成功即认领成功，多个实例同时检查时只有一个实例处理该任务
+            if alive[instance] or not self.redis.srem(self.active_key, job_id):
+                continue
+            job["status"] = "failed"
+            job["error"] = "服务重启，任务中断，请重新提交"
+            job["finished_at"] = time.time()
+            self._save(job)
+            recovered += 1
+            if job.get("callback_url"):
+                self._webhook_executor.submit(self._notify_webhook, job)
+        return recovered
+
+    def _update(self, job):
+        try:
+            self._save(job)
+        except Exception as e:
+            print(f"保存分析任务 {job['id']} 状态失败：{e}")
+        with self._cond:
+            self._version += 1
+            self._cond.notify_all()
+
+    def _save(self, job):
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.set(self.prefix + job["id"], json.dumps(job, ensure_ascii=False, default=str), ex=self.ttl)
+        if job["status"] in UNFINISHED_STATUSES:
+            pipe.sadd(self.active_key, job["id"])
+        else:
+            pipe.srem(self.active_key, job["id"])
+        pipe.execute()
+
+    def _notify_webhook(self, job):
+        for attempt in range(self.webhook_retries):
+            try:
+                resp = requests.post(job["callback_url"], json=job, timeout=self.webhook_timeout)
+                if resp.status_code < 500:
+                    return
+                print(f"分析任务 {job['id']} 回调失败（第{attempt + 1}次）：HTTP {resp.status_code}")
+            except requests.RequestException as e:
+                print(f"分析任务 {job['id']} 回调失败（第{attempt + 1}次）：{e}")
+            if attempt + 1 < self.webhook_retries:
+                time.sleep(2 ** attempt)
@@ -1,13 +1,20 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 import json
 import os
 import time
 import hashlib
 import redis
+from concurrent.futures import ThreadPoolExecutor
 from agent.network_agent import NetworkAgent
 from model_scheduler import ModelScheduler
-from fault_classifier import FaultClassifier
+from fault_classifier import FaultClassifier, metric_number
 from knowledge_base import KnowledgeBase
+from metrics_codec import decode_metrics
+from result_cache import ResultCache
+from prompt_builder import build_prompt
+from batch_analysis import build_batch_prompt, format_device_report, parse_batch_response
+from stream_analysis import ReportStreamMonitor
+from analysis_jobs import AnalysisJobQueue, QueueFullError, FINISHED_STATUSES, priority_for
 from dotenv import load_dotenv
 
 # 修复：补充导入
@@ -15,14 +22,31 @@ load_dotenv()
 app = Flask(__name__)
 redis_client = redis.Redis.from_url(os.getenv("REDIS_URL"))
 
+# 初始化多模型调度器（OLLAMA_URL 可配置多个推理节点，逗号分隔）
+model_scheduler = ModelScheduler(
+    os.getenv("OLLAMA_URL"),
+    keep_alive=os.getenv("OLLAMA_KEEP_ALIVE", "30m"),
+    keepalive_interval=int(os.getenv("OLLAMA_KEEPALIVE_INTERVAL", 240)),
+    slow_seconds=float(os.getenv("AI_MODEL_SLOW_SECONDS", 60)),
+    slow_ttl=int(os.getenv("AI_MODEL_SLOW_TTL", 600)),
+    probe_interval=int(os.getenv("AI_MODEL_PROBE_INTERVAL", 1800)),
+    cooldown=int(os.getenv("AI_MODEL_COOLDOWN", 30)),
+    max_attempts=int(os.getenv("AI_MODEL_MAX_ATTEMPTS", 3))
+)
+model_scheduler.start()
+
 # 初始化Agent
 agent = NetworkAgent(
-    ollama_url=os.getenv("OLLAMA_URL"),
+    ollama_url=model_scheduler.ollama_url,
     collect_service_url=os.getenv("COLLECT_SERVICE_URL")
 )
 
-# 初始化多模型调度器
-model_scheduler = ModelScheduler(os.getenv("OLLAMA_URL"))
+# 推理结果缓存（相同模型、场景与指标复用结果，并发相同请求只推理一次）
+result_cache = ResultCache(
+    redis_client,
+    ttl=int(os.getenv("AI_RESULT_CACHE_TTL", 600)),
+    max_entries=int(os.getenv("AI_RESULT_CACHE_MAX_ENTRIES", 10000))
+) if os.getenv("AI_RESULT_CACHE_ENABLED", "true").lower() == "true" else None
 
 # 初始化故障分级器
 fault_classifier = FaultClassifier()
@@ -32,98 +56,473 @@ knowledge_base = KnowledgeBase()
 
 @app.post("/api/ai/analyze")
 def analyze():
-    data = request.json
+    data = request.json or {}
+    if data.get("async", False):
+        return submit_analysis_job(data)
+    if data.get("stream", False) or "text/event-stream" in request.headers.get("Accept", ""):
+        return stream_analysis(data)
+    return jsonify(run_analysis(data))
+
+def run_analysis(data: dict) -> dict:
+    """执行一次设备分析，返回响应体（同步接口与异步任务共用）"""
     device_id = data.get("device_id")
     scenario = data.get("scenario", "通用巡检")  # 巡检场景
     auto_repair = data.get("auto_repair", False)  # 是否自动修复
+    refresh = data.get("refresh", False)  # 为True时忽略缓存重新推理
+    latency_budget = data.get("latency_budget")  # 耗时预算（秒），给出时选择预算内质量最高的模型
 
     if not device_id:
-        return jsonify({"code": 400, "msg": "设备ID不能为空"})
+        return {"code": 400, "msg": "设备ID不能为空"}
 
     # 获取采集数据
-    metrics_str = redis_client.get(f"metrics:{device_id}")
-    if not metrics_str:
-        return jsonify({"code": 404, "msg": "未找到设备采集数据"})
-    metrics = json.loads(metrics_str)
+    metrics_data = redis_client.get(f"metrics:{device_id}")
+    if not metrics_data:
+        return {"code": 404, "msg": "未找到设备采集数据"}
+    metrics = decode_metrics(metrics_data)
+
+    # 规则预检：指标无异常且无需模型判断时直接返回计算得出的报告，不调用大模型
+    screen = fault_classifier.prescreen(metrics)
+    if not screen["escalate"] and not data.get("force_llm", False):
+        return prescreen_result(device_id, metrics, screen)
+
+    model_key = model_scheduler.select_model(scenario, latency_budget=latency_budget)
+    prompt, prompt_info = build_analysis_prompt(device_id, metrics, model_key)
 
-    # 构建提示词
-    prompt = f"""分析设备{device_id}的指标，输出：
+    try:
+        # 使用多模型调度器选择最优模型（命中缓存时直接复用推理结果）
+        cached = False
+        if result_cache is not None and not refresh:
+            model_result, cached = result_cache.get_or_compute(
+                analysis_cache_key(model_key, scenario, device_id, metrics),
+                lambda: model_scheduler.predict(prompt, scenario=scenario, model_key=model_key),
+                cacheable=cacheable_result
+            )
+        else:
+            model_result = model_scheduler.predict(prompt, scenario=scenario, model_key=model_key)
+        return finish_analysis(device_id, metrics, screen, model_result, auto_repair, cached, prompt_info)
+    except Exception as e:
+        return {"code": 500, "msg": f"分析失败：{str(e)}"}
+
+ANALYSIS_PROMPT = """分析设备{device_id}的指标，输出：
     1. 健康评分（0-100）及依据（关键指标阈值对比）；
     2. 异常项（严重等级P0-P3，附日志证据）；
     3. 修复建议（厂商专用命令）；
     4. 推理链路（步骤拆解）。
-    指标：{json.dumps(metrics, ensure_ascii=False)}"""
+    指标：{metrics}"""
+
+def build_analysis_prompt(device_id, metrics: dict, model_key: str):
+    """构建单设备分析提示词：指标经去噪、汇总后按所选模型的 token 预算压缩，返回 (提示词, token 统计)"""
+    prompt, prompt_info = build_prompt(ANALYSIS_PROMPT, metrics, model_scheduler.prompt_budget(model_key),
+                                       device_id=device_id)
+    print(f"设备 {device_id} 提示词：{prompt_info['original_tokens']} -> {prompt_info['prompt_tokens']} tokens"
+          f"（预算 {prompt_info['budget']}）")
+    return prompt, prompt_info
+
+def analysis_cache_key(model_key: str, scenario: str, device_id, metrics: dict) -> str:
+    model_name = model_scheduler.models[model_key]["model"]
+    return result_cache.make_key(model_name, scenario, device_id, metrics)
+
+def cacheable_result(model_result: dict) -> bool:
+    """降级到其他模型得到的结果不写入所选模型的缓存键下"""
+    return not model_result.get("fallback", False)
+
+def finish_analysis(device_id, metrics: dict, screen: dict, model_result: dict,
+                    auto_repair: bool = False, cached: bool = False, prompt_info: dict = None) -> dict:
+    """模型输出之后的故障分级、健康评分、知识库联动与自动修复，返回响应体"""
+    report = model_result["result"]
+
+    # 故障分级
+    faults = fault_classifier.classify(report, metrics)
+
+    # 新的推理结果与指标故障对比，作为模型质量样本
+    if not cached:
+        model_scheduler.record_quality(model_result.get("model"), fault_classifier.agreement(report, screen["faults"]))
+
+    # 计算健康评分
+    health_score = calculate_health_score(metrics, faults)
+
+    # 知识库联动：搜索相关解决方案
+    knowledge_solutions = []
+    for fault in faults[:3]:  # 只搜索前3个故障
+        solutions = knowledge_base.search(fault["description"], limit=2)
+        knowledge_solutions.extend(solutions)
+
+    # 自动修复（仅保留本地agent修复，删除StackStorm逻辑）
+    repair_results = []
+    if auto_repair:
+        for fault in faults:
+            if fault.get("auto_repairable") and fault["level"] in ["P3", "P2"]:
+                fault_results = []
+                try:
+                    repair_result = agent.auto_heal(device_id, fault["description"])
+                    agent_success = "成功" in repair_result or "完成" in repair_result
+                    fault_results.append({
+                        "fault": fault["description"],
+                        "result": repair_result,
+                        "success": agent_success,
+                        "provider": "agent"
+                    })
+                    if agent_success:
+                        knowledge_base.add(
+                            keyword=fault["description"],
+                            title=f"自动修复：{fault['description']}",
+                            solution=repair_result,
+                            fault_level=fault["level"]
+                        )
+                except Exception as e:
+                    fault_results.append({
+                        "fault": fault["description"],
+                        "result": f"本地修复失败：{str(e)}",
+                        "success": False,
+                        "provider": "agent"
+                    })
+                repair_results.extend(fault_results)
+
+    # 计算报告哈希（用于日志记录）
+    report_hash = hashlib.sha256(report.encode()).hexdigest()
+
+    return {
+        "code": 200,
+        "data": {
+            "report": report,
+            "health_score": health_score,
+            "faults": faults,
+            "model_info": {
+                "model": model_result.get("model", "unknown"),
+                "time_cost": model_result.get("time_cost", 0),
+                "accuracy": model_result.get("accuracy", 0),
+                "endpoint": model_result.get("endpoint"),
+                "fallback": model_result.get("fallback", False),
+                "cached": cached
+            },
+            "knowledge_solutions": knowledge_solutions,
+            "repair_results": repair_results,
+            "evidence": extract_evidence(report),
+            "log_hash": report_hash,
+            "prescreen": screen,
+            "prompt_info": prompt_info
+        }
+    }
+
+# 流式分析：最后一个段落与报告总长度上限（字符）
+AI_STREAM_LAST_SECTION_CHARS = int(os.getenv("AI_STREAM_LAST_SECTION_CHARS", 1500))
+AI_STREAM_MAX_CHARS = int(os.getenv("AI_STREAM_MAX_CHARS", 8000))
+
+def sse_event(event: str, payload) -> str:
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+def stream_analysis(data: dict):
+    """
+    以 SSE 流式返回分析过程：token（模型输出片段）、fault（新识别的故障）、done（完整响应体）、error
+    预检健康或命中缓存时直接推送 done
+    """
+    device_id = data.get("device_id")
+    scenario = data.get("scenario", "通用巡检")
+    auto_repair = data.get("auto_repair", False)
+    refresh = data.get("refresh", False)
+
+    def events():
+        if not device_id:
+            yield sse_event("error", {"code": 400, "msg": "设备ID不能为空"})
+            return
+        metrics_data = redis_client.get(f"metrics:{device_id}")
+        if not metrics_data:
+            yield sse_event("error", {"code": 404, "msg": "未找到设备采集数据"})
+            return
+        metrics = decode_metrics(metrics_data)
+
+        screen = fault_classifier.prescreen(metrics)
+        if not screen["escalate"] and not data.get("force_llm", False):
+            yield sse_event("done", prescreen_result(device_id, metrics, screen))
+            return
+
+        model_key = model_scheduler.select_model(scenario, latency_budget=data.get("latency_budget"))
+        cache_key = None
+        if result_cache is not None:
+            cache_key = analysis_cache_key(model_key, scenario, device_id, metrics)
+            cached = None if refresh else result_cache.get(cache_key)
+            if cached is not None:
+                yield sse_event("done", finish_analysis(device_id, metrics, screen, cached, auto_repair, True))
+                return
+
+        route = {}
+        monitor = ReportStreamMonitor(fault_classifier, AI_STREAM_LAST_SECTION_CHARS, AI_STREAM_MAX_CHARS)
+        start_time = time.time()
+        first_token_time = None
+        prompt, prompt_info = build_analysis_prompt(device_id, metrics, model_key)
+        stream = model_scheduler.predict_stream(prompt, scenario=scenario, route=route, model_key=model_key)
+        try:
+            for chunk in stream:
+                if first_token_time is None:
+                    first_token_time = time.time() - start_time
+                yield sse_event("token", {"text": chunk})
+                for fault in monitor.feed(chunk):
+                    yield sse_event("fault", fault)
+                if monitor.stop_reason:
+                    break
+        except Exception as e:
+            yield sse_event("error", {"code": 500, "msg": f"分析失败：{str(e)}"})
+            return
+        finally:
+            stream.close()
+        for fault in monitor.finish():
+            yield sse_event("fault", fault)
+
+        model_result = {
+            "model": route.get("model", "unknown"),
+            "result": monitor.text,
+            "time_cost": round(time.time() - start_time, 2),
+            "accuracy": route.get("accuracy", 0),
+            "endpoint": route.get("endpoint"),
+            "fallback": route.get("fallback", False)
+        }
+        # 仅缓存自然结束的输出，提前停止（段落完整或超长截断）与降级模型的结果不复用
+        if cache_key is not None and not monitor.stop_reason and cacheable_result(model_result):
+            try:
+                result_cache.set(cache_key, model_result)
+            except Exception as e:
+                print(f"写入推理结果缓存失败：{e}")
+        response = finish_analysis(device_id, metrics, screen, model_result, auto_repair, prompt_info=prompt_info)
+        response["data"]["stream_info"] = {
+            "first_token_time": round(first_token_time or 0, 2),
+            "stop_reason": monitor.stop_reason or "completed",
+            "sections": monitor.sections
+        }
+        yield sse_event("done", response)
+
+    return Response(events(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
+def prescreen_result(device_id, metrics: dict, screen: dict) -> dict:
+    """规则预检判定健康时的响应体"""
+    health_score = calculate_health_score(metrics, [])
+    report = build_prescreen_report(device_id, metrics, health_score)
+    return {
+        "code": 200,
+        "data": {
+            "report": report,
+            "health_score": health_score,
+            "faults": [],
+            "model_info": {"model": "rule-prescreen", "time_cost": 0, "accuracy": 1.0, "cached": False},
+            "knowledge_solutions": [],
+            "repair_results": [],
+            "evidence": extract_evidence(report),
+            "log_hash": hashlib.sha256(report.encode()).hexdigest(),
+            "prescreen": screen
+        }
+    }
+
+# 批量分析：每个提示词包含的设备数与并发推理数
+AI_BATCH_SIZE = int(os.getenv("AI_BATCH_SIZE", 8))
+AI_BATCH_CONCURRENCY = int(os.getenv("AI_BATCH_CONCURRENCY", 2))
+
+@app.post("/api/ai/analyze/batch")
+def analyze_batch():
+    """
+    批量分析多台设备：预检健康的设备直接返回计算报告，其余设备按 batch_size 合并为一个提示词推理
+    请求体：{"device_ids": [...], "scenario": "批量巡检", "batch_size": 8}
+    可选 latency_budget（单次推理耗时预算，秒）或 deadline（整批完成时限，秒，按组数与并发数折算为单次预算），
+    给出时选择预算内质量最高的模型，设备较多时自动降级到更快的模型
+    与单设备分析共用推理结果缓存（按设备计算缓存键），命中缓存的设备不再进入批量提示词；refresh 为 True 时忽略缓存
+    """
+    data = request.json or {}
+    device_ids = data.get("device_ids") or []
+    scenario = data.get("scenario", "批量巡检")
+    refresh = data.get("refresh", False)
+    if not device_ids:
+        return jsonify({"code": 400, "msg": "设备ID列表不能为空"})
+    batch_size = max(1, int(data.get("batch_size", AI_BATCH_SIZE)))
+
+    results = {}
+    pending = []
+    for device_id, metrics_data in zip(device_ids, redis_client.mget([f"metrics:{d}" for d in device_ids])):
+        if not metrics_data:
+            results[str(device_id)] = {"code": 404, "msg": "未找到设备采集数据"}
+            continue
+        metrics = decode_metrics(metrics_data)
+        screen = fault_classifier.prescreen(metrics)
+        if screen["escalate"]:
+            pending.append((device_id, metrics, screen))
+        else:
+            results[str(device_id)] = prescreen_result(device_id, metrics, screen)
+
+    prescreened = len(device_ids) - len(pending)
+    cached = 0
+    groups = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+    if groups:
+        workers = max(1, min(AI_BATCH_CONCURRENCY, len(groups)))
+        latency_budget = data.get("latency_budget")
+        if latency_budget is None and data.get("deadline"):
+            latency_budget = float(data["deadline"]) * workers / len(groups)
+        model_key = model_scheduler.select_model(scenario, latency_budget=latency_budget, workload="batch")
+        if result_cache is not None and not refresh:
+            misses = cached_group_results(pending, scenario, model_key, results)
+            cached = len(pending) - len(misses)
+            groups = [misses[i:i + batch_size] for i in range(0, len(misses), batch_size)]
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for group_results in executor.map(
+                    lambda group: analyze_group(group, scenario, model_key, latency_budget), groups):
+                results.update(group_results)
+
+    return jsonify({"code": 200, "data": {
+        "results": [{"device_id": device_id, **results[str(device_id)]} for device_id in device_ids],
+        "prescreened": prescreened,
+        "cached": cached,
+        "llm_calls": len(groups)
+    }})
+
+def cached_group_results(pending, scenario: str, model_key: str, results: dict) -> list:
+    """命中推理结果缓存的设备直接写入 results，返回未命中、仍需推理的设备"""
+    misses = []
+    for device_id, metrics, screen in pending:
+        model_result = result_cache.get(analysis_cache_key(model_key, scenario, device_id, metrics))
+        if model_result is None:
+            misses.append((device_id, metrics, screen))
+        else:
+            results[str(device_id)] = group_device_result(device_id, metrics, screen, model_result, cached=True)
+    return misses
+
+def group_device_result(device_id, metrics: dict, screen: dict, model_result: dict, cached: bool = False,
+                        batch_size: int = None, prompt_info: dict = None) -> dict:
+    """批量分析中单台设备的响应体（报告来自批量推理或推理结果缓存）"""
+    report = model_result["result"]
+    faults = fault_classifier.classify(report, metrics)
+    if not cached:
+        model_scheduler.record_quality(model_result.get("model"), fault_classifier.agreement(report, screen["faults"]))
+    model_info = {
+        "model": model_result.get("model", "unknown"),
+        "time_cost": model_result.get("time_cost", 0),
+        "accuracy": model_result.get("accuracy", 0),
+        "cached": cached
+    }
+    if batch_size is not None:
+        model_info["batch_size"] = batch_size
+    return {
+        "code": 200,
+        "data": {
+            "report": report,
+            "health_score": calculate_health_score(metrics, faults),
+            "faults": faults,
+            "model_info": model_info,
+            "knowledge_solutions": [],
+            "repair_results": [],
+            "evidence": extract_evidence(report),
+            "log_hash": hashlib.sha256(report.encode()).hexdigest(),
+            "prescreen": screen,
+            "prompt_info": prompt_info
+        }
+    }
+
+def analyze_group(group, scenario: str, model_key: str, latency_budget: float = None) -> dict:
+    """一次推理分析一组设备，返回 {device_id(str): 响应体}；模型遗漏的设备单独分析"""
+    prompt, prompt_info = build_batch_prompt([(device_id, metrics) for device_id, metrics, _ in group], scenario,
+                                             model_scheduler.prompt_budget(model_key))
     try:
-        # 使用多模型调度器选择最优模型
-        model_result = model_scheduler.predict(prompt, scenario=scenario)
-        report = model_result["result"]
-
-        # 故障分级
-        faults = fault_classifier.classify(report, metrics)
-
-        # 计算健康评分
-        health_score = calculate_health_score(metrics, faults)
-
-        # 知识库联动：搜索相关解决方案
-        knowledge_solutions = []
-        for fault in faults[:3]:  # 只搜索前3个故障
-            solutions = knowledge_base.search(fault["description"], limit=2)
-            knowledge_solutions.extend(solutions)
-
-        # 自动修复（仅保留本地agent修复，删除StackStorm逻辑）
-        repair_results = []
-        if auto_repair:
-            for fault in faults:
-                if fault.get("auto_repairable") and fault["level"] in ["P3", "P2"]:
-                    fault_results = []
-                    try:
-                        repair_result = agent.auto_heal(device_id, fault["description"])
-                        agent_success = "成功" in repair_result or "完成" in repair_result
-                        fault_results.append({
-                            "fault": fault["description"],
-                            "result": repair_result,
-                            "success": agent_success,
-                            "provider": "agent"
-                        })
-                        if agent_success:
-                            knowledge_base.add(
-                                keyword=fault["description"],
-                                title=f"自动修复：{fault['description']}",
-                                solution=repair_result,
-                                fault_level=fault["level"]
-                            )
-                    except Exception as e:
-                        fault_results.append({
-                            "fault": fault["description"],
-                            "result": f"本地修复失败：{str(e)}",
-                            "success": False,
-                            "provider": "agent"
-                        })
-                    repair_results.extend(fault_results)
-
-        # 计算报告哈希（用于日志记录）
-        report_hash = hashlib.sha256(report.encode()).hexdigest()
-
-        return jsonify({
-            "code": 200,
-            "data": {
-                "report": report,
-                "health_score": health_score,
-                "faults": faults,
-                "model_info": {
-                    "model": model_result.get("model", "unknown"),
-                    "time_cost": model_result.get("time_cost", 0),
-                    "accuracy": model_result.get("accuracy", 0)
-                },
-                "knowledge_solutions": knowledge_solutions,
-                "repair_results": repair_results,
-                "evidence": extract_evidence(report),
-                "log_hash": report_hash
-            }
-        })
+        model_result = model_scheduler.predict(prompt, scenario=scenario, output_format="json", model_key=model_key)
+        parsed = parse_batch_response(model_result["result"])
     except Exception as e:
-        return jsonify({"code": 500, "msg": f"分析失败：{str(e)}"})
+        print(f"批量分析失败，改为逐台分析：{e}")
+        model_result, parsed = {}, {}
+
+    results = {}
+    for device_id, metrics, screen in group:
+        item = parsed.get(str(device_id))
+        if item is None:
+            results[str(device_id)] = run_analysis({"device_id": device_id, "scenario": scenario,
+                                                    "latency_budget": latency_budget})
+            continue
+        # 拆分出的单设备结果按单设备分析的缓存键写入，单设备分析与后续批量分析均可复用
+        device_result = {
+            "model": model_result.get("model", "unknown"),
+            "result": format_device_report(item),
+            "time_cost": model_result.get("time_cost", 0),
+            "accuracy": model_result.get("accuracy", 0),
+            "fallback": model_result.get("fallback", False)
+        }
+        if result_cache is not None and cacheable_result(device_result):
+            try:
+                result_cache.set(analysis_cache_key(model_key, scenario, device_id, metrics), device_result)
+            except Exception as e:
+                print(f"写入推理结果缓存失败：{e}")
+        results[str(device_id)] = group_device_result(device_id, metrics, screen, device_result,
+                                                      batch_size=len(group), prompt_info=prompt_info)
+    return results
+
+# 异步分析任务队列（固定数量工作线程，按故障等级优先执行）
+analysis_jobs = AnalysisJobQueue(
+    run_analysis, redis_client,
+    workers=int(os.getenv("AI_JOB_WORKERS", 2)),
+    max_pending=int(os.getenv("AI_JOB_MAX_PENDING", 1000)),
+    ttl=int(os.getenv("AI_JOB_TTL", 86400)),
+    lease_ttl=int(os.getenv("AI_JOB_LEASE_TTL", 60))
+)
+analysis_jobs.start()
+
+@app.post("/api/ai/analyze/jobs")
+def create_analysis_job():
+    return submit_analysis_job(request.json or {})
+
+def submit_analysis_job(data: dict):
+    """
+    提交异步分析任务，立即返回任务ID
+    请求体与 /api/ai/analyze 相同，可额外指定 priority（0-4，越小越优先）与 callback_url（完成后回调）
+    """
+    device_id = data.get("device_id")
+    if not device_id:
+        return jsonify({"code": 400, "msg": "设备ID不能为空"})
+    metrics_data = redis_client.get(f"metrics:{device_id}")
+    if not metrics_data:
+        return jsonify({"code": 404, "msg": "未找到设备采集数据"})
+
+    priority = data.get("priority")
+    if priority is None:
+        priority = priority_for(fault_classifier.prescreen(decode_metrics(metrics_data))["faults"])
+    try:
+        job = analysis_jobs.submit(data, priority=int(priority), callback_url=data.get("callback_url"))
+    except QueueFullError as e:
+        return jsonify({"code": 429, "msg": str(e)}), 429
+    return jsonify({"code": 200, "data": {
+        "job_id": job["id"],
+        "status": job["status"],
+        "priority": job["priority"],
+        "poll_url": f"/api/ai/analyze/jobs/{job['id']}",
+        "events_url": f"/api/ai/analyze/jobs/{job['id']}/events"
+    }})
+
+@app.get("/api/ai/analyze/jobs/<job_id>")
+def get_analysis_job(job_id):
+    job = analysis_jobs.get(job_id)
+    if job is None:
+        return jsonify({"code": 404, "msg": "任务不存在或已过期"})
+    return jsonify({"code": 200, "data": job})
+
+@app.get("/api/ai/analyze/jobs/<job_id>/events")
+def analysis_job_events(job_id):
+    """SSE 订阅任务状态，状态每次变化推送一次，任务结束后关闭连接"""
+    if analysis_jobs.get(job_id) is None:
+        return jsonify({"code": 404, "msg": "任务不存在或已过期"})
+
+    def stream():
+        last_status = None
+        while True:
+            job = analysis_jobs.wait(job_id, last_status)
+            if job is None:
+                yield "event: error\ndata: {\"msg\": \"任务不存在或已过期\"}\n\n"
+                return
+            if job["status"] == last_status:
+                yield ": keep-alive\n\n"
+                continue
+            last_status = job["status"]
+            yield f"event: {job['status']}\ndata: {json.dumps(job, ensure_ascii=False)}\n\n"
+            if job["status"] in FINISHED_STATUSES:
+                return
+
+    return Response(stream(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.get("/api/ai/analyze/jobs")
+def analysis_job_stats():
+    return jsonify({"code": 200, "data": analysis_jobs.stats()})
 
 def calculate_health_score(metrics: dict, faults: list) -> int:
     """计算健康评分（0-100）"""
@@ -135,13 +534,46 @@ def calculate_health_score(metrics: dict, faults: list) -> int:
         base_score -= fault_penalty.get(fault["level"], 0)
 
     # 根据指标扣分
-    if metrics.get("cpu_usage", 0) > 80:
+    thresholds = FaultClassifier.METRIC_THRESHOLDS
+    if (metric_number(metrics.get("cpu_usage")) or 0) > thresholds["cpu_usage"]:
         base_score -= 10
-    if metrics.get("memory_usage", 0) > 90:
+    if (metric_number(metrics.get("memory_usage")) or 0) > thresholds["memory_usage"]:
         base_score -= 10
 
     return max(0, min(100, base_score))
 
+def health_basis(metrics: dict) -> list:
+    """健康评分依据：关键指标与阈值对比"""
+    thresholds = FaultClassifier.METRIC_THRESHOLDS
+    basis = []
+    for key, name in (("cpu_usage", "CPU使用率"), ("memory_usage", "内存使用率")):
+        value = metric_number(metrics.get(key))
+        if value is not None:
+            basis.append(f"{name} {value}%（阈值 {thresholds[key]}%）")
+    interfaces = metrics.get("interfaces") or {}
+    if interfaces:
+        counts = {}
+        for status in interfaces.values():
+            state = status.get("status", "unknown") if isinstance(status, dict) else "unknown"
+            counts[state] = counts.get(state, 0) + 1
+        basis.append("接口状态 " + "，".join(f"{state} {count}个" for state, count in sorted(counts.items())))
+    return basis
+
+def build_prescreen_report(device_id, metrics: dict, health_score: int) -> str:
+    """规则预检未发现异常时生成的报告，结构与模型报告一致"""
+    basis = health_basis(metrics)
+    lines = [
+        f"1. 健康评分：{health_score}",
+        f"   依据：{'；'.join(basis) if basis else '无可用指标'}",
+        "2. 异常项：无",
+        "3. 修复建议：无需修复",
+        "4. 推理链路：",
+        f"   - 读取设备{device_id}的结构化指标",
+        "   - CPU、内存、接口状态、带宽利用率与错包增量均未超过阈值，且无临界或无法解析的指标",
+        "   - 规则预检判定设备健康，未调用大模型"
+    ]
+    return "\n".join(lines)
+
 def extract_evidence(report):
     """提取关键证据"""
     if not report:
@@ -152,6 +584,17 @@ def extract_evidence(report):
             evidence.append(line.strip())
     return evidence
 
+@app.get("/api/ai/cache/stats")
+def cache_stats():
+    if result_cache is None:
+        return jsonify({"code": 200, "data": {"enabled": False}})
+    return jsonify({"code": 200, "data": {"enabled": True, **result_cache.stats()}})
+
+@app.get("/api/ai/models/stats")
+def model_stats():
+    """各推理节点上各模型的预热状态、耗时与错误率 EWMA、并发数"""
+    return jsonify({"code": 200, "data": model_scheduler.stats()})
+
 # 新增：知识库搜索接口
 @app.get("/api/ai/knowledge/search")
 def search_knowledge():
@@ -175,5 +618,14 @@ def add_knowledge():
     )
     return jsonify({"code": 200, "data": {"id": knowledge_id}})
 
+# 重建知识库全文索引
+@app.post("/api/ai/knowledge/rebuild-index")
+def rebuild_knowledge_index():
+    try:
+        count = knowledge_base.rebuild_index()
+    except Exception as e:
+        return jsonify({"code": 500, "msg": f"重建全文索引失败：{str(e)}"})
+    return jsonify({"code": 200, "data": {"indexed": count}})
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=8002)
@@ -0,0 +1,89 @@
+"""
+批量分析：把多台设备的精简指标放入同一个提示词，要求模型按设备输出 JSON，再拆分为单设备报告
+批量巡检大量接入交换机时，分摊提示词固定开销与模型加载开销
+"""
+import json
+import re
+
+from prompt_builder import estimate_tokens, fit_metrics
+
+# 推理模型输出中的思考过程
+THINK_PATTERN = re.compile(r"<think>.*?</think>", re.DOTALL)
+JSON_BLOCK_PATTERN = re.compile(r"\{.*\}", re.DOTALL)
+
+BATCH_PROMPT = """分析以下{count}台设备的指标（{scenario}），只输出一个JSON对象，格式为：
+{{"devices": [{{"device_id": 设备ID, "health_score": 0-100的整数, "basis": "评分依据（关键指标阈值对比）",
+"faults": [{{"level": "P0-P3", "description": "异常项", "evidence": "指标证据"}}],
+"repair_suggestions": ["修复建议（厂商专用命令）"], "reasoning": ["推理步骤"]}}]}}
+每台设备输出一个对象，device_id 与输入一致，不要遗漏设备。
+设备指标：
+{devices}"""
+
+
+def build_batch_prompt(items, scenario, budget):
+    """
+    :param items: [(device_id, metrics)]
+    :param budget: 整个提示词的 token 预算，扣除模板后平均分配给各设备
+    :return: (提示词, 统计信息)
+    """
+    overhead = estimate_tokens(BATCH_PROMPT.format(count=len(items), scenario=scenario, devices=""))
+    device_budget = max(budget - overhead, 0) // max(len(items), 1)
+    lines = []
+    original_tokens = 0
+    truncated = 0
+    for device_id, metrics in items:
+        text, info = fit_metrics(metrics, device_budget)
+        original_tokens += info["original_tokens"]
+        truncated += info["truncated"]
+        lines.append(f'{{"device_id":{json.dumps(device_id)},"metrics":{text}}}')
+    prompt = BATCH_PROMPT.format(count=len(items), scenario=scenario, devices="\n".join(lines))
+    return prompt, {
+        "original_tokens": original_tokens,
+        "prompt_tokens": estimate_tokens(prompt),
+        "budget": budget,
+        "truncated_devices": truncated
+    }
+
+
+def parse_batch_response(text):
+    """解析模型输出，返回 {device_id(str): 设备结果}，无法解析时返回空字典"""
+    text = THINK_PATTERN.sub("", text or "")
+    try:
+        data = json.loads(text)
+    except ValueError:
+        match = JSON_BLOCK_PATTERN.search(text)
+        if not match:
+            return {}
+        try:
+            data = json.loads(match.group(0))
+        except ValueError:
+            return {}
+    devices = data.get("devices", []) if isinstance(data, dict) else data
+    results = {}
+    for item in devices if isinstance(devices, list) else []:
+        if isinstance(item, dict) and item.get("device_id") is not None:
+            results[str(item["device_id"])] = item
+    return results
+
+
+def format_device_report(item):
+    """把单台设备的 JSON 结果转为与单设备分析一致的四段式报告"""
+    lines = [f"1. 健康评分：{item.get('health_score', '未知')}"]
+    if item.get("basis"):
+        lines.append(f"   依据：{item['basis']}")
+    faults = item.get("faults") or []
+    lines.append("2. 异常项：" + ("" if faults else "无"))
+    for fault in faults:
+        if not isinstance(fault, dict):
+            lines.append(f"   - {fault}")
+            continue
+        lines.append(f"   - [{fault.get('level', 'P3')}] {fault.get('description', '')}")
+        if fault.get("evidence"):
+            lines.append(f"     证据：{fault['evidence']}")
+    suggestions = item.get("repair_suggestions") or []
+    lines.append("3. 修复建议：" + ("" if suggestions else "无"))
+    lines.extend(f"   - {suggestion}" for suggestion in suggestions)
+    reasoning = item.get("reasoning") or []
+    lines.append("4. 推理链路：")
+    lines.extend(f"   - {step}" for step in reasoning)
+    return "\n".join(lines)
@@ -8,6 +8,7 @@ P3: 一般（接口未启用、配置建议）
 import re
 from typing import Dict, List, Tuple
 
+
 class FaultClassifier:
     """故障分级与自动修复建议生成器"""
     
@@ -31,6 +32,25 @@ class FaultClassifier:
         ]
     }
     
+    # 故障等级排序（P0 > P1 > P2 > P3）
+    LEVEL_ORDER = {"P0": 0, "P1": 1, "P2": 2, "P3": 3}
+
+    # 指标阈值（指标判断与预检共用）
+    METRIC_THRESHOLDS = {
+        "cpu_usage": 80,         # CPU使用率（%）
+        "memory_usage": 90,      # 内存使用率（%）
+        "interface_util": 90,    # 接口带宽利用率（%）
+        "interface_errors": 100  # 接口错包数（相对上次采集的增量）
+    }
+    # 指标达到阈值的该比例即视为临界，交由模型进一步判断
+    NEAR_THRESHOLD_RATIO = 0.9
+    # 未解析原始输出中的告警关键词
+    RAW_ALERT_PATTERN = re.compile(r"error|fail|alarm|critical|告警|错误|失败|异常", re.IGNORECASE)
+
+    # 预编译的故障关键词（类加载时编译一次），按 FAULT_PATTERNS 中的顺序排列
+    _COMPILED_PATTERNS = [(level, re.compile(pattern, re.IGNORECASE))
+                          for level, patterns in FAULT_PATTERNS.items() for pattern in patterns]
+
     # 自动修复命令映射（华为设备）
     AUTO_REPAIR_COMMANDS = {
         "接口down": {
@@ -54,28 +74,8 @@ class FaultClassifier:
         :param metrics: 设备指标数据
         :return: 故障列表，每个故障包含 {level, description, evidence, repair_suggestion}
         """
-        faults = []
-        
         # 基于关键词匹配
-        for level, patterns in self.FAULT_PATTERNS.items():
-            for pattern in patterns:
-                matches = re.finditer(pattern, report_text, re.IGNORECASE)
-                for match in matches:
-                    # 提取上下文作为证据
-                    start = max(0, match.start() - 50)
-                    end = min(len(report_text), match.end() + 50)
-                    evidence = report_text[start:end].strip()
-                    
-                    fault_desc = match.group(0)
-                    repair_suggestion = self._generate_repair_suggestion(fault_desc, level)
-                    
-                    faults.append({
-                        "level": level,
-                        "description": fault_desc,
-                        "evidence": evidence,
-                        "repair_suggestion": repair_suggestion,
-                        "auto_repairable": level in ["P3", "P2"]  # P3和部分P2可自动修复
-                    })
+        faults = self.match_keywords(report_text, unique=True)
         
         # 基于指标数据补充判断
         if metrics:
@@ -91,38 +91,114 @@ class FaultClassifier:
                 unique_faults.append(fault)
         
         # 按优先级排序（P0 > P1 > P2 > P3）
-        priority_order = {"P0": 0, "P1": 1, "P2": 2, "P3": 3}
-        unique_faults.sort(key=lambda x: priority_order.get(x["level"], 99))
+        unique_faults.sort(key=lambda x: self.LEVEL_ORDER.get(x["level"], 99))
         
         return unique_faults
     
+    def agreement(self, report_text: str, metric_faults: List[Dict]):
+        """
+        模型报告与指标故障的一致性，作为模型输出质量的样本
+        取报告中识别出的故障等级与指标故障等级两个集合的 Jaccard 系数；没有指标故障（无参照）时返回 None
+        """
+        expected = {fault["level"] for fault in metric_faults or []}
+        if not expected:
+            return None
+        found = {fault["level"] for fault in self.match_keywords(report_text or "")}
+        return len(expected & found) / len(expected | found)
+
+    def match_keywords(self, report_text: str, start: int = 0, end: int = None, unique: bool = False) -> List[Dict]:
+        """
+        在报告的 [start, end) 区间内匹配故障关键词（流式分析按完整行增量调用）
+        模式中的 . 不匹配换行，匹配结果不会跨行
+        :param unique: 为 True 时相同等级与描述的故障只保留第一次出现的（classify 只需要去重后的结果）
+        """
+        end = len(report_text) if end is None else end
+        faults = []
+        # 推理模型输出中相同的故障描述反复出现，修复建议按 (描述, 等级) 只生成一次
+        suggestions = {}
+        for level, pattern in self._COMPILED_PATTERNS:
+            for match in pattern.finditer(report_text, start, end):
+                fault_desc = match.group(0)
+                if unique and (fault_desc, level) in suggestions:
+                    continue
+                # 提取上下文作为证据
+                evidence_start = max(0, match.start() - 50)
+                evidence_end = min(len(report_text), match.end() + 50)
+                evidence = report_text[evidence_start:evidence_end].strip()
+
+                repair_suggestion = suggestions.get((fault_desc, level))
+                if repair_suggestion is None:
+                    repair_suggestion = suggestions[(fault_desc, level)] = \
+                        self._generate_repair_suggestion(fault_desc, level)
+
+                faults.append({
+                    "level": level,
+                    "description": fault_desc,
+                    "evidence": evidence,
+                    "repair_suggestion": repair_suggestion,
+                    "auto_repairable": level in ["P3", "P2"]  # P3和部分P2可自动修复
+                })
+        return faults
+
+    def prescreen(self, metrics: Dict) -> Dict:
+        """
+        基于结构化指标的确定性预检
+        :return: {"faults": 指标故障, "ambiguous": 需模型判断的原因, "escalate": 是否需要调用模型}
+        """
+        faults = self._classify_by_metrics(metrics)
+        ambiguous = []
+
+        if not any(key in metrics for key in ("cpu_usage", "memory_usage", "interfaces")):
+            ambiguous.append("缺少CPU、内存与接口等结构化指标")
+        for key, name in (("cpu_usage", "CPU使用率"), ("memory_usage", "内存使用率")):
+            value = metric_number(metrics.get(key))
+            threshold = self.METRIC_THRESHOLDS[key]
+            if value is None and key in metrics:
+                ambiguous.append(f"{name}无法解析：{metrics.get(key)}")
+            elif value is not None and threshold * self.NEAR_THRESHOLD_RATIO <= value <= threshold:
+                ambiguous.append(f"{name}接近阈值：{value}%")
+        for interface, status in (metrics.get("interfaces") or {}).items():
+            if isinstance(status, dict) and status.get("status") not in (None, "up", "down", "admin_down", "standby"):
+                ambiguous.append(f"接口 {interface} 状态未知：{status.get('status')}")
+        for cmd, output in (metrics.get("raw") or {}).items():
+            match = self.RAW_ALERT_PATTERN.search(output or "")
+            if match:
+                ambiguous.append(f"命令 {cmd} 的原始输出包含告警关键词：{match.group(0)}")
+
+        return {"faults": faults, "ambiguous": ambiguous, "escalate": bool(faults or ambiguous)}
+
     def _classify_by_metrics(self, metrics: Dict) -> List[Dict]:
         """基于指标数据判断故障"""
         faults = []
-        
+        thresholds = self.METRIC_THRESHOLDS
+
         # CPU过载判断
-        if metrics.get("cpu_usage", 0) > 80:
+        cpu_usage = metric_number(metrics.get("cpu_usage"))
+        if cpu_usage is not None and cpu_usage > thresholds["cpu_usage"]:
             faults.append({
                 "level": "P2",
-                "description": f"CPU使用率过高：{metrics.get('cpu_usage')}%",
-                "evidence": f"CPU使用率：{metrics.get('cpu_usage')}%",
+                "description": f"CPU使用率过高：{cpu_usage}%",
+                "evidence": f"CPU使用率：{cpu_usage}%",
                 "repair_suggestion": "检查进程占用，优化配置或升级硬件",
                 "auto_repairable": False
             })
-        
+
         # 内存告警判断
-        if metrics.get("memory_usage", 0) > 90:
+        memory_usage = metric_number(metrics.get("memory_usage"))
+        if memory_usage is not None and memory_usage > thresholds["memory_usage"]:
             faults.append({
                 "level": "P2",
-                "description": f"内存使用率过高：{metrics.get('memory_usage')}%",
-                "evidence": f"内存使用率：{metrics.get('memory_usage')}%",
+                "description": f"内存使用率过高：{memory_usage}%",
+                "evidence": f"内存使用率：{memory_usage}%",
                 "repair_suggestion": "清理缓存或重启设备",
                 "auto_repairable": False
             })
-        
-        # 接口down判断
-        for interface, status in metrics.get("interfaces", {}).items():
-            if status.get("status") == "down":
+
+        for interface, status in (metrics.get("interfaces") or {}).items():
+            if not isinstance(status, dict):
+                continue
+            # 接口down判断（admin_down 为人工关闭、从未使用的空闲端口均不视为故障）
+            if status.get("status") == "down" and not interface_unused(status):
                 faults.append({
                     "level": "P1",
                     "description": f"接口 {interface} 状态为down",
@@ -130,9 +206,38 @@ class FaultClassifier:
                     "repair_suggestion": "执行 undo shutdown 命令启用接口",
                     "auto_repairable": True
                 })
-        
+            elif status.get("status") == "up" and status.get("protocol") == "down":
+                faults.append({
+                    "level": "P1",
+                    "description": f"接口 {interface} 物理up但协议down",
+                    "evidence": f"接口 {interface}：{status}",
+                    "repair_suggestion": "检查链路两端协议、速率双工与封装配置",
+                    "auto_repairable": False
+                })
+
+            utilization = max(metric_number(status.get("in_util")) or 0, metric_number(status.get("out_util")) or 0)
+            if utilization > thresholds["interface_util"]:
+                faults.append({
+                    "level": "P2",
+                    "description": f"接口 {interface} 带宽利用率过高：{utilization}%",
+                    "evidence": f"接口 {interface}：{status}",
+                    "repair_suggestion": "检查流量来源，考虑扩容或链路聚合",
+                    "auto_repairable": False
+                })
+
+            # 错包计数器自设备启动累计，按相对上次采集的增量判断
+            errors = interface_error_delta(status)
+            if errors > thresholds["interface_errors"]:
+                faults.append({
+                    "level": "P2",
+                    "description": f"接口 {interface} 错包增长过快：较上次采集新增{int(errors)}",
+                    "evidence": f"接口 {interface}：{status}",
+                    "repair_suggestion": "检查光模块、线缆与对端接口状态",
+                    "auto_repairable": False
+                })
+
         return faults
-    
+
     def _generate_repair_suggestion(self, fault_desc: str, level: str) -> str:
         """生成修复建议"""
         fault_lower = fault_desc.lower()
@@ -153,3 +258,27 @@ class FaultClassifier:
             return "一般问题，建议按计划优化"
 
 
+def interface_unused(status):
+    """
+    未使用的空闲端口：物理与协议均为down、有记录以来从未up过且没有接口描述
+    ever_up 由采集服务按历史快照标注；SNMP 采集只有 ifOperStatus，没有协议状态
+    """
+    return status.get("status") == "down" and status.get("protocol") in (None, "down") \
+        and not status.get("ever_up") and not status.get("description")
+
+
+def interface_error_delta(status):
+    """接口错包数相对上次采集的增量，缺少上次快照时为 0"""
+    return (metric_number(status.get("in_errors_delta")) or 0) + (metric_number(status.get("out_errors_delta")) or 0)
+
+
+def metric_number(value):
+    """指标值转为数值，无法转换时返回 None"""
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return value
+    try:
+        return float(str(value).rstrip("%"))
+    except ValueError:
+        return None
@@ -1,18 +1,36 @@
 """
 运维知识库：存储故障解决方案，支持关键词搜索和自迭代
+- 全文检索使用 FTS5 外部内容表 knowledge_fts（trigram 分词，适用于中文），由触发器与 knowledge 表保持同步
+- 检索结果按 BM25 相关度与命中次数综合排序
+- SQLite 不支持 FTS5 或 trigram 分词（低于 3.34）、或查询词不足 3 个字符时退回 LIKE 模糊搜索
 """
 import json
+import math
 import os
+import re
 import sqlite3
+import sys
 from typing import List, Dict, Optional
 from datetime import datetime
 import hashlib
 
+# trigram 分词只能匹配至少 3 个字符的词
+MIN_FTS_TERM_LENGTH = 3
+# 查询词分隔符（空白与常见中英文标点）
+TERM_SPLIT_PATTERN = re.compile(r"[\s,，。;；:：、!！?？()（）\[\]【】\"'“”‘’]+")
+# BM25 列权重：关键词、标题、解决方案
+BM25_WEIGHTS = (3.0, 2.0, 1.0)
+# 综合排序中命中次数的权重：得分 = BM25 相关度 + HIT_WEIGHT * ln(1 + 命中次数)
+HIT_WEIGHT = 0.5
+# 按 BM25 取出的候选数为 limit 的倍数，再按综合得分截取
+CANDIDATE_FACTOR = 4
+
 class KnowledgeBase:
     """运维知识库管理器"""
     
     def __init__(self, db_path: str = "knowledge_base.db"):
         self.db_path = db_path
+        self.fts_enabled = False
         self._init_db()
     
     def _init_db(self):
@@ -41,11 +59,72 @@ class KnowledgeBase:
         """)
         
         conn.commit()
+        self.fts_enabled = self._init_fts(conn)
         conn.close()
         
         # 初始化默认知识库
         self._init_default_knowledge()
     
+    def _init_fts(self, conn) -> bool:
+        """创建全文索引与同步触发器，新建索引时从 knowledge 表导入已有数据；不支持时返回 False"""
+        cursor = conn.cursor()
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'knowledge_fts'")
+        exists = cursor.fetchone() is not None
+        try:
+            cursor.execute("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS knowledge_fts USING fts5(
+                    keyword, title, solution,
+                    content='knowledge', content_rowid='id', tokenize='trigram'
+                )
+            """)
+            # 只在检索字段变化时同步，搜索时更新命中次数不会触发索引写入
+            cursor.execute("""
+                CREATE TRIGGER IF NOT EXISTS knowledge_fts_insert AFTER INSERT ON knowledge BEGIN
+                    INSERT INTO knowledge_fts(rowid, keyword, title, solution)
+                    VALUES (new.id, new.keyword, new.title, new.solution);
+                END
+            """)
+            cursor.execute("""
+                CREATE TRIGGER IF NOT EXISTS knowledge_fts_delete AFTER DELETE ON knowledge BEGIN
+                    INSERT INTO knowledge_fts(knowledge_fts, rowid, keyword, title, solution)
+                    VALUES ('delete', old.id, old.keyword, old.title, old.solution);
+                END
+            """)
+            cursor.execute("""
+                CREATE TRIGGER IF NOT EXISTS knowledge_fts_update
+                AFTER UPDATE OF keyword, title, solution ON knowledge BEGIN
+                    INSERT INTO knowledge_fts(knowledge_fts, rowid, keyword, title, solution)
+                    VALUES ('delete', old.id, old.keyword, old.title, old.solution);
+                    INSERT INTO knowledge_fts(rowid, keyword, title, solution)
+                    VALUES (new.id, new.keyword, new.title, new.solution);
+                END
+            """)
+            if not exists:
+                cursor.execute("INSERT INTO knowledge_fts(knowledge_fts) VALUES ('rebuild')")
+            conn.commit()
+            return True
+        except sqlite3.OperationalError as e:
+            conn.rollback()
+            print(f"警告：SQLite {sqlite3.sqlite_version} 不支持 FTS5 trigram 全文索引，知识库退回模糊搜索：{e}")
+            return False
+    
+    def rebuild_index(self) -> int:
+        """
+        按 knowledge 表重建全文索引（索引损坏或直接修改过数据库文件后执行）
+        :return: 索引的条目数
+        """
+        if not self.fts_enabled:
+            raise Exception("当前 SQLite 不支持 FTS5 trigram 全文索引")
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute("INSERT INTO knowledge_fts(knowledge_fts) VALUES ('rebuild')")
+        cursor.execute("INSERT INTO knowledge_fts(knowledge_fts) VALUES ('optimize')")
+        cursor.execute("SELECT COUNT(*) FROM knowledge")
+        count = cursor.fetchone()[0]
+        conn.commit()
+        conn.close()
+        return count
+    
     def _init_default_knowledge(self):
         """初始化默认知识库内容"""
         default_knowledge = [
@@ -107,17 +186,32 @@ class KnowledgeBase:
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
-        # 模糊搜索
-        cursor.execute("""
-            SELECT id, keyword, title, solution, device_type, fault_level, hit_count
-            FROM knowledge
-            WHERE keyword LIKE ? OR title LIKE ? OR solution LIKE ?
-            ORDER BY hit_count DESC, update_time DESC
-            LIMIT ?
-        """, (f"%{keyword}%", f"%{keyword}%", f"%{keyword}%", limit))
+        query = self._fts_query(keyword) if self.fts_enabled else None
+        if query:
+            # 全文检索：按 BM25 取出候选，再与命中次数综合排序（bm25() 越小越相关）
+            cursor.execute(f"""
+                SELECT k.id, k.keyword, k.title, k.solution, k.device_type, k.fault_level, k.hit_count,
+                       bm25(knowledge_fts, {', '.join(str(w) for w in BM25_WEIGHTS)}) AS rank
+                FROM knowledge_fts JOIN knowledge k ON k.id = knowledge_fts.rowid
+                WHERE knowledge_fts MATCH ?
+                ORDER BY rank
+                LIMIT ?
+            """, (query, limit * CANDIDATE_FACTOR))
+            rows = sorted(cursor.fetchall(),
+                          key=lambda row: -row[7] + HIT_WEIGHT * math.log1p(row[6] or 0), reverse=True)[:limit]
+        else:
+            # 模糊搜索
+            cursor.execute("""
+                SELECT id, keyword, title, solution, device_type, fault_level, hit_count
+                FROM knowledge
+                WHERE keyword LIKE ? OR title LIKE ? OR solution LIKE ?
+                ORDER BY hit_count DESC, update_time DESC
+                LIMIT ?
+            """, (f"%{keyword}%", f"%{keyword}%", f"%{keyword}%", limit))
+            rows = cursor.fetchall()
         
         results = []
-        for row in cursor.fetchall():
+        for row in rows:
             results.append({
                 "id": row[0],
                 "keyword": row[1],
@@ -138,6 +232,17 @@ class KnowledgeBase:
         
         return results
     
+    @staticmethod
+    def _fts_query(keyword: str) -> Optional[str]:
+        """
+        把搜索词转为 FTS5 查询：按空白与标点切分，每段作为短语（trigram 下即子串匹配）以 OR 连接
+        不足 3 个字符的片段无法用 trigram 匹配，被忽略；全部片段都不足时返回 None（退回模糊搜索）
+        """
+        terms = [t for t in TERM_SPLIT_PATTERN.split(keyword or "") if len(t) >= MIN_FTS_TERM_LENGTH]
+        if not terms:
+            return None
+        return " OR ".join('"' + t.replace('"', '""') + '"' for t in dict.fromkeys(terms))
+    
     def get_by_id(self, knowledge_id: int) -> Optional[Dict]:
         """根据ID获取知识条目"""
         conn = sqlite3.connect(self.db_path)
@@ -194,3 +299,10 @@ class KnowledgeBase:
         conn.close()
 
 
+if __name__ == "__main__":
+    # 重建全文索引：python knowledge_base.py rebuild-index [数据库路径]
+    if len(sys.argv) < 2 or sys.argv[1] != "rebuild-index":
+        print("用法：python knowledge_base.py rebuild-index [数据库路径]")
+        sys.exit(1)
+    kb = KnowledgeBase(sys.argv[2] if len(sys.argv) > 2 else "knowledge_base.db")
+    print(f"全文索引重建完成，共 {kb.rebuild_index()} 条知识")
@@ -0,0 +1,43 @@
+"""
+指标缓存解码：与 collect-service/storage/codec.py 的编码格式保持一致
+格式：1 字节版本号 + 1 字节编码标志 + 负载（低 4 位 1=JSON、2=msgpack，0x10 表示 zstd 压缩）
+以 "{" 开头的数据为旧版纯 JSON
+"""
+import json
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+FORMAT_VERSION = 1
+SERIALIZER_MSGPACK = 2
+FLAG_ZSTD = 0x10
+
+
+def decode_metrics(data):
+    """解码 Redis 中的指标数据，data 为空时返回 None"""
+    if data is None:
+        return None
+    if isinstance(data, str):
+        data = data.encode()
+    if data[:1] in (b"{", b"["):
+        return json.loads(data)
+    version, flags = data[0], data[1]
+    if version != FORMAT_VERSION:
+        raise ValueError(f"不支持的指标编码版本：{version}")
+    payload = data[2:]
+    if flags & FLAG_ZSTD:
+        if zstandard is None:
+            raise ValueError("指标数据经过 zstd 压缩，但未安装 zstandard")
+        payload = zstandard.ZstdDecompressor().decompress(payload)
+    if flags & 0x0F == SERIALIZER_MSGPACK:
+        if msgpack is None:
+            raise ValueError("指标数据为 msgpack 编码，但未安装 msgpack")
+        return msgpack.unpackb(payload, raw=False, strict_map_key=False)
+    return json.loads(payload)
@@ -1,92 +1,434 @@
 """
 多模型调度器：根据场景自动选择最优模型
 支持 DeepSeek-R1-7B、Llama 3 8B、Qwen 7B
+- OLLAMA_URL 可配置多个推理节点（逗号分隔），每个节点上的每个模型为一个后端
+- 启动时预热模型，之后定期发送 keep-alive 请求，避免空闲后首个请求承担模型加载耗时
+- 按后端统计耗时与错误率的指数滑动平均（EWMA）；失败的后端冷却一段时间后再参与调度
+- 同一模型优先选择并发数最少、耗时最低的节点；首选模型不可用或过慢时降级到次优模型，
+  过慢标记在 slow_ttl 后失效，后端重新参与调度并以新的实测耗时重新计算
+- 按模型统计实测耗时与输出质量（报告与指标故障的一致性）的 EWMA，以配置值为初始值；
+  耗时按负载类型分别统计（single 单设备分析、batch 多设备批量分析），两者提示词与输出长度相差数倍；
+  调用方给出耗时预算时，在预计耗时不超过预算的模型中选择质量最高的；
+  质量更高但预计超预算、且超过 probe_interval 未采样的模型，每个周期在后台发送一次合成请求重新测量，
+  调用方的请求仍交给预算内的模型，不因探测超出预算
 """
 from langchain.llms import Ollama
 import os
+import threading
 import time
 from typing import Dict, List, Tuple
 
+import requests
+
+# EWMA 平滑系数
+EWMA_ALPHA = 0.3
+# 负载类型：单设备分析 / 多设备批量分析（JSON 输出）
+WORKLOADS = ("single", "batch")
+# 重新测量耗时用的合成请求，输出格式与实际分析一致
+_PROBE_METRICS = ('{"cpu_usage": 92, "memory_usage": 81, "interfaces": {"GigabitEthernet0/0/1": '
+                  '{"status": "down", "in_errors_delta": 120}, "GigabitEthernet0/0/2": {"status": "up"}}}')
+PROBE_PROMPTS = {
+    "single": "分析设备probe的指标，输出：1. 健康评分（0-100）及依据；2. 异常项（严重等级P0-P3，附证据）；"
+              "3. 修复建议（厂商专用命令）；4. 推理链路（步骤拆解）。指标：" + _PROBE_METRICS,
+    "batch": '分析以下2台设备的指标，只输出一个JSON对象，格式为：{"devices": [{"device_id": 设备ID, '
+             '"health_score": 0-100的整数, "basis": "评分依据", "faults": [{"level": "P0-P3", '
+             '"description": "异常项", "evidence": "指标证据"}], "repair_suggestions": ["修复建议"], '
+             '"reasoning": ["推理步骤"]}]}\n设备指标：\n'
+             + "\n".join(f'{{"device_id":{i},"metrics":{_PROBE_METRICS}}}' for i in (1, 2))
+}
+
+
+class ModelBackend:
+    """单个推理节点上的单个模型"""
+
+    def __init__(self, endpoint: str, model_key: str, config: Dict):
+        self.endpoint = endpoint
+        self.model_key = model_key
+        self.model = config["model"]
+        self.llm = Ollama(model=config["model"], base_url=endpoint, num_ctx=config["context_window"])
+        # 约束输出为 JSON 的实例（批量分析使用）
+        self.json_llm = Ollama(model=config["model"], base_url=endpoint, num_ctx=config["context_window"],
+                               format="json")
+        self.latency = None     # 推理耗时 EWMA（秒）
+        self.latency_at = 0.0   # 最近一次耗时采样时间
+        self.error_rate = 0.0   # 错误率 EWMA
+        self.in_flight = 0
+        self.failures = 0       # 连续失败次数
+        self.down_until = 0.0
+        self.warm = False
+        self.last_error = None
+
+    def available(self, now: float) -> bool:
+        return now >= self.down_until
+
+    def slow(self, now: float, slow_seconds: float, slow_ttl: float) -> bool:
+        """耗时 EWMA 超过阈值且采样未过期"""
+        return self.latency is not None and self.latency > slow_seconds and now - self.latency_at < slow_ttl
+
+    def to_dict(self) -> Dict:
+        return {
+            "endpoint": self.endpoint,
+            "model": self.model,
+            "latency": round(self.latency, 2) if self.latency is not None else None,
+            "error_rate": round(self.error_rate, 3),
+            "in_flight": self.in_flight,
+            "available": self.available(time.time()),
+            "warm": self.warm,
+            "last_error": self.last_error
+        }
+
+
 class ModelScheduler:
     """场景化模型调度器"""
-    
-    def __init__(self, ollama_url: str):
-        self.ollama_url = ollama_url
+
+    def __init__(self, ollama_url: str, keep_alive: str = "30m", keepalive_interval: int = 240,
+                 slow_seconds: float = 60, slow_ttl: int = 600, cooldown: int = 30, max_attempts: int = 3,
+                 probe_interval: int = 1800):
+        """
+        :param ollama_url: Ollama 地址，多个节点以逗号分隔
+        :param keep_alive: 预热与 keep-alive 请求要求 Ollama 保留模型的时长
+        :param keepalive_interval: keep-alive 请求间隔（秒），为 0 时只在启动时预热
+        :param slow_seconds: 耗时 EWMA 超过该值的后端视为过慢，优先使用其他模型
+        :param slow_ttl: 过慢标记的有效期（秒），期间没有新采样则重新参与调度
+        :param cooldown: 后端失败后的冷却时间（秒），连续失败时加倍
+        :param max_attempts: 单次预测最多尝试的后端数
+        :param probe_interval: 模型的耗时超过该时长（秒）未采样时，按预算选择会在后台发送一次合成请求重新测量
+        """
+        self.endpoints = [url.strip().rstrip("/") for url in (ollama_url or "").split(",") if url.strip()]
+        self.ollama_url = self.endpoints[0] if self.endpoints else ollama_url
+        self.keep_alive = keep_alive
+        self.keepalive_interval = keepalive_interval
+        self.slow_seconds = slow_seconds
+        self.slow_ttl = slow_ttl
+        self.cooldown = cooldown
+        self.max_attempts = max_attempts
+        self.probe_interval = probe_interval
         self.models = {
             "deepseek-r1": {
                 "model": "deepseek-r1-finetuned",
                 "use_case": ["复杂故障分析", "路由环路", "配置错误", "P0/P1级故障"],
                 "accuracy": 0.95,  # 微调后准确率
-                "speed": "慢"
+                "speed": "慢",
+                "expected_latency": 40,  # 预计推理耗时（秒），实测 EWMA 的初始值
+                "expected_batch_latency": 120,  # 批量分析（一次多台设备）的预计耗时（秒）
+                "context_window": 8192,  # num_ctx，提示词与输出共用
+                "prompt_budget": 3000  # 提示词 token 预算，其余留给输出
             },
             "llama3": {
                 "model": "llama3:8b",
                 "use_case": ["通用巡检", "中等复杂度分析"],
                 "accuracy": 0.88,
-                "speed": "中"
+                "speed": "中",
+                "expected_latency": 20,  # 预计推理耗时（秒），实测 EWMA 的初始值
+                "expected_batch_latency": 60,  # 批量分析（一次多台设备）的预计耗时（秒）
+                "context_window": 8192,
+                "prompt_budget": 3000
             },
             "qwen": {
                 "model": "qwen:7b",
                 "use_case": ["简单巡检", "快速分析", "P3级故障"],
                 "accuracy": 0.85,
-                "speed": "快"
+                "speed": "快",
+                "expected_latency": 10,  # 预计推理耗时（秒），实测 EWMA 的初始值
+                "expected_batch_latency": 30,  # 批量分析（一次多台设备）的预计耗时（秒）
+                "context_window": 8192,
+                "prompt_budget": 1500
             }
         }
-        self.llm_instances = {}
+        # 按模型统计的质量 EWMA，耗时 EWMA 按负载类型分别统计
+        now = time.time()
+        self.model_stats = {
+            key: {"quality": config["accuracy"], "quality_samples": 0,
+                  "workloads": {
+                      workload: {"latency": config["expected_batch_latency" if workload == "batch" else "expected_latency"],
+                                 "samples": 0, "sampled_at": now, "probed_at": 0.0}
+                      for workload in WORKLOADS
+                  }}
+            for key, config in self.models.items()
+        }
+        self.backends: List[ModelBackend] = []
+        self._lock = threading.Lock()
+        self._threads = []
         self._init_models()
-    
+
     def _init_models(self):
-        """初始化所有模型实例"""
-        for key, config in self.models.items():
-            try:
-                self.llm_instances[key] = Ollama(
-                    model=config["model"],
-                    base_url=self.ollama_url
-                )
-            except Exception as e:
-                print(f"警告：模型 {key} 初始化失败：{e}")
-    
-    def select_model(self, scenario: str, fault_level: str = None) -> str:
+        """初始化所有节点上的模型实例"""
+        for endpoint in self.endpoints:
+            for key, config in self.models.items():
+                try:
+                    self.backends.append(ModelBackend(endpoint, key, config))
+                except Exception as e:
+                    print(f"警告：节点 {endpoint} 上的模型 {key} 初始化失败：{e}")
+
+    def start(self):
+        """每个节点启动一个线程：预热全部模型，之后定期发送 keep-alive 请求"""
+        for endpoint in self.endpoints:
+            thread = threading.Thread(target=self._keepalive_loop, args=(endpoint,),
+                                      name=f"ollama-keepalive-{endpoint}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _keepalive_loop(self, endpoint: str):
+        backends = [b for b in self.backends if b.endpoint == endpoint]
+        while True:
+            for backend in backends:
+                self._ping(backend)
+            if self.keepalive_interval <= 0:
+                return
+            time.sleep(self.keepalive_interval)
+
+    def _ping(self, backend: ModelBackend):
+        """
+        加载模型并要求 Ollama 保留 keep_alive 时长（空提示词只加载模型，不生成内容）
+        同时作为健康检查：失败的后端进入冷却，成功则恢复
+        """
+        start_time = time.time()
+        try:
+            resp = requests.post(f"{backend.endpoint}/api/generate",
+                                 json={"model": backend.model, "prompt": "", "keep_alive": self.keep_alive},
+                                 timeout=300)
+            resp.raise_for_status()
+        except Exception as e:
+            backend.warm = False
+            self._update_health(backend, error=e)
+            print(f"模型 {backend.model} 在节点 {backend.endpoint} 预热失败：{e}")
+            return
+        if not backend.warm:
+            print(f"模型 {backend.model} 在节点 {backend.endpoint} 已加载（{time.time() - start_time:.1f}秒）")
+        backend.warm = True
+        self._update_health(backend)
+
+    def select_model(self, scenario: str, fault_level: str = None, latency_budget: float = None,
+                     workload: str = "single") -> str:
         """
         根据场景和故障等级选择最优模型
         :param scenario: 巡检场景（简单巡检/复杂故障/路由分析等）
         :param fault_level: 故障等级（P0/P1/P2/P3）
+        :param latency_budget: 耗时预算（秒），给出时按实测耗时与质量选择，不再按场景
+        :param workload: 负载类型 single/batch，按对应的实测耗时比较预算
         :return: 模型key
         """
+        if latency_budget is not None:
+            return self.select_by_budget(float(latency_budget), workload)
+
         # 高优先级故障使用DeepSeek
         if fault_level in ["P0", "P1"]:
             return "deepseek-r1"
-        
+
         # 简单场景使用Qwen提速
         if scenario in ["简单巡检", "快速分析"] or fault_level == "P3":
             return "qwen"
-        
+
         # 默认使用Llama3
         return "llama3"
-    
-    def predict(self, prompt: str, scenario: str = "通用巡检", fault_level: str = None) -> Dict:
+
+    def select_by_budget(self, latency_budget: float, workload: str = "single") -> str:
         """
-        使用最优模型进行预测
-        :return: {"model": 模型名, "result": 结果, "time_cost": 耗时}
+        预计耗时不超过预算的模型中质量最高的；没有模型满足预算时选择预计耗时最短的
+        质量更高、预计超预算但长时间未采样的模型每 probe_interval 在后台探测一次，避免过时的耗时估计永久排除该模型
         """
-        model_key = self.select_model(scenario, fault_level)
-        model_config = self.models[model_key]
-        llm = self.llm_instances.get(model_key)
-        
-        if not llm:
-            raise Exception(f"模型 {model_key} 未初始化")
-        
+        now = time.time()
+        with self._lock:
+            available = {b.model_key for b in self.backends if b.available(now)} or set(self.models)
+            stats = {key: self.model_stats[key]["workloads"][workload] for key in self.models if key in available}
+            fitting = [key for key in stats if stats[key]["latency"] <= latency_budget]
+            if fitting:
+                choice = max(fitting, key=lambda key: self.model_stats[key]["quality"])
+            else:
+                choice = min(stats, key=lambda key: stats[key]["latency"])
+            stale = [key for key in stats
+                     if self.model_stats[key]["quality"] > self.model_stats[choice]["quality"]
+                     and now - max(stats[key]["sampled_at"], stats[key]["probed_at"]) >= self.probe_interval]
+            probe = max(stale, key=lambda key: self.model_stats[key]["quality"]) if stale else None
+            if probe:
+                stats[probe]["probed_at"] = now
+        if probe:
+            print(f"模型 {probe} 的{workload}耗时超过{self.probe_interval}秒未采样，后台发送合成请求重新测量")
+            threading.Thread(target=self._probe, args=(probe, workload),
+                             name=f"model-probe-{probe}", daemon=True).start()
+        return choice
+
+    def _probe(self, model_key: str, workload: str):
+        """向模型当前最优的后端发送一次合成请求，耗时计入该负载类型的 EWMA"""
+        backend = next((b for b in self.candidates(model_key) if b.model_key == model_key), None)
+        if backend is None:
+            return
+        llm = backend.json_llm if workload == "batch" else backend.llm
+        self._acquire(backend)
         start_time = time.time()
         try:
-            result = llm(prompt)
+            llm(PROBE_PROMPTS[workload])
+        except Exception as e:
+            self._release(backend, error=e, workload=workload)
+            print(f"模型 {backend.model} 在节点 {backend.endpoint} 探测失败：{e}")
+            return
+        self._release(backend, time.time() - start_time, workload=workload)
+
+    def record_quality(self, model: str, score: float):
+        """
+        记录一次模型输出质量样本（0-1）
+        :param model: 模型key或模型名
+        """
+        key = model if model in self.models else next(
+            (k for k, config in self.models.items() if config["model"] == model), None)
+        if key is None or score is None:
+            return
+        with self._lock:
+            stats = self.model_stats[key]
+            stats["quality"] = EWMA_ALPHA * score + (1 - EWMA_ALPHA) * stats["quality"]
+            stats["quality_samples"] += 1
+
+    def prompt_budget(self, model_key: str) -> int:
+        """模型的提示词 token 预算"""
+        return self.models[model_key]["prompt_budget"]
+
+    def candidates(self, model_key: str) -> List[ModelBackend]:
+        """
+        按调度顺序排列的后端：可用优先，其次非过慢（过慢标记 slow_ttl 内有效），
+        再按模型（首选模型在前，其余按准确率降序）、并发数、耗时 EWMA 排序；全部不可用时仍按该顺序尝试
+        """
+        rank = {model_key: 0}
+        for key in sorted(self.models, key=lambda k: -self.models[k]["accuracy"]):
+            rank.setdefault(key, len(rank))
+        now = time.time()
+        with self._lock:
+            return sorted(self.backends, key=lambda b: (
+                not b.available(now),
+                b.slow(now, self.slow_seconds, self.slow_ttl),
+                rank[b.model_key],
+                b.in_flight,
+                b.latency or 0
+            ))
+
+    def _acquire(self, backend: ModelBackend):
+        with self._lock:
+            backend.in_flight += 1
+
+    def _release(self, backend: ModelBackend, time_cost: float = None, error: Exception = None,
+                 workload: str = "single"):
+        with self._lock:
+            backend.in_flight = max(0, backend.in_flight - 1)
+        self._update_health(backend, time_cost, error, workload)
+
+    def _update_health(self, backend: ModelBackend, time_cost: float = None, error: Exception = None,
+                       workload: str = "single"):
+        """
+        更新耗时与错误率 EWMA；失败时进入冷却，连续失败时冷却时间加倍（最多 8 倍）
+        :param workload: 本次推理的负载类型，模型耗时计入对应类型的 EWMA
+        """
+        with self._lock:
+            if time_cost is not None and error is None:
+                now = time.time()
+                # 过期的 EWMA 不再代表当前状态（如节点负载已下降），以新样本重新开始
+                stale = backend.latency is None or now - backend.latency_at >= self.slow_ttl
+                backend.latency = time_cost if stale else \
+                    EWMA_ALPHA * time_cost + (1 - EWMA_ALPHA) * backend.latency
+                backend.latency_at = now
+                stats = self.model_stats[backend.model_key]["workloads"][workload]
+                stats["latency"] = EWMA_ALPHA * time_cost + (1 - EWMA_ALPHA) * stats["latency"]
+                stats["samples"] += 1
+                stats["sampled_at"] = now
+            backend.error_rate = EWMA_ALPHA * (error is not None) + (1 - EWMA_ALPHA) * backend.error_rate
+            if error is None:
+                backend.failures = 0
+                backend.down_until = 0.0
+            else:
+                backend.failures += 1
+                backend.last_error = str(error)
+                backend.down_until = time.time() + self.cooldown * min(2 ** (backend.failures - 1), 8)
+
+    def predict(self, prompt: str, scenario: str = "通用巡检", fault_level: str = None,
+                output_format: str = None, model_key: str = None) -> Dict:
+        """
+        使用最优模型进行预测，后端失败时依次尝试下一个
+        :param output_format: 为 json 时要求模型输出合法 JSON（批量分析），耗时计入 batch 负载
+        :param model_key: 调用方已选定的模型，为空时按场景选择
+        :return: {"model": 模型名, "result": 结果, "time_cost": 耗时, "endpoint": 节点, "fallback": 是否降级}
+        """
+        model_key = model_key or self.select_model(scenario, fault_level)
+        backends = self.candidates(model_key)[:self.max_attempts]
+        if not backends:
+            raise Exception(f"模型 {model_key} 未初始化")
+        workload = "batch" if output_format == "json" else "single"
+
+        errors = []
+        for backend in backends:
+            llm = backend.json_llm if output_format == "json" else backend.llm
+            self._acquire(backend)
+            start_time = time.time()
+            try:
+                result = llm(prompt)
+            except Exception as e:
+                self._release(backend, error=e, workload=workload)
+                errors.append(f"{backend.model}@{backend.endpoint}：{e}")
+                continue
             time_cost = time.time() - start_time
+            self._release(backend, time_cost, workload=workload)
             return {
-                "model": model_config["model"],
+                "model": backend.model,
                 "result": result,
                 "time_cost": round(time_cost, 2),
-                "accuracy": model_config["accuracy"]
+                "accuracy": self.models[backend.model_key]["accuracy"],
+                "endpoint": backend.endpoint,
+                "fallback": backend.model_key != model_key
             }
-        except Exception as e:
-            raise Exception(f"模型推理失败：{str(e)}")
+        raise Exception(f"模型推理失败：{'；'.join(errors)}")
 
+    def predict_stream(self, prompt: str, scenario: str = "通用巡检", fault_level: str = None,
+                       route: Dict = None, model_key: str = None):
+        """
+        流式预测：逐段产出模型输出文本
+        尚未产出内容时后端失败会换下一个后端；实际使用的模型、节点写入 route
+        调用方停止迭代（关闭生成器）即断开与 Ollama 的连接，Ollama 随之停止生成
+        """
+        model_key = model_key or self.select_model(scenario, fault_level)
+        backends = self.candidates(model_key)[:self.max_attempts]
+        if not backends:
+            raise Exception(f"模型 {model_key} 未初始化")
+
+        errors = []
+        for backend in backends:
+            self._acquire(backend)
+            start_time = time.time()
+            stream = backend.llm.stream(prompt)
+            produced = False
+            try:
+                for chunk in stream:
+                    if not produced:
+                        produced = True
+                        if route is not None:
+                            route.update({
+                                "model": backend.model,
+                                "endpoint": backend.endpoint,
+                                "accuracy": self.models[backend.model_key]["accuracy"],
+                                "fallback": backend.model_key != model_key
+                            })
+                    yield chunk
+            except GeneratorExit:
+                # 调用方提前停止，耗时不代表完整推理，不计入 EWMA
+                self._release(backend)
+                raise
+            except Exception as e:
+                self._release(backend, error=e)
+                if produced:
+                    raise Exception(f"模型推理失败：{str(e)}")
+                errors.append(f"{backend.model}@{backend.endpoint}：{e}")
+                continue
+            finally:
+                stream.close()
+            self._release(backend, time.time() - start_time)
+            return
+        raise Exception(f"模型推理失败：{'；'.join(errors)}")
 
+    def stats(self) -> Dict:
+        with self._lock:
+            models = {key: {"model": self.models[key]["model"],
+                            "latency": {workload: round(item["latency"], 2)
+                                        for workload, item in stats["workloads"].items()},
+                            "latency_samples": {workload: item["samples"]
+                                                for workload, item in stats["workloads"].items()},
+                            "quality": round(stats["quality"], 3),
+                            "quality_samples": stats["quality_samples"]}
+                      for key, stats in self.model_stats.items()}
+            return {"endpoints": self.endpoints, "models": models,
+                    "backends": [b.to_dict() for b in self.backends]}
@@ -0,0 +1,181 @@
+"""
+提示词构建：把设备指标压缩为精简的关键事实后再交给模型
+- 去掉采集过程信息、每次都会变化的字段，以及原始输出中的分页符、命令提示符、分隔线、图例和空行
+- 接口表汇总为各状态数量，只列出异常或接近阈值的接口
+- 较长的原始输出只保留表头与含告警关键词的行，其余行以行数代替
+- 按模型的提示词 token 预算逐级收紧保留的行数与接口数，仍超出时截断
+推理节点为 CPU 部署的 Ollama，提示词长度是推理耗时的主要来源
+"""
+import json
+import re
+
+from fault_classifier import FaultClassifier, interface_error_delta, interface_unused, metric_number
+
+# 不影响分析结论的字段
+DROP_KEYS = {"collection", "uptime_seconds", "timestamp", "collect_time"}
+
+ANSI_PATTERN = re.compile(r"\x1b\[[0-9;?]*[A-Za-z]|[\x08\r]")
+# 分页符、命令提示符（<HUAWEI>、[~HUAWEI]、Switch#）、分隔线、版权与图例行
+NOISE_LINE_PATTERN = re.compile(
+    r"^\s*(?:-+\s*more\s*-+|<[\w.-]+>.*|\[[~*]?[\w.-]+\].*"
+    r"|[\w.-]+(?:\([\w-]+\))?[#>](?:\s*(?:show|display|terminal|screen-length)\b.*)?|[-=*_+\s]+"
+    r"|.*copyright.*|.*all rights reserved.*|info:.*"
+    r"|phy:.*|\*down:.*|\^down:.*|#down:.*|\([a-z]\):.*|inuti/oututi:.*|codes:.*)$",
+    re.IGNORECASE
+)
+SPACE_PATTERN = re.compile(r"[ \t]{2,}")
+# 原始输出中需要保留的告警行
+ALERT_LINE_PATTERN = re.compile(
+    r"down|error|fail|alarm|critical|drop|discard|timeout|unreachable|告警|错误|失败|异常|中断",
+    re.IGNORECASE
+)
+CJK_PATTERN = re.compile(r"[　-〿一-鿿＀-￯]")
+
+# 每条命令原始输出默认保留的最大行数，超出预算时逐级减半
+MAX_RAW_LINES = 40
+# 默认列出的异常接口数上限
+MAX_INTERFACES = 50
+NORMAL_INTERFACE_STATUSES = ("up", "admin_down", "standby")
+
+
+def estimate_tokens(text):
+    """
+    估算 token 数：中文字符约 1 个 token，其余字符约 4 个字符 1 个 token
+    推理节点上无法获取各模型的分词器，估算值用于预算控制与统计
+    """
+    cjk = len(CJK_PATTERN.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def clean_output(output):
+    """去掉原始输出中的控制字符与噪声行，压缩连续空白，返回行列表"""
+    lines = []
+    for line in ANSI_PATTERN.sub("", output or "").splitlines():
+        line = line.rstrip()
+        if not line.strip() or NOISE_LINE_PATTERN.match(line):
+            continue
+        lines.append(SPACE_PATTERN.sub("  ", line))
+    return lines
+
+
+def summarize_output(output, max_lines=MAX_RAW_LINES):
+    """
+    精简单条命令的原始输出：不超过 max_lines 行时原样保留（已去噪）；
+    否则保留表头与告警行，其余以行数代替
+    """
+    lines = clean_output(output)
+    if len(lines) <= max_lines:
+        return "\n".join(lines)
+    if max_lines == 0:
+        return f"（共{len(lines)}行，已省略）"
+    kept = [lines[0]] + [line for line in lines[1:] if ALERT_LINE_PATTERN.search(line)]
+    omitted = len(lines) - len(kept)
+    if len(kept) > max_lines:
+        omitted += len(kept) - max_lines
+        kept = kept[:max_lines]
+    kept.append(f"（其余{omitted}行无告警关键词，已省略）")
+    return "\n".join(kept)
+
+
+def interface_abnormal(status):
+    """接口是否需要列入提示词：状态异常（未使用的空闲端口除外）、协议down、利用率接近阈值或错包数有增长"""
+    thresholds = FaultClassifier.METRIC_THRESHOLDS
+    ratio = FaultClassifier.NEAR_THRESHOLD_RATIO
+    if interface_unused(status):
+        return False
+    if status.get("status") not in NORMAL_INTERFACE_STATUSES:
+        return True
+    if status.get("status") == "up" and status.get("protocol") == "down":
+        return True
+    utilization = max(metric_number(status.get("in_util")) or 0, metric_number(status.get("out_util")) or 0)
+    return utilization >= thresholds["interface_util"] * ratio or interface_error_delta(status) > 0
+
+
+def summarize_interfaces(interfaces, limit=MAX_INTERFACES):
+    """接口表汇总：各状态数量 + 异常接口明细（按利用率与错包数排序，最多 limit 个）"""
+    counts = {}
+    abnormal = []
+    for name, status in interfaces.items():
+        if not isinstance(status, dict):
+            status = {"status": status}
+        # 未使用的空闲端口单独计数，避免模型把大量空闲端口的down当作故障
+        state = "unused" if interface_unused(status) else str(status.get("status", "unknown"))
+        counts[state] = counts.get(state, 0) + 1
+        if interface_abnormal(status):
+            abnormal.append((name, {k: v for k, v in status.items() if v is not None}))
+    abnormal.sort(key=lambda item: (
+        item[1].get("status") in NORMAL_INTERFACE_STATUSES,
+        -max(metric_number(item[1].get("in_util")) or 0, metric_number(item[1].get("out_util")) or 0),
+        -interface_error_delta(item[1])
+    ))
+    summary = {"total": len(interfaces), "by_status": counts}
+    if abnormal:
+        summary["abnormal"] = dict(abnormal[:limit])
+        if len(abnormal) > limit:
+            summary["abnormal_omitted"] = len(abnormal) - limit
+    return summary
+
+
+def compact_metrics(metrics, max_lines=MAX_RAW_LINES, max_interfaces=MAX_INTERFACES):
+    """把设备指标压缩为关键事实"""
+    facts = {}
+    for key, value in (metrics or {}).items():
+        if key in DROP_KEYS:
+            continue
+        if key == "interfaces" and isinstance(value, dict):
+            facts[key] = summarize_interfaces(value, max_interfaces)
+        elif key == "raw" and isinstance(value, dict):
+            raw = {cmd: summarize_output(output, max_lines) for cmd, output in value.items()}
+            facts[key] = {cmd: output for cmd, output in raw.items() if output}
+        elif isinstance(value, str) and "\n" in value:
+            facts[key] = summarize_output(value, max_lines)
+        else:
+            facts[key] = value
+    return facts
+
+
+def dump_facts(facts):
+    return json.dumps(facts, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+def fit_metrics(metrics, budget):
+    """
+    在 token 预算内生成指标文本
+    :return: (指标文本, 统计信息)
+    """
+    original = estimate_tokens(json.dumps(metrics or {}, ensure_ascii=False, default=str))
+    max_lines, max_interfaces = MAX_RAW_LINES, MAX_INTERFACES
+    while True:
+        text = dump_facts(compact_metrics(metrics, max_lines, max_interfaces))
+        tokens = estimate_tokens(text)
+        if tokens <= budget or (max_lines == 0 and max_interfaces == 0):
+            break
+        max_lines //= 2
+        max_interfaces //= 2
+
+    truncated = tokens > budget
+    if truncated:
+        # 按比例截断字符数，末尾标注以免模型把截断误判为输出异常
+        text = text[:max(0, len(text) * budget // tokens - 10)] + "…（已截断）"
+        tokens = estimate_tokens(text)
+    return text, {
+        "original_tokens": original,
+        "metrics_tokens": tokens,
+        "budget": budget,
+        "raw_lines_per_command": max_lines,
+        "truncated": truncated
+    }
+
+
+def build_prompt(template, metrics, budget, **fields):
+    """
+    用精简后的指标填充提示词模板（模板中的 {metrics} 占位指标文本）
+    :param budget: 整个提示词的 token 预算，扣除模板本身后分配给指标
+    :return: (提示词, 统计信息)，统计信息中 prompt_tokens 为整个提示词的估算 token 数
+    """
+    overhead = estimate_tokens(template.format(metrics="", **fields))
+    text, info = fit_metrics(metrics, max(budget - overhead, 0))
+    prompt = template.format(metrics=text, **fields)
+    info["prompt_tokens"] = estimate_tokens(prompt)
+    info["budget"] = budget
+    return prompt, info
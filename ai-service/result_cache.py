@@ -0,0 +1,117 @@
+"""
+模型推理结果缓存：相同模型、场景、设备与指标的分析直接复用上次的推理结果
+- 缓存键为 sha256(模型, 场景, 设备ID, 规范化指标)，规范化时去掉采集时间、运行时长等每次都会变化的字段
+  报告正文中带有设备名，指标相同的不同设备不共用结果
+- raw 中原始输出的运行时长、时间戳行已由 collect-service 在写入快照前去掉（见 collect-service/storage/delta.py），
+  这里不再重复过滤
+- 结果存放在 Redis 中并设置 TTL；有序集合记录最近访问时间，超过容量上限时淘汰最久未访问的条目
+- 进程内单飞：同一缓存键同时只有一个请求执行推理，其余请求等待并共享其结果
+"""
+import hashlib
+import json
+import threading
+import time
+
+# 每次采集都会变化、但不影响分析结论的字段
+VOLATILE_KEYS = {"collection", "uptime_seconds", "timestamp", "collect_time"}
+
+
+def normalize_metrics(value):
+    """规范化指标：去掉易变字段，浮点数保留 1 位小数"""
+    if isinstance(value, dict):
+        return {k: normalize_metrics(v) for k, v in value.items() if k not in VOLATILE_KEYS}
+    if isinstance(value, list):
+        return [normalize_metrics(v) for v in value]
+    if isinstance(value, float):
+        return round(value, 1)
+    return value
+
+
+class _Flight:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class ResultCache:
+    def __init__(self, redis_client, ttl=600, max_entries=10000, prefix="ai:result:"):
+        self.redis = redis_client
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.prefix = prefix
+        self.index_key = prefix + "index"
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(model, scenario, device_id, metrics):
+        payload = json.dumps([model, scenario, str(device_id), normalize_metrics(metrics or {})],
+                             ensure_ascii=False, sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def get(self, key):
+        data = self.redis.get(self.prefix + key)
+        if data is None:
+            return None
+        self.redis.zadd(self.index_key, {key: time.time()})
+        return json.loads(data)
+
+    def set(self, key, value):
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.set(self.prefix + key, json.dumps(value, ensure_ascii=False), ex=self.ttl)
+        pipe.zadd(self.index_key, {key: time.time()})
+        # 清理已过期条目在索引中的残留
+        pipe.zremrangebyscore(self.index_key, 0, time.time() - self.ttl)
+        pipe.zcard(self.index_key)
+        size = pipe.execute()[-1]
+        if size > self.max_entries:
+            self._evict(size - self.max_entries)
+
+    def _evict(self, count):
+        evicted = [member for member, _ in self.redis.zpopmin(self.index_key, count)]
+        if evicted:
+            self.redis.delete(*[self.prefix + (m.decode() if isinstance(m, bytes) else m) for m in evicted])
+
+    def get_or_compute(self, key, compute, timeout=600, cacheable=None):
+        """
+        读取缓存，未命中时执行 compute 并写入缓存；并发的相同请求只执行一次 compute
+        :param cacheable: 判断结果能否写入缓存的函数，返回 False 时结果只共享给并发等待的请求
+        :return: (结果, 是否来自缓存或其他请求)
+        """
+        cached = self.get(key)
+        if cached is not None:
+            return cached, True
+
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+
+        if not leader:
+            if not flight.event.wait(timeout):
+                raise Exception("等待相同分析请求的推理结果超时")
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, True
+
+        try:
+            flight.result = compute()
+            if cacheable is None or cacheable(flight.result):
+                try:
+                    self.set(key, flight.result)
+                except Exception as e:
+                    print(f"写入推理结果缓存失败：{e}")
+            return flight.result, False
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.event.set()
+
+    def stats(self):
+        return {"entries": self.redis.zcard(self.index_key), "in_flight": len(self._flights),
+                "ttl": self.ttl, "max_entries": self.max_entries}
@@ -0,0 +1,79 @@
+"""
+流式分析监控：模型边生成边检查
+- 每收到完整的行即做故障关键词匹配，新发现的故障立即推送
+- 报告四个必需段落（健康评分、异常项、修复建议、推理链路）都已输出且最后一段达到长度上限时提前停止生成
+- 输出总长度超过上限时停止，避免失控生成浪费算力
+"""
+import re
+
+# 段落标题，如 "1. 健康评分"、"**2、异常项**"、"### 3. 修复建议"、"推理链路："
+# 按标题文字识别，段落内的编号子列表（如 "1. 接口down"）不计入
+SECTION_TITLES = {"健康评分": "1", "异常项": "2", "修复建议": "3", "推理链路": "4"}
+SECTION_PATTERN = re.compile(
+    r"^[ \t]*(?:#+[ \t]*)?(?:\*\*)?[ \t]*(?:[1-4][\.、．][ \t]*)?(?:\*\*)?[ \t]*"
+    r"(" + "|".join(SECTION_TITLES) + r")(?=[ \t]*(?:[:：*（(]|$))",
+    re.MULTILINE
+)
+REQUIRED_SECTIONS = set(SECTION_TITLES.values())
+
+
+class ReportStreamMonitor:
+    def __init__(self, classifier, last_section_chars=1500, max_chars=8000):
+        """
+        :param last_section_chars: 最后一个段落（推理链路）允许的最大长度
+        :param max_chars: 报告总长度上限
+        """
+        self.classifier = classifier
+        self.last_section_chars = last_section_chars
+        self.max_chars = max_chars
+        self.text = ""
+        self.stop_reason = None
+        self._scanned = 0
+        self._seen = set()
+        self._sections = {}
+
+    def feed(self, chunk):
+        """追加一段输出，返回新发现的故障列表"""
+        self.text += chunk
+        end = self.text.rfind("\n") + 1
+        if end <= self._scanned:
+            return []
+        faults = self._scan(end)
+        self._check_stop()
+        return faults
+
+    def finish(self):
+        """生成结束，扫描末尾不完整的行"""
+        return self._scan(len(self.text))
+
+    def _scan(self, end):
+        faults = []
+        for fault in self.classifier.match_keywords(self.text, self._scanned, end, unique=True):
+            key = fault["level"] + ":" + fault["description"]
+            if key not in self._seen:
+                self._seen.add(key)
+                faults.append(fault)
+        body_start = self._body_start()
+        if body_start is not None:
+            for match in SECTION_PATTERN.finditer(self.text, max(self._scanned, body_start), end):
+                self._sections.setdefault(SECTION_TITLES[match.group(1)], match.start())
+        self._scanned = end
+        return faults
+
+    def _body_start(self):
+        """推理模型的 <think> 思考过程中的段落标题不计入，思考结束前返回 None"""
+        if "<think>" not in self.text:
+            return 0
+        close = self.text.find("</think>")
+        return None if close < 0 else close + len("</think>")
+
+    def _check_stop(self):
+        if len(self.text) >= self.max_chars:
+            self.stop_reason = "max_chars"
+        elif REQUIRED_SECTIONS.issubset(self._sections):
+            if len(self.text) - self._sections["4"] >= self.last_section_chars:
+                self.stop_reason = "sections_complete"
+
+    @property
+    def sections(self):
+        return sorted(self._sections)
@@ -0,0 +1,247 @@
+"""
+批量巡检 Worker 入口：python batch_worker.py
+- 启动 BATCH_WORKER_CONSUMERS 个消费者，BATCH_WORKER_MODE 选择线程（thread）或进程（process）
+- 每个消费者持有独立的 RabbitMQ 连接，采集任务交给有界线程池执行
+- 任务完成后通过 add_callback_threadsafe 回到连接线程确认消息（pika 连接非线程安全）
+- 失败任务按指数退避进入延迟队列重试，超过次数或无法处理的任务转入死信队列
+- 收到 SIGTERM/SIGINT 后停止拉取新消息，等待在途任务完成再退出
+"""
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import pika
+
+from collection import RABBITMQ_URL, process_inspect_task, redis_client
+from mq.retry import RetryTopology
+
+QUEUE_NAME = "batch_inspect"
+retry_topology = RetryTopology(
+    QUEUE_NAME,
+    max_retries=int(os.getenv("BATCH_MAX_RETRIES", 5)),
+    base_delay=int(os.getenv("BATCH_RETRY_BASE_DELAY", 10))
+)
+# 各消费者定期上报的运行状态（Redis Hash，field 为消费者名称）
+STATS_KEY = "batch_inspect:workers"
+STATS_TTL = 60
+
+
+class BatchInspectConsumer:
+    """单个队列消费者：连接线程收发消息，线程池执行采集"""
+
+    def __init__(self, name, rabbitmq_url=RABBITMQ_URL, pool_size=8, stats_interval=5):
+        self.name = name
+        self.rabbitmq_url = rabbitmq_url
+        self.pool_size = pool_size
+        self.stats_interval = stats_interval
+        self.executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix=name)
+        self.connection = None
+        self.channel = None
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.processed = 0
+        self.failed = 0
+        self.retried = 0
+        self.dead = 0
+
+    def run(self):
+        """阻塞运行，连接断开后自动重连，直到 stop() 被调用"""
+        while not self._stopping.is_set():
+            try:
+                self._consume()
+            except pika.exceptions.AMQPError as e:
+                if self._stopping.is_set():
+                    break
+                print(f"[{self.name}] RabbitMQ连接异常：{e}，5秒后重连")
+                time.sleep(5)
+        self.executor.shutdown(wait=True)
+        self._report_stats()
+        print(f"[{self.name}] 消费者已退出")
+
+    def stop(self):
+        """请求优雅退出（可在任意线程调用）"""
+        self._stopping.set()
+        connection = self.connection
+        if connection and connection.is_open:
+            try:
+                connection.add_callback_threadsafe(self._stop_consuming)
+            except Exception:
+                pass
+
+    def stats(self):
+        with self._lock:
+            return {
+                "in_flight": self.in_flight,
+                "processed": self.processed,
+                "failed": self.failed,
+                "retried": self.retried,
+                "dead": self.dead,
+                "pool_size": self.pool_size,
+                "updated": time.time()
+            }
+
+    def _consume(self):
+        self.connection = pika.BlockingConnection(pika.URLParameters(self.rabbitmq_url))
+        self.channel = self.connection.channel()
+        self.channel.queue_declare(queue=QUEUE_NAME, durable=True)
+        retry_topology.declare(self.channel)
+        # 预取数与线程池大小一致，保证每个工作线程都有任务可做
+        self.channel.basic_qos(prefetch_count=self.pool_size)
+        self.channel.basic_consume(queue=QUEUE_NAME, on_message_callback=self._on_message)
+        self.connection.call_later(self.stats_interval, self._report_loop)
+
+        print(f"[{self.name}] 批量巡检消费者已启动（线程池 {self.pool_size}），等待任务...")
+        if self._stopping.is_set():
+            self._stop_consuming()
+        self.channel.start_consuming()
+
+        # 停止拉取后继续处理连接事件，直到在途任务全部确认
+        while self.stats()["in_flight"] > 0 and self.connection.is_open:
+            self.connection.process_data_events(time_limit=1)
+        if self.connection.is_open:
+            self.connection.process_data_events(time_limit=0)  # 执行最后一批确认回调
+            self.connection.close()
+
+    def _stop_consuming(self):
+        if self.channel and self.channel.is_open:
+            self.channel.stop_consuming()
+
+    def _on_message(self, ch, method, properties, body):
+        with self._lock:
+            self.in_flight += 1
+        connection = self.connection
+        future = self.executor.submit(self._handle, body)
+        future.add_done_callback(partial(self._on_done, connection, ch, method.delivery_tag, body, properties))
+
+    def _handle(self, body):
+        task_data = json.loads(body)
+        process_inspect_task(task_data)
+        print(f"[{self.name}] 设备 {task_data.get('device_id')} 批量巡检完成")
+
+    def _on_done(self, connection, ch, delivery_tag, body, properties, future):
+        """工作线程中回调：更新计数，并把确认操作交回连接线程（在途数在确认后才扣减）"""
+        error = future.exception()
+        with self._lock:
+            if error is None:
+                self.processed += 1
+            else:
+                self.failed += 1
+        try:
+            connection.add_callback_threadsafe(partial(self._settle, ch, delivery_tag, body, properties, error))
+        except Exception:
+            # 连接已断开，未确认的消息会由 RabbitMQ 重新投递
+            with self._lock:
+                self.in_flight -= 1
+
+    def _settle(self, ch, delivery_tag, body, properties, error):
+        """在连接线程中确认消息，失败任务转入延迟重试或死信队列"""
+        try:
+            if not ch.is_open:
+                return
+            if error is not None:
+                outcome = retry_topology.handle_failure(ch, body, properties, error)
+                with self._lock:
+                    if outcome == "dead":
+                        self.dead += 1
+                    else:
+                        self.retried += 1
+                print(f"[{self.name}] 批量巡检任务处理失败（{'转入死信队列' if outcome == 'dead' else '延迟重试'}）：{error}")
+            ch.basic_ack(delivery_tag=delivery_tag)
+        finally:
+            # 与确认同在连接线程中扣减，退出循环看到 0 时确认已经发出
+            with self._lock:
+                self.in_flight -= 1
+
+    def _report_loop(self):
+        self._report_stats()
+        if not self._stopping.is_set() and self.connection.is_open:
+            self.connection.call_later(self.stats_interval, self._report_loop)
+
+    def _report_stats(self):
+        try:
+            pipe = redis_client.pipeline(transaction=False)
+            pipe.hset(STATS_KEY, self.name, json.dumps(self.stats()))
+            pipe.expire(STATS_KEY, STATS_TTL)
+            pipe.execute()
+        except Exception as e:
+            print(f"[{self.name}] 上报状态失败：{e}")
+
+
+def get_worker_stats(max_age=30):
+    """汇总各消费者上报的状态（忽略超过 max_age 秒未上报的消费者）"""
+    now = time.time()
+    workers = {}
+    for name, value in redis_client.hgetall(STATS_KEY).items():
+        stats = json.loads(value)
+        if now - stats.get("updated", 0) <= max_age:
+            workers[name.decode() if isinstance(name, bytes) else name] = stats
+    return {
+        "workers": workers,
+        "in_flight": sum(stats["in_flight"] for stats in workers.values())
+    }
+
+
+def _run_consumer_process(name, pool_size):
+    """进程模式下子进程入口：自行处理退出信号"""
+    consumer = BatchInspectConsumer(name, pool_size=pool_size)
+    signal.signal(signal.SIGTERM, lambda *_: consumer.stop())
+    signal.signal(signal.SIGINT, lambda *_: consumer.stop())
+    consumer.run()
+
+
+def start_thread_consumers(count, pool_size, prefix=None):
+    """在当前进程内以线程方式启动消费者，返回 (consumers, threads)"""
+    prefix = prefix or f"{socket.gethostname()}-{os.getpid()}"
+    consumers = [BatchInspectConsumer(f"{prefix}-{i}", pool_size=pool_size) for i in range(count)]
+    threads = [threading.Thread(target=c.run, name=c.name, daemon=True) for c in consumers]
+    for thread in threads:
+        thread.start()
+    return consumers, threads
+
+
+def main():
+    count = int(os.getenv("BATCH_WORKER_CONSUMERS", 2))
+    pool_size = int(os.getenv("BATCH_WORKER_POOL_SIZE", 8))
+    mode = os.getenv("BATCH_WORKER_MODE", "thread")
+    prefix = f"{socket.gethostname()}-{os.getpid()}"
+
+    if mode == "process":
+        # spawn 避免子进程继承父进程的连接与后台线程状态
+        ctx = multiprocessing.get_context("spawn")
+        processes = [ctx.Process(target=_run_consumer_process, args=(f"{prefix}-{i}", pool_size))
+                     for i in range(count)]
+        for process in processes:
+            process.start()
+
+        def shutdown(*_):
+            for process in processes:
+                if process.is_alive():
+                    process.terminate()  # 子进程收到 SIGTERM 后优雅退出
+
+        signal.signal(signal.SIGTERM, shutdown)
+        signal.signal(signal.SIGINT, shutdown)
+        for process in processes:
+            process.join()
+    else:
+        consumers, threads = start_thread_consumers(count, pool_size, prefix)
+
+        def shutdown(*_):
+            for consumer in consumers:
+                consumer.stop()
+
+        signal.signal(signal.SIGTERM, shutdown)
+        signal.signal(signal.SIGINT, shutdown)
+        for thread in threads:
+            while thread.is_alive():
+                thread.join(timeout=1)
+
+
+if __name__ == "__main__":
+    main()
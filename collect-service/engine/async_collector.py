@@ -0,0 +1,129 @@
+"""
+异步并发采集引擎：单进程内并发轮询大量设备（SSH/SNMP）
+- 全局并发上限：限制同时进行中的采集数
+- 单设备信号量：避免同一设备被并发登录占满 VTY
+- 厂商限速：令牌桶控制对同一厂商设备的发起速率
+"""
+import asyncio
+import time
+
+from parsers.registry import parse_outputs, structure_snmp_metrics
+from protocols.async_snmp_client import AsyncSNMPClient
+from protocols.async_ssh_client import AsyncSSHClient
+
+
+class TokenBucket:
+    """异步令牌桶（rate 个/秒，burst 为桶容量）"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1, int(rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class AsyncCollectionEngine:
+    """并发采集引擎，设备描述与批量巡检任务字段一致"""
+
+    def __init__(self, profile_loader, concurrency=500, per_device_concurrency=1,
+                 vendor_rates=None, cmd_timeout=30, keep_raw=False,
+                 snmp_metrics=("cpu", "memory", "interface")):
+        """
+        :param profile_loader: (vendor, model) -> CommandProfile
+        :param concurrency: 全局同时采集的设备数上限
+        :param per_device_concurrency: 单台设备同时进行的采集数上限
+        :param vendor_rates: {厂商: 每秒新建采集数}，未配置的厂商不限速
+        :param keep_raw: 是否在结构化指标之外保留全部原始输出
+        """
+        self.profile_loader = profile_loader
+        self.concurrency = concurrency
+        self.per_device_concurrency = per_device_concurrency
+        self.vendor_rates = {k.lower(): v for k, v in (vendor_rates or {}).items()}
+        self.cmd_timeout = cmd_timeout
+        self.keep_raw = keep_raw
+        self.snmp_metrics = list(snmp_metrics)
+        self._loop = None
+
+    def _ensure_loop_state(self):
+        # asyncio 原语绑定事件循环，切换循环（如多次 asyncio.run）时重建
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._global_sem = asyncio.Semaphore(self.concurrency)
+            self._device_sems = {}
+            self._vendor_buckets = {v: TokenBucket(rate) for v, rate in self.vendor_rates.items()}
+
+    async def collect(self, device):
+        """采集单台设备，失败不抛异常，以 success=False 返回"""
+        self._ensure_loop_state()
+        device_id = device.get("device_id")
+        ip = device.get("ip")
+        vendor = (device.get("vendor") or "").lower()
+        device_sem = self._device_sems.setdefault(ip, asyncio.Semaphore(self.per_device_concurrency))
+        bucket = self._vendor_buckets.get(vendor)
+
+        start = time.monotonic()
+        try:
+            async with device_sem:
+                if bucket:
+                    await bucket.acquire()
+                async with self._global_sem:
+                    data = await self._collect_device(device)
+            return {"device_id": device_id, "success": True, "data": data,
+                    "time_cost": round(time.monotonic() - start, 3)}
+        except Exception as e:
+            return {"device_id": device_id, "success": False, "error": str(e) or type(e).__name__,
+                    "time_cost": round(time.monotonic() - start, 3)}
+
+    async def _collect_device(self, device):
+        protocol = device.get("protocol")
+        if protocol == "ssh":
+            profile = self.profile_loader(device.get("vendor"), device.get("model"))
+            client = AsyncSSHClient(device.get("ip"), device.get("username"), device.get("password"),
+                                    vendor=device.get("vendor"), cmd_timeout=self.cmd_timeout)
+            outputs = await client.execute_cmds(profile.commands, profile.timeouts)
+            return parse_outputs(outputs, device.get("vendor"), profile.parsers, keep_raw=self.keep_raw)
+        if protocol == "snmp":
+            client = AsyncSNMPClient(device.get("ip"), device.get("password"), port=161)
+            return structure_snmp_metrics(await client.get_metrics(self.snmp_metrics))
+        raise ValueError(f"不支持的协议：{protocol}")
+
+    async def collect_many(self, devices):
+        """并发采集，按完成顺序逐个产出结果"""
+        self._ensure_loop_state()
+        tasks = [asyncio.ensure_future(self.collect(device)) for device in devices]
+        try:
+            for future in asyncio.as_completed(tasks):
+                yield await future
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def collect_all(self, devices):
+        return await asyncio.gather(*(self.collect(device) for device in devices))
+
+    def run(self, devices):
+        """同步调用入口（脚本/线程中使用）"""
+        return asyncio.run(self.collect_all(devices))
+
+
+def parse_vendor_rates(value):
+    """解析形如 "huawei=50,cisco=20" 的厂商限速配置"""
+    rates = {}
+    for item in (value or "").split(","):
+        if "=" in item:
+            vendor, rate = item.split("=", 1)
+            rates[vendor.strip()] = float(rate)
+    return rates
@@ -0,0 +1,123 @@
+"""
+长连接消息发布器：供 API 进程复用 RabbitMQ 连接批量投递任务
+- pika BlockingConnection 非线程安全，按 (连接, 通道) 组成的池分配给请求线程独占使用
+- 每批消息在一个事务中提交，一次往返即可确认整批已被 broker 接收
+  （BlockingChannel 的 confirm 模式会逐条同步等待确认，批量场景下过慢）
+- 连接断开时自动重建并重发未提交的整批消息
+- 指定 exchange 时发布到该交换机（如拓扑变化事件的 topic 交换机），按消息指定路由键
+"""
+import queue
+import threading
+
+import pika
+
+
+class _PublisherChannel:
+    def __init__(self, url, declare):
+        self.url = url
+        self.declare = declare
+        self.connection = None
+        self.channel = None
+
+    def ensure_open(self):
+        if self.connection is None or not self.connection.is_open or not self.channel.is_open:
+            self.close()
+            self.connection = pika.BlockingConnection(pika.URLParameters(self.url))
+            self.channel = self.connection.channel()
+            self.declare(self.channel)
+            self.channel.tx_select()
+        else:
+            # 空闲期间未处理心跳，取用前先处理积压的连接事件
+            self.connection.process_data_events(time_limit=0)
+
+    def publish(self, routing_key, bodies, properties, exchange=''):
+        self.ensure_open()
+        for body in bodies:
+            self.channel.basic_publish(exchange=exchange, routing_key=routing_key, body=body, properties=properties)
+        self.channel.tx_commit()
+
+    def close(self):
+        try:
+            if self.connection and self.connection.is_open:
+                self.connection.close()
+        except Exception:
+            pass
+        self.connection = None
+        self.channel = None
+
+
+class BatchPublisher:
+    """线程安全的批量发布器"""
+
+    def __init__(self, url, queue_name=None, pool_size=4, batch_size=1000, acquire_timeout=30,
+                 exchange='', exchange_type='topic'):
+        self.url = url
+        self.queue_name = queue_name
+        self.exchange = exchange
+        self.exchange_type = exchange_type
+        self.pool_size = pool_size
+        self.batch_size = batch_size
+        self.acquire_timeout = acquire_timeout
+        self.properties = pika.BasicProperties(delivery_mode=2)  # 消息持久化
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def publish_batch(self, bodies, routing_key=None):
+        """在一个事务内发布一批消息，返回发布条数"""
+        if not bodies:
+            return 0
+        routing_key = routing_key or self.queue_name
+        channel = self._acquire()
+        try:
+            try:
+                channel.publish(routing_key, bodies, self.properties, self.exchange)
+            except pika.exceptions.AMQPError:
+                # 事务未提交，重建连接后整批重发不会产生重复消息
+                channel.close()
+                channel.publish(routing_key, bodies, self.properties, self.exchange)
+        except Exception:
+            channel.close()
+            raise
+        finally:
+            self._idle.put(channel)
+        return len(bodies)
+
+    def publish_many(self, bodies):
+        """按 batch_size 分批发布任意可迭代的消息体"""
+        total = 0
+        batch = []
+        for body in bodies:
+            batch.append(body)
+            if len(batch) >= self.batch_size:
+                total += self.publish_batch(batch)
+                batch = []
+        total += self.publish_batch(batch)
+        return total
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+    def _declare(self, channel):
+        if self.exchange:
+            channel.exchange_declare(exchange=self.exchange, exchange_type=self.exchange_type, durable=True)
+        if self.queue_name:
+            channel.queue_declare(queue=self.queue_name, durable=True)
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.pool_size:
+                self._created += 1
+                return _PublisherChannel(self.url, self._declare)
+        try:
+            return self._idle.get(timeout=self.acquire_timeout)
+        except queue.Empty:
+            raise Exception("获取RabbitMQ发布通道超时")
@@ -0,0 +1,131 @@
+"""
+队列重试与死信处理
+- 失败任务按重试次数发布到对应的延迟队列（队列级 TTL），到期后经死信路由回到主队列
+- 重试次数记录在消息头 x-retry-count 中，超过上限或无法处理的任务进入死信队列
+- 死信队列支持查看与重放
+"""
+import json
+import time
+
+import pika
+
+RETRY_COUNT_HEADER = "x-retry-count"
+LAST_ERROR_HEADER = "x-last-error"
+DEAD_AT_HEADER = "x-dead-at"
+
+
+def is_poison(error):
+    """无法通过重试恢复的任务：消息格式错误、参数非法、命令集缺失等"""
+    if isinstance(error, (ValueError, KeyError, TypeError)):
+        return True
+    return getattr(error, "status_code", None) == 400
+
+
+class RetryTopology:
+    """主队列对应的延迟重试队列与死信队列"""
+
+    def __init__(self, queue, max_retries=5, base_delay=10, max_delay=3600):
+        """
+        :param queue: 主队列名称
+        :param max_retries: 最大重试次数，超过后进入死信队列
+        :param base_delay: 首次重试延迟（秒），之后按 2 的幂次递增
+        :param max_delay: 单次重试延迟上限（秒）
+        """
+        self.queue = queue
+        self.max_retries = max_retries
+        self.dead_letter_queue = f"{queue}.dead"
+        self.delays = [min(base_delay * (2 ** i), max_delay) for i in range(max_retries)]
+
+    def retry_queue(self, delay):
+        return f"{self.queue}.retry.{delay}s"
+
+    def declare(self, channel):
+        """声明延迟队列与死信队列（主队列参数保持不变，兼容已存在的队列）"""
+        for delay in sorted(set(self.delays)):
+            channel.queue_declare(queue=self.retry_queue(delay), durable=True, arguments={
+                "x-message-ttl": delay * 1000,
+                "x-dead-letter-exchange": "",
+                "x-dead-letter-routing-key": self.queue
+            })
+        channel.queue_declare(queue=self.dead_letter_queue, durable=True)
+
+    def handle_failure(self, channel, body, properties, error):
+        """
+        处理失败任务：重新投递到延迟队列或转入死信队列（调用方随后确认原消息）
+        :return: "retry" 或 "dead"
+        """
+        headers = dict((properties.headers if properties else None) or {})
+        retry_count = int(headers.get(RETRY_COUNT_HEADER, 0))
+        headers[LAST_ERROR_HEADER] = str(error)[:500]
+
+        if is_poison(error) or retry_count >= self.max_retries:
+            headers[DEAD_AT_HEADER] = int(time.time())
+            self._publish(channel, self.dead_letter_queue, body, headers)
+            return "dead"
+
+        headers[RETRY_COUNT_HEADER] = retry_count + 1
+        self._publish(channel, self.retry_queue(self.delays[retry_count]), body, headers)
+        return "retry"
+
+    def list_dead(self, channel, limit=100):
+        """查看死信任务（不消费，读取后全部放回队列）"""
+        entries = []
+        try:
+            for _, properties, body in self._browse(channel, limit):
+                entries.append(self._describe(body, properties))
+        finally:
+            channel.close()  # 未确认的消息全部回到死信队列
+        return entries
+
+    def replay(self, channel, device_ids=None):
+        """
+        将死信任务重新投递到主队列并重置重试次数
+        :param device_ids: 仅重放指定设备，为空时重放全部
+        :return: 重放的任务数
+        """
+        wanted = {str(d) for d in device_ids} if device_ids else None
+        replayed = 0
+        try:
+            total = channel.queue_declare(queue=self.dead_letter_queue, durable=True, passive=True).method.message_count
+            for method, properties, body in self._browse(channel, total):
+                if wanted is not None and str(self._describe(body, properties)["device_id"]) not in wanted:
+                    continue
+                self._publish(channel, self.queue, body, {"x-replayed-at": int(time.time())})
+                channel.basic_ack(delivery_tag=method.delivery_tag)
+                replayed += 1
+        finally:
+            channel.close()
+        return replayed
+
+    def _browse(self, channel, limit):
+        for _ in range(limit):
+            method, properties, body = channel.basic_get(queue=self.dead_letter_queue, auto_ack=False)
+            if method is None:
+                break
+            yield method, properties, body
+
+    @staticmethod
+    def _describe(body, properties):
+        headers = (properties.headers if properties else None) or {}
+        try:
+            task = json.loads(body)
+        except (TypeError, ValueError):
+            task = {}
+        return {
+            "device_id": task.get("device_id"),
+            "ip": task.get("ip"),
+            "vendor": task.get("vendor"),
+            "protocol": task.get("protocol"),
+            "retry_count": headers.get(RETRY_COUNT_HEADER, 0),
+            "error": headers.get(LAST_ERROR_HEADER),
+            "dead_at": headers.get(DEAD_AT_HEADER)
+        }
+
+    @staticmethod
+    def _publish(channel, routing_key, body, headers):
+        channel.basic_publish(
+            exchange='',
+            routing_key=routing_key,
+            body=body,
+            properties=pika.BasicProperties(delivery_mode=2, headers=headers)  # 消息持久化
+        )
@@ -0,0 +1,54 @@
+"""思科 / 锐捷（IOS 风格）命令输出解析器"""
+import re
+
+from parsers.registry import register, to_number
+
+CPU_USAGE_PATTERN = re.compile(r"CPU utilization for five seconds:\s*(\d+)%")
+MEMORY_POOL_PATTERN = re.compile(r"^Processor\s+\S+\s+(\d+)\s+(\d+)\s+(\d+)", re.MULTILINE)
+VERSION_PATTERN = re.compile(r"Version\s+([^\s,]+)")
+# Interface  IP-Address  OK?  Method  Status  Protocol
+IP_INTERFACE_BRIEF_PATTERN = re.compile(
+    r"^(?P<name>\S+)\s+(?P<ip>\S+)\s+(?:YES|NO)\s+\S+\s+"
+    r"(?P<status>administratively down|up|down)\s+(?P<protocol>up|down)"
+)
+
+
+@register("cisco_cpu_usage", vendor="cisco", commands=["show processes cpu", "show processes cpu sorted"])
+@register("ruijie_cpu_usage", vendor="ruijie", commands=["show cpu"])
+def parse_cpu_usage(output):
+    match = CPU_USAGE_PATTERN.search(output)
+    return {"cpu_usage": to_number(match.group(1))} if match else None
+
+
+@register("cisco_memory_usage", vendor="cisco", commands=["show memory statistics"])
+def parse_memory_usage(output):
+    # Head  Total(b)  Used(b)  Free(b)
+    match = MEMORY_POOL_PATTERN.search(output)
+    if not match or not int(match.group(1)):
+        return None
+    return {"memory_usage": round(int(match.group(2)) * 100 / int(match.group(1)), 1)}
+
+
+@register("cisco_ip_interface_brief", vendor="cisco", commands=["show ip interface brief"])
+@register("ruijie_ip_interface_brief", vendor="ruijie", commands=["show ip interface brief"])
+def parse_ip_interface_brief(output):
+    interfaces = {}
+    for line in output.splitlines():
+        if " YES " not in line and " NO " not in line:
+            continue
+        match = IP_INTERFACE_BRIEF_PATTERN.match(line)
+        if not match:
+            continue
+        status = match.group("status")
+        interfaces[match.group("name")] = {
+            "status": "admin_down" if status.startswith("administratively") else status,
+            "protocol": match.group("protocol"),
+            "ip": None if match.group("ip") == "unassigned" else match.group("ip")
+        }
+    return {"interfaces": interfaces} if interfaces else None
+
+
+@register("cisco_version", vendor="cisco", commands=["show version"])
+def parse_version(output):
+    match = VERSION_PATTERN.search(output)
+    return {"version": {"software": match.group(1)}} if match else None
@@ -0,0 +1,80 @@
+"""华为 / 华三（VRP/Comware 风格）命令输出解析器"""
+import re
+
+from parsers.registry import register, to_number
+
+CPU_USAGE_PATTERN = re.compile(r"CPU (?:Usage|utilization for five seconds)\s*:\s*(\d+(?:\.\d+)?)%", re.IGNORECASE)
+MEMORY_PERCENT_PATTERN = re.compile(r"Memory Using Percentage(?: Is)?\s*:\s*(\d+(?:\.\d+)?)%", re.IGNORECASE)
+MEMORY_TOTAL_PATTERN = re.compile(r"System Total Memory(?: Is)?\s*:\s*(\d+)", re.IGNORECASE)
+MEMORY_USED_PATTERN = re.compile(r"Total Memory Used(?: Is)?\s*:\s*(\d+)", re.IGNORECASE)
+VERSION_PATTERN = re.compile(r"Version\s+([\d.]+)\s*\(([^)]+)\)")
+UPTIME_PATTERN = re.compile(r"uptime is\s+(.+)", re.IGNORECASE)
+UPTIME_PART_PATTERN = re.compile(r"(\d+)\s+(week|day|hour|minute)", re.IGNORECASE)
+# Interface  PHY  Protocol  InUti  OutUti  inErrors  outErrors
+INTERFACE_BRIEF_PATTERN = re.compile(
+    r"^(?P<name>\S+)\s+(?P<phy>[*^]?(?:up|down))(?:\([A-Za-z]+\))?\s+"
+    r"(?P<protocol>up|down)(?:\([A-Za-z]+\))?\s+"
+    r"(?P<in_util>[\d.]+|--)%?\s+(?P<out_util>[\d.]+|--)%?"
+    r"(?:\s+(?P<in_errors>\d+)\s+(?P<out_errors>\d+))?"
+)
+UPTIME_SECONDS = {"week": 604800, "day": 86400, "hour": 3600, "minute": 60}
+
+
+@register("huawei_cpu_usage", vendor="huawei", commands=["display cpu-usage"])
+@register("h3c_cpu_usage", vendor="h3c", commands=["display cpu-usage"])
+def parse_cpu_usage(output):
+    match = CPU_USAGE_PATTERN.search(output)
+    return {"cpu_usage": to_number(match.group(1))} if match else None
+
+
+@register("huawei_memory_usage", vendor="huawei", commands=["display memory-usage", "display memory"])
+@register("h3c_memory_usage", vendor="h3c", commands=["display memory"])
+def parse_memory_usage(output):
+    match = MEMORY_PERCENT_PATTERN.search(output)
+    if match:
+        return {"memory_usage": to_number(match.group(1))}
+    total = MEMORY_TOTAL_PATTERN.search(output)
+    used = MEMORY_USED_PATTERN.search(output)
+    if total and used and int(total.group(1)):
+        return {"memory_usage": round(int(used.group(1)) * 100 / int(total.group(1)), 1)}
+    return None
+
+
+@register("huawei_interface_brief", vendor="huawei", commands=["display interface brief"])
+@register("h3c_interface_brief", vendor="h3c", commands=["display interface brief"])
+def parse_interface_brief(output):
+    interfaces = {}
+    for line in output.splitlines():
+        # 表头、说明行中不含百分号，快速跳过
+        if "%" not in line and "--" not in line:
+            continue
+        match = INTERFACE_BRIEF_PATTERN.match(line)
+        if not match:
+            continue
+        phy = match.group("phy")
+        entry = {
+            # *down 为管理性关闭，^down 为备份接口待机，均不视为故障
+            "status": "admin_down" if phy.startswith("*") else ("standby" if phy.startswith("^") else phy),
+            "protocol": match.group("protocol"),
+            "in_util": to_number(match.group("in_util")) if match.group("in_util") != "--" else None,
+            "out_util": to_number(match.group("out_util")) if match.group("out_util") != "--" else None
+        }
+        if match.group("in_errors") is not None:
+            entry["in_errors"] = int(match.group("in_errors"))
+            entry["out_errors"] = int(match.group("out_errors"))
+        interfaces[match.group("name")] = entry
+    return {"interfaces": interfaces} if interfaces else None
+
+
+@register("huawei_version", vendor="huawei", commands=["display version"])
+@register("h3c_version", vendor="h3c", commands=["display version"])
+def parse_version(output):
+    result = {}
+    match = VERSION_PATTERN.search(output)
+    if match:
+        result["version"] = {"platform": match.group(1), "software": match.group(2).strip()}
+    uptime = UPTIME_PATTERN.search(output)
+    if uptime:
+        result["uptime_seconds"] = sum(int(n) * UPTIME_SECONDS[unit.lower()]
+                                       for n, unit in UPTIME_PART_PATTERN.findall(uptime.group(1)))
+    return result or None
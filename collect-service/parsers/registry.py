@@ -0,0 +1,86 @@
+"""
+CLI 输出解析框架：把命令原始输出解析为结构化数值指标
+- 解析器按名称注册，命令集中可通过 parser 字段指定；未指定时按 (厂商, 命令) 查找默认解析器
+- 解析器返回的字典合并到最终指标中（如 cpu_usage、memory_usage、interfaces）
+- 没有解析器或解析失败的命令保留原始输出到 raw 字段（去掉运行时长、时间戳等易变行）
+"""
+from protocols.vendors import VENDOR_ALIASES
+from storage.delta import strip_volatile_lines
+
+_PARSERS = {}
+# (厂商, 命令) -> 默认解析器名称
+_DEFAULT_PARSERS = {}
+
+
+def register(name, vendor=None, commands=()):
+    """注册解析器；同时声明 vendor/commands 时作为该厂商命令的默认解析器"""
+    def decorator(func):
+        _PARSERS[name] = func
+        for cmd in commands:
+            _DEFAULT_PARSERS[(vendor, cmd)] = name
+        return func
+    return decorator
+
+
+def get_parser(name):
+    return _PARSERS.get(name)
+
+
+def find_parser(vendor, cmd, name=None):
+    if name:
+        return _PARSERS.get(name)
+    vendor = VENDOR_ALIASES.get(vendor, (vendor or "").lower())
+    name = _DEFAULT_PARSERS.get((vendor, cmd.strip().lower()))
+    return _PARSERS.get(name) if name else None
+
+
+def parse_outputs(outputs, vendor=None, parser_names=None, keep_raw=False):
+    """
+    解析一组命令输出
+    :param outputs: {命令: 原始输出}
+    :param parser_names: {命令: 解析器名称}（来自命令集配置）
+    :param keep_raw: 为 True 时保留全部原始输出
+    :return: 结构化指标，未解析的命令输出位于 raw 中
+    """
+    parser_names = parser_names or {}
+    metrics = {}
+    raw = {}
+    for cmd, output in outputs.items():
+        parser = find_parser(vendor, cmd, parser_names.get(cmd))
+        parsed = None
+        if parser is not None:
+            try:
+                parsed = parser(output)
+            except Exception as e:
+                print(f"命令 {cmd} 输出解析失败：{e}")
+        if parsed:
+            metrics.update(parsed)
+        if keep_raw or not parsed:
+            raw[cmd] = strip_volatile_lines(output)
+    if raw:
+        metrics["raw"] = raw
+    return metrics
+
+
+def structure_snmp_metrics(metrics):
+    """SNMP 指标转为与 CLI 解析结果一致的结构"""
+    structured = {}
+    for key in ("cpu_usage", "memory_usage"):
+        if metrics.get(key) is not None:
+            structured[key] = to_number(metrics[key])
+    if "interface_status" in metrics:
+        structured["interfaces"] = {name: {"status": status}
+                                    for name, status in metrics["interface_status"].items()}
+    return structured
+
+
+def to_number(value):
+    try:
+        number = float(str(value).rstrip("%"))
+    except (TypeError, ValueError):
+        return value
+    return int(number) if number.is_integer() else number
+
+
+# 导入内置解析器完成注册
+from parsers import cisco, huawei  # noqa: E402,F401
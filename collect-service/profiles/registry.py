@@ -0,0 +1,137 @@
+"""
+厂商命令集注册表：启动时加载 cmd_profiles 目录下全部命令集到内存索引
+- 命令集文件名为 {vendor}_{model}.json，可通过 aliases 声明别名、match 声明通配（如 huawei_ar*）
+- extends 继承父命令集，同名命令覆盖父级配置
+- cmds 中的命令可为字符串，或 {"cmd", "timeout", "parser", "interval"} 对象
+- 后台线程按 mtime 轮询目录，文件变化后整体重建索引（新增厂商无需重启）
+"""
+import fnmatch
+import glob
+import json
+import os
+import threading
+import time
+
+from protocols.vendors import VENDOR_ALIASES
+
+
+class CommandSpec:
+    """单条命令配置"""
+
+    def __init__(self, cmd, timeout=None, parser=None, interval=None):
+        self.cmd = cmd
+        self.timeout = timeout  # 命令超时（秒），为空时使用客户端默认值
+        self.parser = parser  # 输出解析器名称
+        self.interval = interval  # 最小采集间隔（秒），为空表示每轮都采集
+
+    @classmethod
+    def from_config(cls, item):
+        if isinstance(item, str):
+            return cls(item)
+        return cls(item["cmd"], item.get("timeout"), item.get("parser"), item.get("interval"))
+
+
+class CommandProfile:
+    """解析完成（已合并继承）的命令集"""
+
+    def __init__(self, name, specs):
+        self.name = name
+        self.specs = specs
+        self.commands = [spec.cmd for spec in specs]
+        self.timeouts = {spec.cmd: spec.timeout for spec in specs if spec.timeout}
+        self.parsers = {spec.cmd: spec.parser for spec in specs if spec.parser}
+        self.intervals = {spec.cmd: spec.interval for spec in specs if spec.interval}
+
+
+class ProfileRegistry:
+    """命令集注册表（线程安全，索引整体替换）"""
+
+    def __init__(self, profile_dir, poll_interval=5):
+        self.profile_dir = profile_dir
+        self.poll_interval = poll_interval
+        self._profiles = {}
+        self._patterns = []
+        self._mtimes = {}
+        self._lock = threading.Lock()
+        self.load_all()
+
+    def get(self, vendor, model):
+        """按厂商/型号查找命令集，依次匹配精确名称、别名与通配规则，未找到返回 None"""
+        vendor = VENDOR_ALIASES.get(vendor, vendor or "").lower()
+        key = f"{vendor}_{(model or '').lower()}"
+        profile = self._profiles.get(key)
+        if profile is not None:
+            return profile
+        for pattern, matched in self._patterns:
+            if fnmatch.fnmatchcase(key, pattern):
+                return matched
+        return None
+
+    def names(self):
+        return sorted(self._profiles)
+
+    def load_all(self):
+        """重新加载目录下全部命令集，解析失败时保留原索引"""
+        raw = {}
+        mtimes = self._scan_mtimes()
+        for path in mtimes:
+            name = os.path.splitext(os.path.basename(path))[0].lower()
+            with open(path, "r", encoding="utf-8") as f:
+                raw[name] = json.load(f)
+
+        profiles = {}
+        patterns = []
+        for name, config in raw.items():
+            profile = CommandProfile(name, self._resolve(name, raw, []))
+            if config.get("abstract"):
+                # 抽象基础命令集只用于继承和通配匹配
+                patterns.extend((p.lower(), profile) for p in config.get("match", []))
+                continue
+            profiles[name] = profile
+            for alias in config.get("aliases", []):
+                profiles.setdefault(alias.lower(), profile)
+            patterns.extend((p.lower(), profile) for p in config.get("match", []))
+
+        with self._lock:
+            self._profiles = profiles
+            self._patterns = patterns
+            self._mtimes = mtimes
+
+    def start_watcher(self):
+        """启动目录轮询线程"""
+        thread = threading.Thread(target=self._watch_loop, daemon=True)
+        thread.start()
+        return thread
+
+    def _resolve(self, name, raw, chain):
+        if name in chain:
+            raise ValueError(f"命令集继承存在循环：{' -> '.join(chain + [name])}")
+        if name not in raw:
+            raise ValueError(f"未找到被继承的命令集：{name}")
+        config = raw[name]
+        specs = {}
+        parent = config.get("extends")
+        if parent:
+            for spec in self._resolve(parent.lower(), raw, chain + [name]):
+                specs[spec.cmd] = spec
+        for item in config.get("cmds", []):
+            spec = CommandSpec.from_config(item)
+            specs[spec.cmd] = spec
+        return list(specs.values())
+
+    def _scan_mtimes(self):
+        return {path: os.path.getmtime(path)
+                for path in glob.glob(os.path.join(self.profile_dir, "*.json"))}
+
+    def _watch_loop(self):
+        while True:
+            time.sleep(self.poll_interval)
+            current = self._scan_mtimes()
+            if current == self._mtimes:
+                continue
+            try:
+                self.load_all()
+                print(f"命令集已重新加载：{len(self._profiles)} 个")
+            except Exception as e:
+                self._mtimes = current  # 文件再次修改前不重复尝试
+                print(f"命令集重新加载失败，继续使用旧配置：{e}")
@@ -0,0 +1,91 @@
+"""
+基于 pysnmp asyncio 接口的异步 SNMP 客户端，供并发采集引擎使用
+全进程共享一个 SnmpEngine，walk 使用 GETBULK 减少往返
+"""
+from pysnmp.hlapi.asyncio import (
+    CommunityData, ContextData, ObjectIdentity, ObjectType, SnmpEngine,
+    UdpTransportTarget, bulkCmd, getCmd
+)
+
+from protocols.snmp_client import CPU_USAGE_OID, IF_OPER_STATUS_OID, IF_STATUS_MAP, MEMORY_USAGE_OID
+
+_snmp_engine = None
+
+
+def get_snmp_engine():
+    global _snmp_engine
+    if _snmp_engine is None:
+        _snmp_engine = SnmpEngine()
+    return _snmp_engine
+
+
+class AsyncSNMPClient:
+    def __init__(self, ip, community, port=161, version=2, timeout=2, retries=1, max_repetitions=25):
+        self.ip = ip
+        self.community = community
+        self.port = port
+        self.version = version
+        self.timeout = timeout
+        self.retries = retries
+        self.max_repetitions = max_repetitions
+
+    async def get_metrics(self, metric_types):
+        """获取指定类型的SNMP指标，返回结构与 SNMPClient.get_metrics 一致"""
+        metrics = {}
+        scalars = {}
+        if "cpu" in metric_types:
+            scalars["cpu_usage"] = CPU_USAGE_OID
+        if "memory" in metric_types:
+            scalars["memory_usage"] = MEMORY_USAGE_OID
+        if scalars:
+            values = await self._get(list(scalars.values()))
+            for key, oid in scalars.items():
+                metrics[key] = values.get(oid)
+        if "interface" in metric_types:
+            results = await self._walk(IF_OPER_STATUS_OID)
+            metrics["interface_status"] = {f"if{idx}": IF_STATUS_MAP.get(int(val), "unknown")
+                                           for idx, val in results.items()}
+        return metrics
+
+    def _target(self):
+        return (CommunityData(self.community, mpModel=self.version - 1),
+                UdpTransportTarget((self.ip, self.port), timeout=self.timeout, retries=self.retries),
+                ContextData())
+
+    async def _get(self, oids):
+        """一个 PDU 内获取多个标量 OID"""
+        error_indication, error_status, error_index, var_binds = await getCmd(
+            get_snmp_engine(), *self._target(),
+            *[ObjectType(ObjectIdentity(oid)) for oid in oids]
+        )
+        if error_indication:
+            raise Exception(f"SNMP错误: {error_indication}")
+        return {str(name): value.prettyPrint() for name, value in var_binds}
+
+    async def _walk(self, oid):
+        """GETBULK 遍历子树，返回 {末位索引: 值}"""
+        results = {}
+        prefix = oid + "."
+        next_oid = oid
+        last = tuple(int(part) for part in oid.split("."))
+        while True:
+            error_indication, error_status, error_index, var_bind_table = await bulkCmd(
+                get_snmp_engine(), *self._target(), 0, self.max_repetitions,
+                ObjectType(ObjectIdentity(next_oid))
+            )
+            if error_indication:
+                raise Exception(f"SNMP错误: {error_indication}")
+            if error_status or not var_bind_table:
+                return results
+            for row in var_bind_table:
+                name, value = row[0]
+                oid_str = str(name)
+                if not oid_str.startswith(prefix):
+                    return results
+                # 代理返回的 OID 未递增时停止，避免异常设备使遍历死循环
+                current = tuple(int(part) for part in oid_str.split("."))
+                if current <= last:
+                    return results
+                last = current
+                results[oid_str.split('.')[-1]] = value.prettyPrint()
+                next_oid = oid_str
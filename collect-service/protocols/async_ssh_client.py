@@ -0,0 +1,114 @@
+"""
+基于 asyncssh 的异步 SSH 客户端，供并发采集引擎使用
+提示符学习、关闭分屏与输出清洗规则与同步 SSHClient 保持一致
+"""
+import asyncio
+import re
+
+import asyncssh
+
+from protocols.ssh_client import ANSI_PATTERN, GENERIC_PROMPT, MORE_PATTERN, PAGING_DISABLE_CMDS
+from protocols.vendors import VENDOR_ALIASES
+
+
+class AsyncSSHClient:
+    def __init__(self, ip, username, password, vendor=None, cmd_timeout=30, connect_timeout=10):
+        self.ip = ip
+        self.username = username
+        self.password = password
+        self.vendor = VENDOR_ALIASES.get(vendor, vendor.lower()) if vendor else None
+        self.cmd_timeout = cmd_timeout
+        self.connect_timeout = connect_timeout
+        self.conn = None
+        self.process = None
+        self.prompt = None
+        self._prompt_re = GENERIC_PROMPT
+
+    async def connect(self):
+        self.conn = await asyncio.wait_for(
+            asyncssh.connect(self.ip, username=self.username, password=self.password,
+                             known_hosts=None),
+            timeout=self.connect_timeout
+        )
+        # encoding=None 以字节流读取，交互式终端才会输出提示符
+        self.process = await self.conn.create_process(term_type="vt100", encoding=None)
+        await self._prepare_shell()
+
+    async def close(self):
+        if self.conn:
+            self.conn.close()
+            await self.conn.wait_closed()
+            self.conn = None
+
+    async def execute_cmds(self, cmds, timeouts=None):
+        timeouts = timeouts or {}
+        await self.connect()
+        try:
+            result = {}
+            for cmd in cmds:
+                self.process.stdin.write((cmd + "\n").encode())
+                output = await self._read_output(timeouts.get(cmd) or self.cmd_timeout)
+                result[cmd] = self._clean_output(output, cmd)
+            return result
+        finally:
+            await self.close()
+
+    async def _prepare_shell(self):
+        await self._read_until_quiet(quiet=0.5, timeout=10)  # 清空欢迎信息
+        self.process.stdin.write(b"\n")
+        lines = [line.strip() for line in (await self._read_until_quiet(quiet=0.3, timeout=5)).splitlines()]
+        lines = [line for line in lines if line]
+        if lines:
+            self.prompt = lines[-1]
+            self._prompt_re = re.compile(re.escape(self.prompt.encode()) + rb"\s*$")
+
+        paging_cmd = PAGING_DISABLE_CMDS.get(self.vendor)
+        if paging_cmd:
+            self.process.stdin.write((paging_cmd + "\n").encode())
+            await self._read_output(self.cmd_timeout)
+
+    async def _read_until_quiet(self, quiet, timeout):
+        buf = bytearray()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while loop.time() < deadline:
+            try:
+                chunk = await asyncio.wait_for(self.process.stdout.read(65535), timeout=quiet)
+            except asyncio.TimeoutError:
+                break
+            if not chunk:
+                break
+            buf += chunk
+        return buf.decode(errors="ignore")
+
+    async def _read_output(self, timeout):
+        buf = bytearray()
+        scan_from = 0
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                raise TimeoutError(f"设备 {self.ip} 命令执行超时（{timeout}秒）")
+            try:
+                chunk = await asyncio.wait_for(self.process.stdout.read(65535), timeout=remaining)
+            except asyncio.TimeoutError:
+                continue
+            if not chunk:
+                raise Exception(f"设备 {self.ip} SSH通道已关闭")
+            buf += chunk
+            tail = bytes(buf[max(scan_from, len(buf) - 256):])
+            if MORE_PATTERN.search(tail):
+                self.process.stdin.write(b" ")  # 翻页
+                scan_from = len(buf)
+            elif self._prompt_re.search(tail):
+                break
+        return MORE_PATTERN.sub(b"", bytes(buf)).decode(errors="ignore")
+
+    def _clean_output(self, output, cmd):
+        lines = ANSI_PATTERN.sub("", output).replace("\r", "").split("\n")
+        if lines and lines[0].strip().endswith(cmd):
+            lines = lines[1:]
+        if lines and self.prompt and lines[-1].strip() == self.prompt:
+            lines = lines[:-1]
+        return "\n".join(lines).strip()
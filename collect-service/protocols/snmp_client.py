@@ -1,40 +1,73 @@
 from pysnmp.hlapi import *
+from pysnmp.proto.rfc1905 import EndOfMibView, NoSuchInstance, NoSuchObject
+import threading
+
+CPU_USAGE_OID = "1.3.6.1.4.1.2011.5.25.31.1.1.1.1.6.1"  # 华为CPU使用率OID
+MEMORY_USAGE_OID = "1.3.6.1.4.1.2011.5.25.31.1.1.1.1.8.1"  # 华为内存使用率OID
+IF_OPER_STATUS_OID = "1.3.6.1.2.1.2.2.1.8"  # ifOperStatus
+IF_STATUS_MAP = {1: "up", 2: "down"}
+
+# LLDP-MIB 远端表列
+LLDP_REM_TABLE_OIDS = {
+    "neighbor": "1.0.8802.1.1.2.1.4.1.1.9",  # lldpRemSysName
+    "neighbor_port": "1.0.8802.1.1.2.1.4.1.1.8",  # lldpRemPortDesc
+    "neighbor_port_id": "1.0.8802.1.1.2.1.4.1.1.7",  # lldpRemPortId
+    "local_port_num": "1.0.8802.1.1.2.1.4.1.1.2",  # lldpRemLocalPortNum
+}
+LLDP_LOC_PORT_DESC_OID = "1.0.8802.1.1.2.1.3.7.1.4"  # lldpLocPortDesc
+
+# 标量指标，get_metrics 中合并为一次 GET
+SCALAR_METRIC_OIDS = {
+    "cpu": ("cpu_usage", CPU_USAGE_OID),
+    "memory": ("memory_usage", MEMORY_USAGE_OID),
+}
+
+_EMPTY_VALUE_TYPES = (EndOfMibView, NoSuchInstance, NoSuchObject)
+
+# SnmpEngine 构建开销大且非线程安全，按线程共享
+_engine_local = threading.local()
+
+
+def get_snmp_engine():
+    engine = getattr(_engine_local, "engine", None)
+    if engine is None:
+        engine = _engine_local.engine = SnmpEngine()
+    return engine
+
 
 class SNMPClient:
-    def __init__(self, ip, community, port=161, version=2):
+    def __init__(self, ip, community, port=161, version=2, max_repetitions=25, timeout=2, retries=1):
         self.ip = ip
         self.community = community
         self.port = port
         self.version = version  # 2 for v2c, 3 for v3
+        self.max_repetitions = max_repetitions  # GETBULK 每个 PDU 返回的行数
+        self.timeout = timeout
+        self.retries = retries
+        self._auth = None
+        self._transport = None
 
     def get_metrics(self, metric_types):
         """获取指定类型的SNMP指标（CPU/内存/接口）"""
         metrics = {}
-        if "cpu" in metric_types:
-            metrics["cpu_usage"] = self._get_cpu_usage()
-        if "memory" in metric_types:
-            metrics["memory_usage"] = self._get_memory_usage()
+        scalars = [SCALAR_METRIC_OIDS[t] for t in metric_types if t in SCALAR_METRIC_OIDS]
+        if scalars:
+            values = self._get_oid_values([oid for _, oid in scalars])
+            for key, oid in scalars:
+                metrics[key] = values.get(oid)
         if "interface" in metric_types:
             metrics["interface_status"] = self._get_interface_status()
         return metrics
 
     def get_lldp_neighbors(self):
         """采集 LLDP 邻居信息（基于 LLDP-MIB）"""
-        # OID 常量
-        lldp_rem_table_oids = {
-            "neighbor": "1.0.8802.1.1.2.1.4.1.1.9",  # lldpRemSysName
-            "neighbor_port": "1.0.8802.1.1.2.1.4.1.1.8",  # lldpRemPortDesc
-            "neighbor_port_id": "1.0.8802.1.1.2.1.4.1.1.7",  # lldpRemPortId
-            "local_port_num": "1.0.8802.1.1.2.1.4.1.1.2",  # lldpRemLocalPortNum
-        }
-        lldp_loc_port_desc_oid = "1.0.8802.1.1.2.1.3.7.1.4"  # lldpLocPortDesc
-
-        local_port_desc = self._walk_oid_with_suffix(lldp_loc_port_desc_oid)
+        # 远端表各列与本地端口描述在一次多变量 walk 中取回
+        columns = self._walk_columns(list(LLDP_REM_TABLE_OIDS.values()) + [LLDP_LOC_PORT_DESC_OID])
+        local_port_desc = columns[LLDP_LOC_PORT_DESC_OID]
 
         neighbor_data = {}
-        for key, oid in lldp_rem_table_oids.items():
-            values = self._walk_oid_with_suffix(oid)
-            for suffix, value in values.items():
+        for key, oid in LLDP_REM_TABLE_OIDS.items():
+            for suffix, value in columns[oid].items():
                 entry = neighbor_data.setdefault(suffix, {})
                 entry[key] = value
 
@@ -57,70 +90,75 @@ class SNMPClient:
 
     def _get_cpu_usage(self):
         """获取CPU使用率（华为设备OID示例）"""
-        oid = "1.3.6.1.4.1.2011.5.25.31.1.1.1.1.6.1"  # 华为CPU使用率OID
-        return self._get_oid_value(oid)
+        return self._get_oid_value(CPU_USAGE_OID)
 
     def _get_memory_usage(self):
         """获取内存使用率（华为设备OID示例）"""
-        oid = "1.3.6.1.4.1.2011.5.25.31.1.1.1.1.8.1"  # 华为内存使用率OID
-        return self._get_oid_value(oid)
+        return self._get_oid_value(MEMORY_USAGE_OID)
 
     def _get_interface_status(self):
         """获取接口状态（通用OID）"""
-        oid = "1.3.6.1.2.1.2.2.1.8"  # ifOperStatus
-        results = self._walk_oid(oid)
-        status_map = {1: "up", 2: "down"}
-        return {f"if{idx}": status_map.get(int(val), "unknown") 
+        results = self._walk_oid(IF_OPER_STATUS_OID)
+        return {f"if{idx}": IF_STATUS_MAP.get(int(val), "unknown")
                 for idx, val in results.items()}
 
+    def _target(self):
+        """认证与传输参数只构建一次（UdpTransportTarget 构造时会解析地址）"""
+        if self._transport is None:
+            self._auth = CommunityData(self.community, mpModel=self.version-1)
+            self._transport = UdpTransportTarget((self.ip, self.port), timeout=self.timeout, retries=self.retries)
+        return self._auth, self._transport
+
     def _get_oid_value(self, oid):
         """获取单个OID的值"""
+        return self._get_oid_values([oid])[oid]
+
+    def _get_oid_values(self, oids):
+        """一个 GET PDU 获取多个OID的值"""
+        auth, transport = self._target()
         error_indication, error_status, error_index, var_binds = next(
-            getCmd(SnmpEngine(),
-                   CommunityData(self.community, mpModel=self.version-1),
-                   UdpTransportTarget((self.ip, self.port)),
-                   ContextData(),
-                   ObjectType(ObjectIdentity(oid)))
+            getCmd(get_snmp_engine(), auth, transport, ContextData(),
+                   *[ObjectType(ObjectIdentity(oid)) for oid in oids])
         )
         if error_indication:
             raise Exception(f"SNMP错误: {error_indication}")
-        return var_binds[0][1].prettyPrint()
+        return {str(name): value.prettyPrint() for name, value in var_binds}
+
+    def _walk_columns(self, oids):
+        """
+        多变量并行遍历多个表列，v2c 起使用 GETBULK
+        :return: {列OID: {后缀索引: 值}}
+        """
+        auth, transport = self._target()
+        var_binds = [ObjectType(ObjectIdentity(oid)) for oid in oids]
+        if self.version >= 2:
+            iterator = bulkCmd(get_snmp_engine(), auth, transport, ContextData(),
+                               0, self.max_repetitions, *var_binds, lexicographicMode=False)
+        else:
+            iterator = nextCmd(get_snmp_engine(), auth, transport, ContextData(),
+                               *var_binds, lexicographicMode=False)
+
+        prefixes = [oid + "." for oid in oids]
+        results = {oid: {} for oid in oids}
+        for (error_indication, error_status, error_index, var_bind_row) in iterator:
+            if error_indication:
+                raise Exception(f"SNMP错误: {error_indication}")
+            # 已遍历完的列会以空值占位，按列前缀过滤
+            for column, (name, value) in enumerate(var_bind_row):
+                oid_str = str(name)
+                if isinstance(value, _EMPTY_VALUE_TYPES) or not oid_str.startswith(prefixes[column]):
+                    continue
+                results[oids[column]][oid_str[len(prefixes[column]):]] = value.prettyPrint()
+        return results
 
     def _walk_oid(self, oid):
         """遍历OID获取多个值"""
         results = {}
-        for (error_indication, error_status, error_index, var_binds) in nextCmd(
-            SnmpEngine(),
-            CommunityData(self.community, mpModel=self.version-1),
-            UdpTransportTarget((self.ip, self.port)),
-            ContextData(),
-            ObjectType(ObjectIdentity(oid)),
-            lexicographicMode=False
-        ):
-            if error_indication:
-                raise Exception(f"SNMP错误: {error_indication}")
-            for var_bind in var_binds:
-                oid_str = str(var_bind[0])
-                idx = oid_str.split('.')[-1]  # 提取接口索引
-                results[idx] = var_bind[1].prettyPrint()
+        for suffix, value in self._walk_oid_with_suffix(oid).items():
+            idx = suffix.split('.')[-1]  # 提取接口索引
+            results[idx] = value
         return results
 
     def _walk_oid_with_suffix(self, oid):
         """遍历OID并保留完整后缀索引"""
-        results = {}
-        for (error_indication, error_status, error_index, var_binds) in nextCmd(
-            SnmpEngine(),
-            CommunityData(self.community, mpModel=self.version-1),
-            UdpTransportTarget((self.ip, self.port)),
-            ContextData(),
-            ObjectType(ObjectIdentity(oid)),
-            lexicographicMode=False
-        ):
-            if error_indication:
-                raise Exception(f"SNMP错误: {error_indication}")
-            for var_bind in var_binds:
-                oid_str = str(var_bind[0])
-                base_len = len(oid.split('.'))
-                suffix = '.'.join(oid_str.split('.')[base_len:])
-                results[suffix] = var_bind[1].prettyPrint()
-        return results
+        return self._walk_columns([oid])[oid]
@@ -1,40 +1,191 @@
 import paramiko
+import re
+import select
 import time
 
+from protocols.vendors import VENDOR_ALIASES
+
+# 关闭分屏的厂商命令（登录后执行一次，避免逐页翻屏）
+PAGING_DISABLE_CMDS = {
+    "huawei": "screen-length 0 temporary",
+    "h3c": "screen-length disable",
+    "cisco": "terminal length 0",
+    "ruijie": "terminal length 0"
+}
+
+MORE_PATTERN = re.compile(rb"-+\s*More\s*-+")
+# 翻页后设备回显的光标控制序列（如 \x1b[42D）
+ANSI_PATTERN = re.compile(r"\x1b\[\d*[A-Za-z]")
+# 退回用户视图的命令：华为/华三系统视图 [HUAWEI]、思科/锐捷配置模式 Switch(config)#
+RETURN_VIEW_CMDS = (("[", "return"), ("(config", "end"))
+# 从登录提示符中提取主机名：<HUAWEI>、[~HUAWEI]、[HUAWEI]、Switch#、Switch>
+PROMPT_HOST_PATTERN = re.compile(r"^(?:<(.+)>|\[[~*]?(.+)\]|(.+?)(?:\([^)]*\))?[#>])$")
+# 未学习到提示符时的兜底匹配
+GENERIC_PROMPT = re.compile(rb"[>#\]]\s*$")
+
+
 class SSHClient:
-    def __init__(self, ip, username, password):
+    def __init__(self, ip, username, password, pool=None, vendor=None, cmd_timeout=30):
         self.ip = ip
         self.username = username
         self.password = password
+        self.pool = pool  # SSHSessionPool，为空时每次采集独立建连
+        self.vendor = VENDOR_ALIASES.get(vendor, vendor.lower()) if vendor else None
+        self.cmd_timeout = cmd_timeout  # 单条命令默认超时（秒）
         self.ssh = None
+        self.shell = None
+        self.prompt = None
+        self.current_prompt = None  # 最近一条命令结束时设备的提示符
+        self._prompt_re = GENERIC_PROMPT
 
     def connect(self):
         self.ssh = paramiko.SSHClient()
         self.ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
         self.ssh.connect(self.ip, username=self.username, password=self.password, timeout=10)
         self.shell = self.ssh.invoke_shell()
-        time.sleep(1)
-        self.shell.recv(1024)  # 清空欢迎信息
+        self._prepare_shell()
 
-    def execute_cmds(self, cmds):
-        self.connect()
+    def execute_cmds(self, cmds, timeouts=None):
+        """
+        依次执行命令
+        :param timeouts: 按命令指定超时（秒），未指定的使用 cmd_timeout
+        """
+        if self.pool is None:
+            self.connect()
+            try:
+                return self._run_cmds(cmds, timeouts)
+            finally:
+                self.ssh.close()
+
+        # 复用会话池中已认证的连接，异常时由会话池关闭该会话
+        with self.pool.session(self.ip, self.username, self.password) as session:
+            self.ssh, self.shell = session.ssh, session.shell
+            try:
+                if session.prompt is None:
+                    self._prepare_shell()
+                    session.prompt = self.prompt
+                else:
+                    self._set_prompt(session.prompt)
+                result = self._run_cmds(cmds, timeouts)
+                # 归还会话池前退回登录时的视图，避免下一个调用方在系统视图/配置模式下执行命令
+                self._restore_view()
+                return result
+            finally:
+                self.ssh, self.shell = None, None
+
+    def execute_single_cmd(self, cmd, timeout=None):
+        return self.execute_cmds([cmd], {cmd: timeout} if timeout else None)[cmd]
+
+    def _run_cmds(self, cmds, timeouts=None):
+        timeouts = timeouts or {}
         result = {}
         for cmd in cmds:
             self.shell.send(cmd + "\n")
-            time.sleep(2)
-            output = self._read_output()
-            result[cmd] = output
-        self.ssh.close()
+            output = self._read_output(timeouts.get(cmd) or self.cmd_timeout)
+            result[cmd] = self._clean_output(output, cmd)
         return result
 
-    def _read_output(self):
-        output = ""
+    def _prepare_shell(self):
+        """
+        建立会话后学习设备提示符并关闭分屏，会话池中的会话只在建连时执行一次
+        调用方未指定厂商时按提示符风格推断：<HUAWEI> 为华为/华三，Switch# 为思科/锐捷
+        """
+        self._read_until_quiet(quiet=0.5, timeout=10)  # 清空欢迎信息
+        self.shell.send("\n")
+        lines = [line.strip() for line in self._read_until_quiet(quiet=0.3, timeout=5).splitlines()]
+        lines = [line for line in lines if line]
+        if lines:
+            self._set_prompt(lines[-1])
+
+        for paging_cmd in self._paging_cmds():
+            self.shell.send(paging_cmd + "\n")
+            self._read_output(self.cmd_timeout)
+
+    def _paging_cmds(self):
+        if self.vendor in PAGING_DISABLE_CMDS:
+            return [PAGING_DISABLE_CMDS[self.vendor]]
+        if not self.prompt:
+            return []
+        if self.prompt.startswith(("<", "[")):
+            # 华为与华三命令不同，不支持的一条仅返回错误提示
+            return [PAGING_DISABLE_CMDS["huawei"], PAGING_DISABLE_CMDS["h3c"]]
+        return [PAGING_DISABLE_CMDS["cisco"]]
+
+    def _restore_view(self):
+        """命令改变了视图（如 system-view）时执行 return/end 退回，仍未回到登录视图则抛出异常"""
+        if not self.prompt or not self.current_prompt or self.current_prompt == self.prompt:
+            return
+        cmd = next((c for mark, c in RETURN_VIEW_CMDS if mark in self.current_prompt), "return")
+        self.shell.send(cmd + "\n")
+        self._read_output(self.cmd_timeout)
+        if self.current_prompt != self.prompt:
+            raise Exception(f"设备 {self.ip} 无法退回用户视图（当前提示符 {self.current_prompt}）")
+
+    def _set_prompt(self, prompt):
+        """
+        按主机名生成提示符匹配，覆盖命令切换后的各视图：
+        <HUAWEI>、[HUAWEI]、[~HUAWEI-GigabitEthernet0/0/1]、Switch#、Switch(config-if)#
+        """
+        self.prompt = prompt
+        match = PROMPT_HOST_PATTERN.match(prompt or "")
+        host = next((g for g in match.groups() if g), None) if match else None
+        if host:
+            host = re.escape(host.encode())
+            self._prompt_re = re.compile(
+                rb"(?:<" + host + rb"(?:-[^>\s]*)?>|\[[~*]?" + host + rb"(?:-[^\]\s]*)?\]"
+                rb"|" + host + rb"(?:\([^)\s]*\))?[#>])\s*$"
+            )
+        elif prompt:
+            self._prompt_re = re.compile(re.escape(prompt.encode()) + rb"\s*$")
+        else:
+            self._prompt_re = GENERIC_PROMPT
+
+    def _read_until_quiet(self, quiet, timeout):
+        """读取直到通道静默 quiet 秒（仅用于提示符未知的登录阶段）"""
+        buf = bytearray()
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            readable, _, _ = select.select([self.shell], [], [], quiet)
+            if not readable:
+                break
+            chunk = self.shell.recv(65535)
+            if not chunk:
+                break
+            buf += chunk
+        return buf.decode(errors="ignore")
+
+    def _read_output(self, timeout):
+        """非阻塞读取直到提示符重新出现，遇到分屏提示时自动翻页"""
+        buf = bytearray()
+        scan_from = 0  # 已处理过分屏提示的位置，避免对同一提示重复翻页
+        deadline = time.monotonic() + timeout
         while True:
-            chunk = self.shell.recv(4096).decode(errors="ignore")
-            output += chunk
-            if "--- More ---" in chunk:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(f"设备 {self.ip} 命令执行超时（{timeout}秒）")
+            readable, _, _ = select.select([self.shell], [], [], remaining)
+            if not readable:
+                continue
+            chunk = self.shell.recv(65535)
+            if not chunk:
+                raise Exception(f"设备 {self.ip} SSH通道已关闭")
+            buf += chunk
+            tail = bytes(buf[max(scan_from, len(buf) - 256):])
+            if MORE_PATTERN.search(tail):
                 self.shell.send(" ")  # 翻页
-                time.sleep(1)
-            elif chunk.endswith(">") or chunk.endswith("#"):
+                scan_from = len(buf)
+            elif self._prompt_re.search(tail):
                 break
-        return output.replace("--- More ---", "").strip()
+        output = MORE_PATTERN.sub(b"", bytes(buf)).decode(errors="ignore")
+        lines = ANSI_PATTERN.sub("", output).replace("\r", "").rstrip().split("\n")
+        self.current_prompt = lines[-1].strip()
+        return output
+
+    def _clean_output(self, output, cmd):
+        """去除控制字符、命令回显与末尾提示符"""
+        lines = ANSI_PATTERN.sub("", output).replace("\r", "").split("\n")
+        if lines and lines[0].strip().endswith(cmd):
+            lines = lines[1:]
+        if lines and self._prompt_re.search(lines[-1].strip().encode()):
+            lines = lines[:-1]
+        return "\n".join(lines).strip()
@@ -0,0 +1,218 @@
+"""
+SSH 会话池：按 (ip, username, 密码摘要) 复用已认证的 paramiko 连接
+避免每次采集都重新握手/认证，支持空闲超时、单设备会话上限、健康检查与 LRU 淘汰
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import paramiko
+
+
+class PooledSession:
+    """池化的 SSH 会话（连接 + 交互式 shell）"""
+
+    def __init__(self, key, ssh, shell):
+        self.key = key
+        self.ssh = ssh
+        self.shell = shell
+        self.prompt = None  # 首次使用时由 SSHClient 学习并缓存
+        self.created_at = time.time()
+        self.last_used = self.created_at
+
+    def is_alive(self, probe=False):
+        """健康检查：传输层存活且 shell 未关闭，probe=True 时额外发送 ignore 报文探测"""
+        transport = self.ssh.get_transport() if self.ssh else None
+        if transport is None or not transport.is_active() or self.shell.closed:
+            return False
+        if probe:
+            try:
+                transport.send_ignore()
+            except Exception:
+                return False
+        return True
+
+    def drain(self):
+        """清空上次使用残留在缓冲区中的输出"""
+        while self.shell.recv_ready():
+            self.shell.recv(65535)
+
+    def close(self):
+        try:
+            self.ssh.close()
+        except Exception:
+            pass
+
+
+class SSHSessionPool:
+    """线程安全的 SSH 会话池"""
+
+    def __init__(self, max_per_device=2, max_total=500, idle_timeout=300,
+                 health_check_interval=30, connect_timeout=10, acquire_timeout=60):
+        """
+        :param max_per_device: 单台设备最多同时保持的会话数（设备 VTY 数有限）
+        :param max_total: 全局会话上限，超出时按 LRU 淘汰空闲会话
+        :param idle_timeout: 空闲会话存活时间（秒）
+        :param health_check_interval: 空闲超过该时长的会话复用前主动探测（秒）
+        :param connect_timeout: 建立连接超时（秒）
+        :param acquire_timeout: 等待可用会话的最长时间（秒）
+        """
+        self.max_per_device = max_per_device
+        self.max_total = max_total
+        self.idle_timeout = idle_timeout
+        self.health_check_interval = health_check_interval
+        self.connect_timeout = connect_timeout
+        self.acquire_timeout = acquire_timeout
+
+        # 空闲会话，按最近归还时间排序（队首为最久未使用）
+        self._idle = OrderedDict()
+        # 每台设备（按 ip）当前会话数（含使用中与空闲）
+        self._device_count = {}
+        self._total = 0
+        self._cond = threading.Condition()
+        self._closed = False
+
+        self._reaper = threading.Thread(target=self._reap_loop, daemon=True)
+        self._reaper.start()
+
+    def acquire(self, ip, username, password):
+        """获取会话：优先复用空闲会话，否则在配额内新建"""
+        # 键中带密码摘要：密码不同的调用方不能复用他人已认证的会话
+        key = (ip, username, hashlib.sha256((password or "").encode()).hexdigest())
+        deadline = time.time() + self.acquire_timeout
+        session = None
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise Exception("SSH会话池已关闭")
+                self._purge_expired()
+                session = self._pop_idle(key)
+                if session is not None:
+                    probe = time.time() - session.last_used > self.health_check_interval
+                    if session.is_alive(probe=probe):
+                        session.last_used = time.time()
+                        break
+                    self._discard(session)
+                    session = None
+                    continue
+                # 设备配额被其他账号的空闲会话占满、或全局已满时，淘汰最久未使用的空闲会话腾出名额
+                if (self._device_count.get(ip, 0) < self.max_per_device or self._evict_device(ip)) and \
+                        (self._total < self.max_total or self._evict_lru()):
+                    self._device_count[ip] = self._device_count.get(ip, 0) + 1
+                    self._total += 1
+                    break
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    raise Exception(f"获取设备 {ip} 的SSH会话超时")
+                self._cond.wait(remaining)
+
+        if session is not None:
+            session.drain()
+            return session
+
+        # 建连放在锁外，避免阻塞其他设备
+        try:
+            return self._open(key, password)
+        except Exception:
+            with self._cond:
+                self._release_slot(key)
+            raise
+
+    def release(self, session, broken=False):
+        """归还会话，broken=True 时直接关闭"""
+        with self._cond:
+            if broken or self._closed or not session.is_alive():
+                self._discard(session)
+                return
+            session.last_used = time.time()
+            self._idle[id(session)] = session
+            self._cond.notify_all()
+
+    @contextmanager
+    def session(self, ip, username, password):
+        session = self.acquire(ip, username, password)
+        try:
+            yield session
+        except Exception:
+            self.release(session, broken=True)
+            raise
+        else:
+            self.release(session)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "total": self._total,
+                "idle": len(self._idle),
+                "devices": len(self._device_count)
+            }
+
+    def close_all(self):
+        with self._cond:
+            self._closed = True
+            for session in list(self._idle.values()):
+                self._discard(session)
+            self._cond.notify_all()
+
+    def _open(self, key, password):
+        ip, username, _ = key
+        ssh = paramiko.SSHClient()
+        ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        ssh.connect(ip, username=username, password=password, timeout=self.connect_timeout)
+        shell = ssh.invoke_shell()
+        return PooledSession(key, ssh, shell)
+
+    def _pop_idle(self, key):
+        # 从最近使用的会话开始查找，冷会话更可能已被设备断开
+        for sid in reversed(self._idle):
+            session = self._idle[sid]
+            if session.key == key:
+                del self._idle[sid]
+                return session
+        return None
+
+    def _purge_expired(self):
+        now = time.time()
+        expired = [s for s in self._idle.values() if now - s.last_used > self.idle_timeout]
+        for session in expired:
+            del self._idle[id(session)]
+            self._discard(session)
+
+    def _evict_device(self, ip):
+        for sid, session in self._idle.items():
+            if session.key[0] == ip:
+                del self._idle[sid]
+                self._discard(session)
+                return True
+        return False
+
+    def _evict_lru(self):
+        if not self._idle:
+            return False
+        _, session = self._idle.popitem(last=False)
+        self._discard(session)
+        return True
+
+    def _discard(self, session):
+        self._idle.pop(id(session), None)
+        session.close()
+        self._release_slot(session.key)
+
+    def _release_slot(self, key):
+        ip = key[0]
+        count = self._device_count.get(ip, 0) - 1
+        if count > 0:
+            self._device_count[ip] = count
+        else:
+            self._device_count.pop(ip, None)
+        self._total -= 1
+        self._cond.notify_all()
+
+    def _reap_loop(self):
+        interval = max(1, min(self.idle_timeout, 30))
+        while not self._closed:
+            time.sleep(interval)
+            with self._cond:
+                self._purge_expired()
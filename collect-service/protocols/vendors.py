@@ -0,0 +1,5 @@
+"""
+厂商名称归一化：中文厂商名 -> 内部厂商标识
+不依赖 paramiko 等连接库，解析器、命令集注册表与拓扑解析可直接导入
+"""
+VENDOR_ALIASES = {"华为": "huawei", "华三": "h3c", "思科": "cisco", "锐捷": "ruijie"}
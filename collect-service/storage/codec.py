@@ -0,0 +1,81 @@
+"""
+指标序列化：带版本头的紧凑二进制编码
+格式：1 字节版本号 + 1 字节编码标志 + 负载
+- 编码标志低 4 位为序列化器（1=JSON，2=msgpack），第 5 位表示负载经过 zstd 压缩
+- 以 "{" 开头的数据视为旧版纯 JSON，保持向后兼容
+ai-service/metrics_codec.py 中的解码实现需与本文件保持一致
+"""
+import json
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+FORMAT_VERSION = 1
+SERIALIZER_JSON = 1
+SERIALIZER_MSGPACK = 2
+FLAG_ZSTD = 0x10
+
+
+class MetricsCodec:
+    def __init__(self, serializer="msgpack", compress="zstd", compress_threshold=512, level=3):
+        """
+        :param serializer: msgpack 或 json（依赖未安装时自动退回 json）
+        :param compress: zstd 或 none（依赖未安装时不压缩）
+        :param compress_threshold: 负载超过该字节数才压缩
+        """
+        self.serializer = SERIALIZER_MSGPACK if serializer == "msgpack" and msgpack else SERIALIZER_JSON
+        self.compress = compress == "zstd" and zstandard is not None
+        self.compress_threshold = compress_threshold
+        self.level = level
+
+    def encode(self, metrics):
+        if self.serializer == SERIALIZER_MSGPACK:
+            payload = msgpack.packb(metrics, use_bin_type=True)
+        else:
+            payload = _json_dumps(metrics)
+        flags = self.serializer
+        if self.compress and len(payload) > self.compress_threshold:
+            # ZstdCompressor 非线程安全，按次创建（开销远小于压缩本身）
+            payload = zstandard.ZstdCompressor(level=self.level).compress(payload)
+            flags |= FLAG_ZSTD
+        return bytes((FORMAT_VERSION, flags)) + payload
+
+    @staticmethod
+    def decode(data):
+        if data is None:
+            return None
+        if isinstance(data, str):
+            data = data.encode()
+        if data[:1] in (b"{", b"["):
+            return json.loads(data)  # 旧版纯 JSON
+        version, flags = data[0], data[1]
+        if version != FORMAT_VERSION:
+            raise ValueError(f"不支持的指标编码版本：{version}")
+        payload = data[2:]
+        if flags & FLAG_ZSTD:
+            if zstandard is None:
+                raise ValueError("指标数据经过 zstd 压缩，但未安装 zstandard")
+            payload = zstandard.ZstdDecompressor().decompress(payload)
+        if flags & 0x0F == SERIALIZER_MSGPACK:
+            if msgpack is None:
+                raise ValueError("指标数据为 msgpack 编码，但未安装 msgpack")
+            return msgpack.unpackb(payload, raw=False, strict_map_key=False)
+        return json.loads(payload)
+
+
+def _json_dumps(value):
+    if orjson is not None:
+        return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode()
@@ -0,0 +1,120 @@
+"""
+增量采集：按命令记录输出摘要与上次执行时间
+- 命令集中可为命令配置 interval（秒），未到期的命令本轮跳过
+- 输出去除易变行（运行时长、时间戳）后计算摘要，与上次一致视为未变化，不再重复解析和存储
+- 写入快照 raw 字段的原始输出同样去除易变行（见 parsers.registry），沿用的旧输出中不会留下过期的时间，
+  ai-service 推理结果缓存据此直接用 raw 计算缓存键，不再单独维护一份易变行规则
+- 状态保存在 Redis Hash cmdstate:{device_id} 中，字段为命令，值为 "摘要:执行时间"
+- 写入快照前用上次快照为接口补充错包增量与历史 up 状态，供故障预检判断
+"""
+import hashlib
+import re
+import time
+
+# 每次执行都会变化但不代表配置/状态变化的行
+VOLATILE_LINE_PATTERN = re.compile(
+    r"uptime is|\d{4}-\d{2}-\d{2}\s+\d{2}:\d{2}:\d{2}|\d{2}:\d{2}:\d{2}\s+\d{4}", re.IGNORECASE
+)
+
+
+def strip_volatile_lines(output):
+    """去掉易变行与行尾空白"""
+    return "\n".join(line.rstrip() for line in output.splitlines() if not VOLATILE_LINE_PATTERN.search(line))
+
+
+def output_digest(output):
+    return hashlib.blake2b(strip_volatile_lines(output).encode(), digest_size=16).hexdigest()
+
+
+class CommandDeltaTracker:
+    def __init__(self, redis_client, ttl=7 * 86400):
+        self.redis = redis_client
+        self.ttl = ttl
+
+    @staticmethod
+    def key(device_id):
+        return f"cmdstate:{device_id}"
+
+    def load(self, device_id):
+        """读取设备各命令的 {命令: (摘要, 上次执行时间)}"""
+        state = {}
+        for cmd, value in self.redis.hgetall(self.key(device_id)).items():
+            cmd = cmd.decode() if isinstance(cmd, bytes) else cmd
+            value = value.decode() if isinstance(value, bytes) else value
+            digest, _, ts = value.partition(":")
+            state[cmd] = (digest, float(ts or 0))
+        return state
+
+    @staticmethod
+    def due_commands(state, profile, now=None):
+        """本轮需要执行的命令（未配置间隔或已到期）"""
+        now = now or time.time()
+        due = []
+        for cmd in profile.commands:
+            interval = profile.intervals.get(cmd)
+            last = state.get(cmd)
+            if not interval or last is None or now - last[1] >= interval:
+                due.append(cmd)
+        return due
+
+    def record(self, device_id, state, outputs, now=None):
+        """
+        记录本轮输出摘要
+        :return: (changed: {命令: 输出}, unchanged: [命令])
+        """
+        now = now or time.time()
+        changed = {}
+        unchanged = []
+        mapping = {}
+        for cmd, output in outputs.items():
+            digest = output_digest(output)
+            previous = state.get(cmd)
+            if previous is not None and previous[0] == digest:
+                unchanged.append(cmd)
+            else:
+                changed[cmd] = output
+            mapping[cmd] = f"{digest}:{int(now)}"
+        if mapping:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.hset(self.key(device_id), mapping=mapping)
+            pipe.expire(self.key(device_id), self.ttl)
+            pipe.execute()
+        return changed, unchanged
+
+    def reset(self, device_id):
+        self.redis.delete(self.key(device_id))
+
+
+def merge_snapshot(previous, parsed, changed_cmds):
+    """把本轮变化命令的解析结果合并到上次快照中"""
+    merged = {key: value for key, value in (previous or {}).items() if key not in ("raw", "collection")}
+    raw = {cmd: output for cmd, output in (previous or {}).get("raw", {}).items() if cmd not in changed_cmds}
+    merged.update({key: value for key, value in parsed.items() if key != "raw"})
+    raw.update(parsed.get("raw", {}))
+    if raw:
+        merged["raw"] = raw
+    return merged
+
+
+def annotate_interfaces(previous, metrics):
+    """
+    用上次快照补充接口信息（就地修改 metrics）
+    - in_errors_delta / out_errors_delta：错包计数器相对上次快照的增量，计数器清零或回绕时取当前值
+    - ever_up：接口在本次或此前的快照中为 up，从未 up 过的 down 接口多为未使用的空闲端口
+    """
+    interfaces = metrics.get("interfaces")
+    if not isinstance(interfaces, dict):
+        return metrics
+    previous_interfaces = (previous or {}).get("interfaces") or {}
+    for name, status in interfaces.items():
+        if not isinstance(status, dict):
+            continue
+        last = previous_interfaces.get(name)
+        last = last if isinstance(last, dict) else {}
+        if status.get("status") == "up" or last.get("status") == "up" or last.get("ever_up"):
+            status["ever_up"] = True
+        for key in ("in_errors", "out_errors"):
+            current, before = status.get(key), last.get(key)
+            if isinstance(current, (int, float)) and isinstance(before, (int, float)):
+                status[f"{key}_delta"] = current - before if current >= before else current
+    return metrics
@@ -0,0 +1,54 @@
+"""
+最新指标快照缓存（Redis，键为 metrics:{device_id}）
+批量写入使用 pipeline，批量读取使用 MGET，每批一次网络往返
+"""
+from storage.codec import MetricsCodec
+
+KEY_PREFIX = "metrics:"
+
+
+class MetricsStore:
+    def __init__(self, redis_client, codec=None, ttl=3600, batch_size=500):
+        self.redis = redis_client
+        self.codec = codec or MetricsCodec()
+        self.ttl = ttl
+        self.batch_size = batch_size
+
+    @staticmethod
+    def key(device_id):
+        return f"{KEY_PREFIX}{device_id}"
+
+    def set(self, device_id, metrics):
+        self.redis.set(self.key(device_id), self.codec.encode(metrics), ex=self.ttl)
+
+    def set_many(self, items):
+        """
+        批量写入
+        :param items: {device_id: metrics} 或 (device_id, metrics) 可迭代对象
+        """
+        if isinstance(items, dict):
+            items = items.items()
+        pipe = self.redis.pipeline(transaction=False)
+        pending = 0
+        for device_id, metrics in items:
+            pipe.set(self.key(device_id), self.codec.encode(metrics), ex=self.ttl)
+            pending += 1
+            if pending >= self.batch_size:
+                pipe.execute()
+                pending = 0
+        if pending:
+            pipe.execute()
+
+    def get(self, device_id):
+        return self.codec.decode(self.redis.get(self.key(device_id)))
+
+    def get_many(self, device_ids):
+        """批量读取，返回 {device_id: metrics}，缺失的设备不出现在结果中"""
+        device_ids = list(device_ids)
+        results = {}
+        for start in range(0, len(device_ids), self.batch_size):
+            chunk = device_ids[start:start + self.batch_size]
+            for device_id, data in zip(chunk, self.redis.mget([self.key(d) for d in chunk])):
+                if data is not None:
+                    results[device_id] = self.codec.decode(data)
+        return results
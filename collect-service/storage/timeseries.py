@@ -0,0 +1,190 @@
+"""
+指标历史时序存储（基于 Redis Hash，无需 RedisTimeSeries 模块）
+- 每次采集把结构化指标展开为数值序列（如 cpu_usage、interfaces.GE0/0/1.in_util），
+  写入时直接累加到 1m / 5m / 1h 三个粒度的聚合桶（sum / count / max）
+- 同一设备同一粒度的桶按时间分片存放在 ts:{device_id}:{粒度}:{分片起点} 中，分片按保留期过期
+- 单台设备的全部指标由一次 Lua 脚本调用写入，批量写入通过 pipeline 合并为一次往返
+"""
+import time
+
+# 粒度名称 -> (桶宽秒数, 分片跨度秒数, 保留秒数)
+RESOLUTIONS = {
+    "1m": (60, 86400, 7 * 86400),
+    "5m": (300, 7 * 86400, 30 * 86400),
+    "1h": (3600, 30 * 86400, 365 * 86400),
+}
+# 接口状态等离散值映射为数值，便于统计可用率
+STATUS_VALUES = {"up": 1, "down": 0, "admin_down": 0, "standby": 0}
+# 写入历史的指标白名单：设备级指标与每个接口的状态、利用率、错包计数器
+HISTORY_METRICS = ("cpu_usage", "memory_usage")
+INTERFACE_HISTORY_FIELDS = ("status", "protocol", "in_util", "out_util", "in_errors", "out_errors")
+MAX_POINTS = 1500
+# 单次查询最多读取的桶数（每个桶一次 HMGET），足以覆盖 1h 粒度下的完整保留期
+MAX_BUCKETS = MAX_POINTS * 6
+
+_APPEND_SCRIPT = """
+local device = ARGV[1]
+local ts = tonumber(ARGV[2])
+local nres = tonumber(ARGV[3])
+local idx = 4
+local resolutions = {}
+for i = 1, nres do
+    resolutions[i] = {ARGV[idx], tonumber(ARGV[idx + 1]), tonumber(ARGV[idx + 2]), tonumber(ARGV[idx + 3])}
+    idx = idx + 4
+end
+for i = 1, nres do
+    local name, step, span, ttl = resolutions[i][1], resolutions[i][2], resolutions[i][3], resolutions[i][4]
+    local bucket = ts - ts % step
+    local key = 'ts:' .. device .. ':' .. name .. ':' .. (bucket - bucket % span)
+    for j = idx, #ARGV, 2 do
+        local field = ARGV[j] .. '|' .. bucket
+        local value = ARGV[j + 1]
+        redis.call('HINCRBYFLOAT', key, field .. '|s', value)
+        redis.call('HINCRBY', key, field .. '|c', 1)
+        local current = redis.call('HGET', key, field .. '|x')
+        if not current or tonumber(value) > tonumber(current) then
+            redis.call('HSET', key, field .. '|x', value)
+        end
+    end
+    redis.call('EXPIRE', key, ttl + span)
+end
+local names = {}
+for j = idx, #ARGV, 2 do
+    names[#names + 1] = ARGV[j]
+end
+if #names > 0 then
+    redis.call('SADD', 'ts:' .. device .. ':metrics', unpack(names))
+    redis.call('EXPIRE', 'ts:' .. device .. ':metrics', 365 * 86400)
+end
+return #names
+"""
+
+
+def _numeric(value):
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return value
+    return STATUS_VALUES.get(value) if isinstance(value, str) else None
+
+
+def flatten_metrics(metrics):
+    """
+    把结构化指标展开为 (序列名, 数值) 列表，只保留白名单中的设备与接口指标
+    采集元数据（collection.ts 等）、派生字段（*_delta、ever_up）与版本、运行时长等不写入历史
+    """
+    points = []
+    for key in HISTORY_METRICS:
+        value = _numeric(metrics.get(key))
+        if value is not None:
+            points.append((key, value))
+    interfaces = metrics.get("interfaces")
+    if isinstance(interfaces, dict):
+        for port, status in interfaces.items():
+            if not isinstance(status, dict):
+                status = {"status": status}
+            for field in INTERFACE_HISTORY_FIELDS:
+                value = _numeric(status.get(field))
+                if value is not None:
+                    points.append((f"interfaces.{port}.{field}", value))
+    return points
+
+
+class MetricHistory:
+    def __init__(self, redis_client, resolutions=None, batch_size=500):
+        self.redis = redis_client
+        self.resolutions = resolutions or RESOLUTIONS
+        self.batch_size = batch_size
+        self._script = redis_client.register_script(_APPEND_SCRIPT)
+        self._res_args = [str(len(self.resolutions))]
+        for name, (step, span, ttl) in self.resolutions.items():
+            self._res_args.extend([name, str(step), str(span), str(ttl)])
+
+    def append(self, device_id, metrics, ts=None):
+        self.append_many({device_id: metrics}, ts)
+
+    def append_many(self, items, ts=None):
+        """
+        批量追加一轮采集结果
+        :param items: {device_id: metrics} 或 (device_id, metrics) 可迭代对象
+        """
+        ts = int(ts or time.time())
+        if isinstance(items, dict):
+            items = items.items()
+        pipe = self.redis.pipeline(transaction=False)
+        pending = 0
+        for device_id, metrics in items:
+            points = flatten_metrics(metrics or {})
+            if not points:
+                continue
+            args = [str(device_id), str(ts)] + self._res_args
+            for name, value in points:
+                args.extend([name, repr(float(value))])
+            self._script(keys=[], args=args, client=pipe)
+            pending += 1
+            if pending >= self.batch_size:
+                pipe.execute()
+                pending = 0
+        if pending:
+            pipe.execute()
+
+    def metric_names(self, device_id):
+        return sorted(name.decode() if isinstance(name, bytes) else name
+                      for name in self.redis.smembers(f"ts:{device_id}:metrics"))
+
+    def query(self, device_id, metric, start, end, step=None):
+        """
+        范围查询
+        :param step: 期望的点间隔（秒），为空时自动选择使点数不超过 MAX_POINTS 的粒度
+        :return: {"resolution", "step", "points": [{"ts", "avg", "max", "count"}]}
+        :raises ValueError: 需要读取的桶数超过 MAX_BUCKETS
+        """
+        # 超出最长保留期的部分已无数据，起点截断到保留期内
+        start = max(int(start), int(time.time()) - max(ttl for _, _, ttl in self.resolutions.values()))
+        end = int(end)
+        name, res_step, span = self._pick_resolution(start, end, step)
+        step = max(int(step or res_step), res_step)
+        step -= step % res_step  # 对齐到所选粒度的整数倍
+
+        if (end - start) // res_step + 1 > MAX_BUCKETS:
+            raise ValueError(f"查询范围过大：{name} 粒度下超过 {MAX_BUCKETS} 个数据桶，请缩小时间范围或增大步长")
+        buckets = list(range(start - start % res_step, end + 1, res_step))
+        pipe = self.redis.pipeline(transaction=False)
+        for bucket in buckets:
+            key = f"ts:{device_id}:{name}:{bucket - bucket % span}"
+            field = f"{metric}|{bucket}"
+            pipe.hmget(key, f"{field}|s", f"{field}|c", f"{field}|x")
+        values = pipe.execute() if buckets else []
+
+        # 按请求步长合并桶
+        merged = {}
+        for bucket, (total, count, peak) in zip(buckets, values):
+            if count is None:
+                continue
+            point_ts = bucket - bucket % step
+            point = merged.setdefault(point_ts, {"ts": point_ts, "sum": 0.0, "count": 0, "max": None})
+            point["sum"] += float(total)
+            point["count"] += int(count)
+            peak = float(peak)
+            point["max"] = peak if point["max"] is None else max(point["max"], peak)
+
+        points = []
+        for point_ts in sorted(merged):
+            point = merged[point_ts]
+            points.append({"ts": point_ts, "avg": round(point["sum"] / point["count"], 4),
+                           "max": point["max"], "count": point["count"]})
+        return {"resolution": name, "step": step, "points": points}
+
+    def _pick_resolution(self, start, end, step):
+        """选择保留期覆盖起点的粒度：指定步长时取不超过步长的最粗粒度，否则取点数不超限的最细粒度"""
+        now = time.time()
+        ordered = sorted(((name, res_step, span, ttl) for name, (res_step, span, ttl) in self.resolutions.items()),
+                         key=lambda item: item[1])
+        candidates = [item[:3] for item in ordered if start >= now - item[3]] or [ordered[-1][:3]]
+        if step:
+            fitting = [item for item in candidates if item[1] <= step]
+            return fitting[-1] if fitting else candidates[0]
+        for item in candidates:
+            if (end - start) / item[1] <= MAX_POINTS:
+                return item
+        return candidates[-1]
@@ -0,0 +1,288 @@
+"""
+全网拓扑图：基于各设备 LLDP 观测构建邻接图并提供查询
+- 节点、端口均用字典索引，按设备名/端口 O(1) 查找
+- 双向观测通过规范化链路键（见 lldp_parser.link_key）一次遍历去重，全量构建复用 lldp_parser.merge_links
+- 支持邻居查询、最短路径、设备/端口故障影响范围分析
+- 单台设备的新观测与图中已有链路做差异比较，只修改变化的链路并递增版本号，
+  变化以 link-added / link-removed / link-degraded / link-recovered 事件返回
+"""
+import time
+from collections import deque
+from typing import Dict, Iterable, List, Optional
+
+from topology.lldp_parser import link_key, link_status, merge_links, merge_observation, normalize_port
+
+EVENT_LINK_ADDED = "link-added"
+EVENT_LINK_REMOVED = "link-removed"
+EVENT_LINK_DEGRADED = "link-degraded"
+EVENT_LINK_RECOVERED = "link-recovered"
+
+
+class TopologyGraph:
+    def __init__(self, version: int = 0, changelog_size: int = 1000):
+        self.version = version
+        # 最近的变化事件，供错过事件的消费者按版本号补齐
+        self.changelog = deque(maxlen=changelog_size)
+        self.nodes: Dict[str, Dict] = {}
+        self.links: Dict[tuple, Dict] = {}
+        # 设备 -> {邻居设备: [链路键]}
+        self.adjacency: Dict[str, Dict[str, List[tuple]]] = {}
+        # (设备, 端口) -> 链路键
+        self.port_index: Dict[tuple, tuple] = {}
+
+    @classmethod
+    def build(cls, observations: Iterable, nodes: Optional[Iterable[Dict]] = None, version: int = 0):
+        """
+        由多台设备的链路观测全量构建图（增量更新使用 apply_device）
+        :param observations: parse_lldp_output / SNMP LLDP 的单端观测，或已配对的 [a, b] 两端观测，见 merge_links
+        :param nodes: 额外的节点信息（如未采集到邻居的设备）
+        """
+        graph = cls(version)
+        for node in nodes or []:
+            graph.add_node(node["name"], **{k: v for k, v in node.items() if k != "name"})
+        for link in merge_links(observations):
+            if link["source_device"] == link["target_device"]:
+                continue
+            graph.add_node(link["source_device"])
+            graph.add_node(link["target_device"])
+            key = (link["source_device"], link["source_port"], link["target_device"], link["target_port"])
+            graph._add_link(key).update(link)
+        return graph
+
+    def add_node(self, name: str, **attrs):
+        node = self.nodes.setdefault(name, {"name": name})
+        node.update({k: v for k, v in attrs.items() if v is not None})
+        self.adjacency.setdefault(name, {})
+        return node
+
+    def apply_device(self, device: str, observations: Iterable[Dict], **attrs) -> List[Dict]:
+        """
+        用一台设备本轮的 LLDP 观测更新图，只修改变化的链路
+        - 新出现的链路：link-added
+        - 本设备不再上报且无其他设备观测的链路：link-removed
+        - 状态变为非 Up / 恢复为 Up：link-degraded / link-recovered
+        :return: 变化事件列表，有变化时版本号加一并记入 changelog
+        """
+        self.add_node(device, **attrs)
+        previous = {key for keys in self.adjacency[device].values() for key in keys
+                    if device in self.links[key]["observed"]}
+        current = set()
+        events = []
+        for observation in observations:
+            if not observation.get("neighbor") or observation["neighbor"] == device:
+                continue
+            key = self._observation_key(device, observation)
+            current.add(key)
+            link = self.links.get(key)
+            if link is None:
+                link = self._add_link(key)
+                merge_observation(link, device, observation.get("status"))
+                events.append(self._event(EVENT_LINK_ADDED, link))
+                continue
+            old_status = link["status"]
+            merge_observation(link, device, observation.get("status"))
+            self._status_event(events, link, old_status)
+
+        for key in previous - current:
+            link = self.links[key]
+            del link["observed"][device]
+            if not link["observed"]:
+                self._remove_link(key)
+                events.append(self._event(EVENT_LINK_REMOVED, link))
+                continue
+            old_status = link["status"]
+            link["status"] = link_status(link["observed"])
+            self._status_event(events, link, old_status)
+
+        if events:
+            self.version += 1
+            for event in events:
+                event["version"] = self.version
+            self.changelog.extend(events)
+        return events
+
+    def changes_since(self, version: int) -> Optional[List[Dict]]:
+        """返回指定版本之后的变化事件；changelog 已不覆盖该版本时返回 None，需全量拉取"""
+        if version >= self.version:
+            return []
+        if not self.changelog or self.changelog[0]["version"] > version + 1:
+            return None
+        return [event for event in self.changelog if event["version"] > version]
+
+    def _observation_key(self, device: str, observation: Dict) -> tuple:
+        target = observation["neighbor"]
+        self.add_node(target)
+        return link_key(device, normalize_port(observation.get("local_port")),
+                        target, normalize_port(observation.get("neighbor_port")))
+
+    def _add_link(self, key: tuple) -> Dict:
+        link = self.links[key] = {
+            "source_device": key[0], "source_port": key[1],
+            "target_device": key[2], "target_port": key[3],
+            "status": "Unknown", "observed": {}
+        }
+        self.adjacency.setdefault(key[0], {}).setdefault(key[2], []).append(key)
+        self.adjacency.setdefault(key[2], {}).setdefault(key[0], []).append(key)
+        self.port_index[(key[0], key[1])] = key
+        self.port_index[(key[2], key[3])] = key
+        return link
+
+    def _remove_link(self, key: tuple):
+        del self.links[key]
+        for device, neighbor in ((key[0], key[2]), (key[2], key[0])):
+            keys = self.adjacency[device][neighbor]
+            keys.remove(key)
+            if not keys:
+                del self.adjacency[device][neighbor]
+        for port_key in ((key[0], key[1]), (key[2], key[3])):
+            if self.port_index.get(port_key) == key:
+                del self.port_index[port_key]
+
+    def _status_event(self, events: List[Dict], link: Dict, old_status: str):
+        if link["status"] == old_status:
+            return
+        event_type = EVENT_LINK_RECOVERED if link["status"] == "Up" else EVENT_LINK_DEGRADED
+        event = self._event(event_type, link)
+        event["previous_status"] = old_status
+        events.append(event)
+
+    @staticmethod
+    def _public_link(link: Dict) -> Dict:
+        """对外返回的链路副本，不含内部的各端观测"""
+        return {k: v for k, v in link.items() if k != "observed"}
+
+    @classmethod
+    def _event(cls, event_type: str, link: Dict) -> Dict:
+        return {"event": event_type, "ts": int(time.time()), "link": cls._public_link(link)}
+
+    def neighbors(self, device: str) -> List[Dict]:
+        result = []
+        for neighbor, keys in self.adjacency.get(device, {}).items():
+            for key in keys:
+                link = self.links[key]
+                local_port, remote_port = (key[1], key[3]) if key[0] == device else (key[3], key[1])
+                result.append({"device": neighbor, "local_port": local_port,
+                               "neighbor_port": remote_port, "status": link["status"]})
+        return result
+
+    def shortest_path(self, source: str, target: str) -> Optional[List[Dict]]:
+        """BFS 最短跳数路径，返回逐跳的设备与出/入端口，不可达时返回 None"""
+        if source not in self.nodes or target not in self.nodes:
+            return None
+        parents = {source: None}
+        queue = deque([source])
+        while queue:
+            current = queue.popleft()
+            if current == target:
+                break
+            for neighbor, keys in self.adjacency[current].items():
+                if neighbor in parents or not self._link_usable(keys):
+                    continue
+                parents[neighbor] = (current, keys[0])
+                queue.append(neighbor)
+        if target not in parents:
+            return None
+
+        hops = []
+        node = target
+        while parents[node] is not None:
+            previous, key = parents[node]
+            out_port, in_port = (key[1], key[3]) if key[0] == previous else (key[3], key[1])
+            hops.append({"from": previous, "from_port": out_port, "to": node, "to_port": in_port})
+            node = previous
+        hops.reverse()
+        return hops
+
+    def blast_radius(self, device: Optional[str] = None, port: Optional[str] = None,
+                     roots: Optional[List[str]] = None) -> Dict:
+        """
+        故障影响范围：去掉故障设备（或故障端口所在链路）后，与根节点失去连通的设备
+        :param roots: 根节点（通常为核心设备），为空时取度数最高的设备
+        """
+        failed_nodes = set()
+        failed_links = set()
+        if port:
+            key = self.port_index.get((device, normalize_port(port)))
+            if key:
+                failed_links.add(key)
+        elif device:
+            failed_nodes.add(device)
+            for keys in self.adjacency.get(device, {}).values():
+                failed_links.update(keys)
+
+        roots = [r for r in (roots or []) if r in self.nodes and r not in failed_nodes]
+        if not roots:
+            candidates = [n for n in self.nodes if n not in failed_nodes]
+            if not candidates:
+                return {"failed_device": device, "failed_port": port, "roots": [], "affected": [], "lost_links": []}
+            roots = [max(candidates, key=lambda n: len(self.adjacency[n]))]
+
+        # 仅统计故障前可达、故障后不可达的设备，原本就不通的设备不计入
+        before = self._reachable(roots, set(), set())
+        after = self._reachable(roots, failed_nodes, failed_links)
+        affected = sorted(before - after - failed_nodes)
+        return {
+            "failed_device": device,
+            "failed_port": port,
+            "roots": roots,
+            "affected": affected,
+            "lost_links": [self._public_link(self.links[k]) for k in failed_links]
+        }
+
+    def _reachable(self, roots, failed_nodes, failed_links) -> set:
+        reachable = set(roots)
+        queue = deque(roots)
+        while queue:
+            current = queue.popleft()
+            for neighbor, keys in self.adjacency[current].items():
+                if neighbor in reachable or neighbor in failed_nodes:
+                    continue
+                if not self._link_usable(k for k in keys if k not in failed_links):
+                    continue
+                reachable.add(neighbor)
+                queue.append(neighbor)
+        return reachable
+
+    def _link_usable(self, keys) -> bool:
+        return any(self.links[k]["status"] != "Down" for k in keys)
+
+    def to_dict(self, include_observed: bool = False) -> Dict:
+        """
+        序列化拓扑图
+        :param include_observed: 是否保留各端观测（持久化时需要，用于重启后继续做差异比较；接口返回时不含）
+        """
+        links = self.links.values() if include_observed else map(self._public_link, self.links.values())
+        return {
+            "version": self.version,
+            "nodes": list(self.nodes.values()),
+            "links": list(links)
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict):
+        graph = cls(data.get("version", 0))
+        for node in data.get("nodes", []):
+            graph.add_node(node["name"], **{k: v for k, v in node.items() if k != "name"})
+        for link in data.get("links", []):
+            key = (link["source_device"], link["source_port"], link["target_device"], link["target_port"])
+            graph._add_link(key).update(link)
+        return graph
+
+    def stats(self) -> Dict:
+        return {"version": self.version, "nodes": len(self.nodes), "links": len(self.links)}
+
+
+class TopologyStore:
+    """拓扑图持久化（Redis 单键，沿用指标编码格式）"""
+
+    def __init__(self, redis_client, codec, key="topology:graph"):
+        self.redis = redis_client
+        self.codec = codec
+        self.key = key
+
+    def save(self, graph: TopologyGraph):
+        self.redis.set(self.key, self.codec.encode(graph.to_dict(include_observed=True)))
+
+    def load(self) -> Optional[TopologyGraph]:
+        data = self.codec.decode(self.redis.get(self.key))
+        return TopologyGraph.from_dict(data) if data else None
@@ -1,58 +1,238 @@
-"""解析设备 LLDP 输出，生成拓扑链路"""
+"""
+解析设备 LLDP 输出，生成拓扑链路
+- 按厂商注册解析器，同时支持简表（brief/list）与详细信息（display lldp neighbor 等逐邻居块）两种格式
+- 正则在模块加载时编译；先用子串检查判断输出格式
+- 简表对整段输出执行一次 findall；详细格式按邻居块起始标签（str.split）切块，
+  块内字段正则以标签字面量开头，由匹配器在 C 层先定位标签，不在 Python 中逐行循环
+- 未指定或未注册的厂商依次尝试全部解析器
+"""
 
-from typing import Dict, List
+from typing import Callable, Dict, List, Optional
 import re
 
+from protocols.vendors import VENDOR_ALIASES
 
-def parse_lldp_output(device_id: int, device_name: str, output: str) -> List[Dict[str, str]]:
-    links = []
+# 各厂商采集 LLDP 邻居的默认命令（详细格式信息最完整）
+LLDP_COMMANDS = {
+    "huawei": "display lldp neighbor",
+    "h3c": "display lldp neighbor-information",
+    "cisco": "show lldp neighbors detail",
+    "ruijie": "show lldp neighbors detail",
+}
+
+# 端口名：可选数字前缀（10GE）+ 字母/连字符 + 编号，如 GE0/0/1、XGigabitEthernet0/0/1、Eth-Trunk1
+_PORT = r"\d*[A-Za-z-]+\d\S*"
+
+# 简表格式每行都是有效数据，对整段输出（前面补一个换行）执行一次 findall；
+# 正则以字面量换行开头，匹配器在 C 层跳到下一行行首再比较，不逐行进入 Python 代码
+# 华为简表：本地端口 [状态] 邻居设备 邻居端口 [老化时间]
+HUAWEI_TABLE_PATTERN = re.compile(rf"\n({_PORT})[ \t]+(?:(Up|Down)[ \t]+)?(\S+)[ \t]+(\S+)")
+# 华三 display lldp neighbor-information list：系统名 本地端口 机箱ID 邻居端口
+H3C_TABLE_PATTERN = re.compile(rf"\n(\S+)[ \t]+({_PORT})[ \t]+\S+[ \t]+(\S+)[ \t]*\r?(?=\n|$)")
+# 思科 show lldp neighbors：设备ID 本地端口 保持时间 [能力] 邻居端口
+CISCO_TABLE_PATTERN = re.compile(rf"\n(\S+)[ \t]+({_PORT})[ \t]+\d+[ \t]+(?:\S+[ \t]+)?(\S+)[ \t]*\r?(?=\n|$)")
+
+# 详细格式先按邻居块起始标签用 str.split 切块，块内字段用以标签字面量开头的正则 search 取值：
+# 匹配器先在 C 层定位标签，只在命中处检查 "标签 : 值"（标签与冒号之间只允许空白，排除 Port ID type 等）
+HUAWEI_PORT_ID = re.compile(r"\nPort ID[ \t]*:([^\n]*)")
+HUAWEI_SYSTEM_NAME = re.compile(r"\nSystem name[ \t]*:([^\n]*)")
+# 华三字段行带缩进，标签本身足以区分，不要求位于行首
+H3C_PORT_ID = re.compile(r"(?:PortID/subtype|Port ID)[ \t]*:([^\n]*)")
+H3C_SYSTEM_NAME = re.compile(r"System name[ \t]*:([^\n]*)")
+CISCO_PORT_ID = re.compile(r"\nPort id[ \t]*:([^\n]*)")
+CISCO_SYSTEM_NAME = re.compile(r"\nSystem Name[ \t]*:([^\n]*)")
+# PortID/subtype 字段末尾的类型说明中不含数字
+DIGIT_PATTERN = re.compile(r"\d")
+
+_LLDP_PARSERS: Dict[str, Callable[[str], List[tuple]]] = {}
+
+
+def register_lldp_parser(*vendors):
+    """注册厂商 LLDP 解析器，解析器返回 (本地端口, 邻居设备, 邻居端口, 状态) 列表"""
+    def decorator(func):
+        for vendor in vendors:
+            _LLDP_PARSERS[vendor] = func
+        return func
+    return decorator
+
+
+def default_lldp_command(vendor: Optional[str]) -> str:
+    vendor = VENDOR_ALIASES.get(vendor, (vendor or "").lower())
+    return LLDP_COMMANDS.get(vendor, LLDP_COMMANDS["huawei"])
+
+
+def parse_lldp_output(device_id: int, device_name: str, output: str,
+                      vendor: Optional[str] = None) -> List[Dict[str, str]]:
     if not output:
-        return links
-
-    pattern = re.compile(
-        r"(?P<local>GigabitEthernet\S+)\s+"  # 本地端口
-        r"(?P<status>Up|Down)\s+"             # 状态
-        r"(?P<neighbor>\S+)\s+"              # 邻居设备
-        r"(?P<neighbor_port>GigabitEthernet\S+)"  # 邻居端口
-    )
-
-    for line in output.splitlines():
-        match = pattern.search(line)
-        if not match:
+        return []
+
+    vendor = VENDOR_ALIASES.get(vendor, (vendor or "").lower())
+    # 补一个换行，第一行也能按行首标签匹配
+    output = "\n" + output
+    parser = _LLDP_PARSERS.get(vendor)
+    entries = parser(output) if parser else []
+    if not entries:
+        for fallback in dict.fromkeys(_LLDP_PARSERS.values()):
+            if fallback is not parser:
+                entries = fallback(output)
+                if entries:
+                    break
+
+    return [{
+        "device_id": device_id,
+        "device_name": device_name,
+        "local_port": local,
+        "neighbor": neighbor,
+        "neighbor_port": neighbor_port,
+        "status": status
+    } for local, neighbor, neighbor_port, status in entries]
+
+
+def _strip_subtype(value: str) -> str:
+    """去掉华三 PortID/subtype 字段末尾的类型说明，如 GigabitEthernet1/0/2/Interface name"""
+    head, sep, tail = value.rpartition("/")
+    if sep and tail and not DIGIT_PATTERN.search(tail):
+        return head.strip()
+    return value
+
+
+# 解析器的输入以换行开头（见 parse_lldp_output）
+# LLDP 邻居存在即说明链路处于 Up 状态，详细格式中不再单独给出状态
+@register_lldp_parser("huawei")
+def parse_huawei_lldp(output: str) -> List[tuple]:
+    if "Neighbor index" not in output:
+        return [(local, neighbor, neighbor_port, status or "Up")
+                for local, status, neighbor, neighbor_port in HUAWEI_TABLE_PATTERN.findall(output)]
+    # 端口块头 "GigabitEthernet0/0/1 has 1 neighbor(s):" 位于该端口第一个邻居块之前，
+    # 即上一个邻居块（或第一个块之前的内容）的末尾
+    entries = []
+    local = None
+    for block in output.split("\nNeighbor index"):
+        name = HUAWEI_SYSTEM_NAME.search(block) if local else None
+        if name:
+            port = HUAWEI_PORT_ID.search(block)
+            entries.append((local, name.group(1).strip(), port.group(1).strip() or None if port else None, "Up"))
+        i = block.rfind(" has ")
+        if i >= 0 and "neighbor" in block[i:i + 24]:
+            local = block[block.rfind("\n", 0, i) + 1:i].strip() or local
+    return entries
+
+
+@register_lldp_parser("h3c", "ruijie")
+def parse_h3c_lldp(output: str) -> List[tuple]:
+    if "neighbor-information of port" not in output:
+        return [(local, neighbor, neighbor_port, "Up")
+                for neighbor, local, neighbor_port in H3C_TABLE_PATTERN.findall(output)]
+    # 端口块头 LLDP neighbor-information of port 1[GigabitEthernet1/0/1]: 给出本地端口，
+    # 其后每个 LLDP neighbor index 为一个邻居块；没有 neighbor index 行的旧版本字段直接跟在端口块头后
+    entries = []
+    for block in output.split("neighbor-information of port")[1:]:
+        start = block.find("[")
+        end = block.find("]", start)
+        local = block[start + 1:end].strip() if 0 <= start < end else None
+        if not local:
             continue
-        links.append({
-            "device_id": device_id,
-            "device_name": device_name,
-            "local_port": match.group("local"),
-            "neighbor": match.group("neighbor"),
-            "neighbor_port": match.group("neighbor_port"),
-            "status": match.group("status")
-        })
+        for neighbor in block.split("eighbor index"):
+            name = H3C_SYSTEM_NAME.search(neighbor)
+            if name:
+                port = H3C_PORT_ID.search(neighbor)
+                port = port.group(1).strip() if port else None
+                entries.append((local, name.group(1).strip(), _strip_subtype(port) if port else None, "Up"))
+    return entries
+
+
+@register_lldp_parser("cisco")
+def parse_cisco_lldp(output: str) -> List[tuple]:
+    if "Chassis id:" not in output:
+        return [(local, neighbor, neighbor_port, "Up")
+                for neighbor, local, neighbor_port in CISCO_TABLE_PATTERN.findall(output)]
+    # 每个邻居块以 Local Intf: 开始，其后为本地端口
+    entries = []
+    for block in output.split("\nLocal Intf:")[1:]:
+        local = block.partition("\n")[0].strip()
+        name = CISCO_SYSTEM_NAME.search(block)
+        if local and name:
+            port = CISCO_PORT_ID.search(block)
+            entries.append((local, name.group(1).strip(), port.group(1).strip() or None if port else None, "Up"))
+    return entries
+
+
+# 端口名缩写 -> 全称，保证两端设备上报的同一端口得到相同的名称
+PORT_ABBREVIATIONS = [
+    (re.compile(r"^(?:GE|Gi|GigE)(?=\d)", re.IGNORECASE), "GigabitEthernet"),
+    (re.compile(r"^(?:XGE|XGigE)(?=\d)", re.IGNORECASE), "XGigabitEthernet"),
+    (re.compile(r"^Te(?=\d)", re.IGNORECASE), "TenGigabitEthernet"),
+    (re.compile(r"^(?:Eth|Et)(?=\d)", re.IGNORECASE), "Ethernet"),
+    (re.compile(r"^Fa(?=\d)", re.IGNORECASE), "FastEthernet"),
+]
+# 锐捷等设备端口名与编号之间带空格，如 "GigabitEthernet 0/1"
+PORT_SPACE_PATTERN = re.compile(r"^([A-Za-z-]+)\s+(?=\d)")
+
+
+def normalize_port(port: str) -> str:
+    if not port:
+        return ""
+    port = PORT_SPACE_PATTERN.sub(r"\1", port.strip())
+    for pattern, full_name in PORT_ABBREVIATIONS:
+        if pattern.match(port):
+            return pattern.sub(full_name, port, count=1)
+    return port
+
 
-    return links
+def link_key(device_a: str, port_a: str, device_b: str, port_b: str) -> tuple:
+    """链路的规范化键：两端按 (设备, 端口) 排序，A->B 与 B->A 的观测得到同一个键"""
+    side_a = (device_a, port_a)
+    side_b = (device_b, port_b)
+    if side_b < side_a:
+        side_a, side_b = side_b, side_a
+    return side_a + side_b
 
 
-def merge_links(entries: List[List[Dict[str, str]]]) -> List[Dict[str, str]]:
+def link_status(observed: Dict[str, str]) -> str:
+    """两端（或唯一观测端）均为 Up 时为 Up，均为 Down 时为 Down，否则为 Degraded"""
+    statuses = set(observed.values())
+    if statuses == {"Up"}:
+        return "Up"
+    if statuses == {"Down"}:
+        return "Down"
+    return "Degraded"
+
+
+def merge_observation(link: Dict, observer: str, status: str):
+    """合并一端设备对链路的观测并更新链路状态"""
+    link["observed"][observer] = status or "Unknown"
+    link["status"] = link_status(link["observed"])
+
+
+def merge_links(entries: List) -> List[Dict[str, str]]:
+    """
+    合并链路观测，一次遍历完成双向去重
+    :param entries: parse_lldp_output 输出的单端观测，或已配对的 [a, b] 两端观测
+    """
     link_map = {}
 
-    def normalize_key(a: Dict[str, str], b: Dict[str, str]):
-        key1 = (a["device_name"], a["local_port"], b["device_name"], b["local_port"])
-        key2 = (b["device_name"], b["local_port"], a["device_name"], a["local_port"])
-        return tuple(sorted([key1, key2]))
+    def observe(device, port, neighbor, neighbor_port, status):
+        port, neighbor_port = normalize_port(port), normalize_port(neighbor_port)
+        key = link_key(device, port, neighbor, neighbor_port)
+        link = link_map.get(key)
+        if link is None:
+            link = link_map[key] = {
+                "source_device": key[0],
+                "source_port": key[1],
+                "target_device": key[2],
+                "target_port": key[3],
+                "status": "Unknown",
+                "observed": {}
+            }
+        merge_observation(link, device, status)
 
     for entry in entries:
-        if len(entry) < 2:
-            continue
-        a, b = entry
-        key = normalize_key(a, b)
-        if key not in link_map:
-            link_map[key] = {
-                "source_device": a["device_name"],
-                "source_port": a["local_port"],
-                "target_device": b["device_name"],
-                "target_port": b["local_port"],
-                "status": "Up" if a.get("status") == "Up" and b.get("status") == "Up" else "Degraded"
-            }
+        if isinstance(entry, dict):
+            observe(entry["device_name"], entry["local_port"], entry["neighbor"],
+                    entry.get("neighbor_port"), entry.get("status"))
+        elif len(entry) >= 2:
+            a, b = entry[0], entry[1]
+            observe(a["device_name"], a["local_port"], b["device_name"], b["local_port"], a.get("status"))
+            observe(b["device_name"], b["local_port"], a["device_name"], a["local_port"], b.get("status"))
 
     return list(link_map.values())
-
@@ -0,0 +1,90 @@
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "ai-service"))
+from fault_classifier import FaultClassifier
+
+ROUNDS = 20
+REPEAT = 7
+
+THINK_LINES = [
+    "先看CPU使用率，当前为85%，CPU超过80%的阈值，属于CPU过载。",
+    "接口GigabitEthernet0/0/{i}的物理状态为up，协议状态为up，流量正常。",
+    "检查OSPF邻居表，邻居状态为Full，未发现OSPF故障。",
+    "内存使用率为62%，低于90%的阈值，无需处理。",
+    "日志中出现多次端口震荡记录，需要确认接口是否down过。",
+    "Let me double check the numbers against the baseline before drawing a conclusion.",
+    "结合历史基线来看，当前各项数值的波动仍在正常范围内，继续核对其余输出。",
+    "The interface counters look stable over the sampling window, nothing unusual there.",
+    "对比上一次巡检的结果，整体趋势没有明显变化。",
+]
+REPORT_LINES = [
+    "1. 健康评分：72分，依据：CPU使用率85%超过阈值80%，接口GigabitEthernet0/0/{i}状态down。",
+    "2. 异常项：P1 接口GigabitEthernet0/0/{i} down，证据：display interface brief 显示 down。",
+    "   P2 CPU过载，证据：display cpu-usage 显示 85%。",
+    "3. 修复建议：执行 undo shutdown 启用接口，检查光模块；建议进行冗余配置与性能优化。",
+    "4. 推理链路：采集指标 -> 阈值对比 -> 日志关联 -> 确认路由异常与链路中断无关。",
+]
+
+
+def build_report(blocks):
+    """模拟推理模型输出：<think> 思考过程在前，四段式报告在后"""
+    think = [line.format(i=i) for i in range(blocks) for line in THINK_LINES]
+    report = [line.format(i=i) for i in range(blocks) for line in REPORT_LINES]
+    return "<think>\n" + "\n".join(think) + "\n</think>\n" + "\n".join(report)
+
+
+def legacy_match(classifier, report_text, start=0, end=None):
+    """改造前的实现：每次调用都经 re.compile(...) 查缓存，每处匹配都重新生成修复建议"""
+    faults = []
+    end = len(report_text) if end is None else end
+    for level, patterns in classifier.FAULT_PATTERNS.items():
+        for pattern in patterns:
+            for match in re.compile(pattern, re.IGNORECASE).finditer(report_text, start, end):
+                evidence = report_text[max(0, match.start() - 50):min(len(report_text), match.end() + 50)].strip()
+                faults.append({
+                    "level": level,
+                    "description": match.group(0),
+                    "evidence": evidence,
+                    "repair_suggestion": classifier._generate_repair_suggestion(match.group(0), level),
+                    "auto_repairable": level in ["P3", "P2"]
+                })
+    return faults
+
+
+def legacy_classify(classifier, report_text):
+    """改造前的 classify：全部匹配生成故障后再线性去重、排序"""
+    unique_faults = []
+    seen = set()
+    for fault in legacy_match(classifier, report_text):
+        key = fault["level"] + ":" + fault["description"]
+        if key not in seen:
+            seen.add(key)
+            unique_faults.append(fault)
+    priority_order = {"P0": 0, "P1": 1, "P2": 2, "P3": 3}
+    unique_faults.sort(key=lambda x: priority_order.get(x["level"], 99))
+    return unique_faults
+
+
+def measure(func, report):
+    """多轮计时取最小值，减少机器负载波动的影响"""
+    return min(timeit.repeat(lambda: func(report), number=ROUNDS, repeat=REPEAT)) / ROUNDS * 1000
+
+
+classifier = FaultClassifier()
+for blocks in (10, 100, 500):
+    report = build_report(blocks)
+    faults = classifier.match_keywords(report)
+    assert faults == legacy_match(classifier, report), "匹配结果与改造前不一致"
+    assert classifier.classify(report) == legacy_classify(classifier, report), "分级结果与改造前不一致"
+
+    match_ms = measure(classifier.match_keywords, report)
+    legacy_match_ms = measure(lambda text: legacy_match(classifier, text), report)
+    classify_ms = measure(classifier.classify, report)
+    legacy_classify_ms = measure(lambda text: legacy_classify(classifier, text), report)
+
+    print(f"报告{len(report) // 1024}KB（含<think>思考过程）：匹配{len(faults)}处故障关键词")
+    print(f"  match_keywords 平均{match_ms:.3f}毫秒（改造前{legacy_match_ms:.3f}毫秒）")
+    print(f"  classify 平均{classify_ms:.3f}毫秒（改造前{legacy_classify_ms:.3f}毫秒），结果一致")
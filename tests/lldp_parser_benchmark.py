@@ -0,0 +1,117 @@
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "collect-service"))
+from topology.lldp_parser import parse_lldp_output
+
+# 模拟核心交换机输出：每种格式 400 个邻居
+NEIGHBORS = 400
+ROUNDS = 50
+REPEAT = 15
+# 单次解析（含生成链路字典）的目标耗时
+TARGET_MS = 1.0
+
+
+def huawei_detail(n):
+    blocks = []
+    for i in range(n):
+        blocks.append(
+            f"10GE1/0/{i} has 1 neighbor(s):\n\n"
+            f"Neighbor index :1\n"
+            f"Chassis type   :MAC address\n"
+            f"Chassis ID     :00e0-fc12-{i:04x}\n"
+            f"Port ID type   :Interface name\n"
+            f"Port ID        :XGigabitEthernet0/0/{i % 48}\n"
+            f"Port description    :HUAWEI, S Series, XGigabitEthernet0/0/{i % 48} Interface\n"
+            f"System name    :Access-{i}\n"
+            f"System description  :Huawei Versatile Routing Platform Software\n"
+            f"System capabilities supported   :bridge router\n"
+            f"Management address type  :ipv4\n"
+            f"Management address : 10.0.{i // 256}.{i % 256}\n"
+            f"Expired time   :104\n"
+        )
+    return "\n".join(blocks)
+
+
+def huawei_brief(n):
+    lines = ["Local Intf       Neighbor Dev             Neighbor Intf             Exptime(s)"]
+    for i in range(n):
+        lines.append(f"GigabitEthernet0/0/{i}  Up  Access-{i}  GigabitEthernet0/0/{i % 48}")
+    return "\n".join(lines)
+
+
+def h3c_detail(n):
+    blocks = []
+    for i in range(n):
+        blocks.append(
+            f"LLDP neighbor-information of port {i + 1}[Ten-GigabitEthernet1/0/{i}]:\n"
+            f"  LLDP agent nearest-bridge:\n"
+            f"  LLDP neighbor index : 1\n"
+            f"  ChassisID/subtype   : 0023-8912-{i:04x}/MAC address\n"
+            f"  PortID/subtype      : GigabitEthernet1/0/{i % 48}/Interface name\n"
+            f"  Port description    : GigabitEthernet1/0/{i % 48} Interface\n"
+            f"  System name         : H3C-{i}\n"
+        )
+    return "\n".join(blocks)
+
+
+def cisco_detail(n):
+    blocks = []
+    for i in range(n):
+        blocks.append(
+            "------------------------------------------------\n"
+            f"Local Intf: Te1/1/{i}\n"
+            f"Chassis id: 0023.8912.{i:04x}\n"
+            f"Port id: Gi1/0/{i % 48}\n"
+            f"Port Description: GigabitEthernet1/0/{i % 48}\n"
+            f"System Name: SW-{i}\n"
+            "System Capabilities: B,R\n"
+        )
+    return "\n".join(blocks)
+
+
+def legacy_parse(device_id, device_name, output):
+    """改造前的实现：每次调用编译正则，仅支持华为简表中的 GigabitEthernet 端口"""
+    links = []
+    pattern = re.compile(
+        r"(?P<local>GigabitEthernet\S+)\s+"
+        r"(?P<status>Up|Down)\s+"
+        r"(?P<neighbor>\S+)\s+"
+        r"(?P<neighbor_port>GigabitEthernet\S+)"
+    )
+    for line in output.splitlines():
+        match = pattern.search(line)
+        if match:
+            links.append(match.groupdict())
+    return links
+
+
+def best_ms(func):
+    """取多轮中最快的一轮，排除机器负载抖动"""
+    return min(timeit.repeat(func, number=ROUNDS, repeat=REPEAT)) / ROUNDS * 1000
+
+
+cases = [
+    ("华为详细格式", "huawei", huawei_detail(NEIGHBORS)),
+    ("华为简表", "huawei", huawei_brief(NEIGHBORS)),
+    ("华三详细格式", "h3c", h3c_detail(NEIGHBORS)),
+    ("思科详细格式", "cisco", cisco_detail(NEIGHBORS)),
+]
+
+failed = []
+for name, vendor, output in cases:
+    links = parse_lldp_output(1, "Core-1", output, vendor=vendor)
+    assert len(links) == NEIGHBORS, f"{name}：解析出{len(links)}条链路，应为{NEIGHBORS}条"
+    avg_ms = best_ms(lambda: parse_lldp_output(1, "Core-1", output, vendor=vendor))
+
+    legacy_links = legacy_parse(1, "Core-1", output)
+    legacy_ms = best_ms(lambda: legacy_parse(1, "Core-1", output))
+
+    print(f"{name}：输出{len(output) // 1024}KB，解析出{len(links)}条链路，{avg_ms:.3f}毫秒"
+          f"（旧实现{len(legacy_links)}条，{legacy_ms:.3f}毫秒）")
+    if avg_ms > TARGET_MS:
+        failed.append(f"{name} {avg_ms:.3f}毫秒")
+
+assert not failed, f"超过{TARGET_MS}毫秒目标：{'，'.join(failed)}"